@@ -0,0 +1,279 @@
+"""
+Persistent cache of generated answers.
+
+An answer is keyed by the normalized question, the model name and options,
+and a fingerprint of the packed context it was generated from. Entries expire
+after a TTL, the table is capped with LRU eviction, and storing new knowledge
+for a source URL drops every cached answer that used that URL. Each source
+also has a generation that invalidation bumps: a key records the generations
+its context was read at, and `put` refuses an answer whose sources changed
+while it was being generated, so a refresh can't be undone by a slow answer.
+
+Questions that normalize differently but share the exact same context (e.g.
+"tribes of Cameroon" / "Cameroon tribes") can optionally be served too. This is
+off by default: two questions over the same passages can still ask different
+things, so a near match must also have the same question words (what, when,
+how...) and negations, and its remaining terms must overlap by the threshold.
+
+Run directly to print cache statistics:
+    python answer_cache.py [--clear]
+"""
+import re
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from search_index import query_terms
+from sqlite_pool import connection
+from telemetry import describe, inc
+
+# ===== CONFIGURATION ===== #
+ANSWER_CACHE_TTL = 7 * 86400  # seconds
+ANSWER_CACHE_MAX_ENTRIES = 5000
+LOOKUP_CHUNK = 500  # source URLs per IN (...) lookup, under SQLite's variable limit
+NEAR_DUPLICATE_THRESHOLD: Optional[float] = None  # Jaccard overlap of query terms, e.g. 0.9; None disables
+QUESTION_WORDS = {'what', 'when', 'where', 'who', 'whom', 'whose', 'which', 'why', 'how'}
+NEGATIONS = {'no', 'not', 'never', 'nor', 'without', 'none', 'cannot',
+             't'}  # normalize_query splits "didn't" into "didn t"
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case words only, so punctuation and spacing don't split the cache"""
+    return ' '.join(re.findall(r'\w+', query.lower()))
+
+
+def context_fingerprint(items: List[Dict]) -> str:
+    """Order-sensitive hash of the context passages given to the model"""
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update((item.get('source') or '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update((item.get('content') or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _intent_words(query: str) -> frozenset:
+    """Question words and negations, which change what is asked without changing the topic"""
+    words = set(normalize_query(query).split())
+    return frozenset(words & (QUESTION_WORDS | NEGATIONS))
+
+
+def near_duplicate(a: str, b: str, threshold: float) -> bool:
+    """Same question words and negations, and content words overlapping by `threshold` (Jaccard)"""
+    if _intent_words(a) != _intent_words(b):
+        return False
+    a_terms, b_terms = set(query_terms(a)) - NEGATIONS, set(query_terms(b)) - NEGATIONS
+    if not a_terms and not b_terms:
+        return True
+    return len(a_terms & b_terms) / len(a_terms | b_terms) >= threshold
+
+
+class AnswerCache:
+    """TTL + LRU answer cache stored next to the knowledge base"""
+
+    def __init__(self, path: str, ttl: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 near_duplicate_threshold: Optional[float] = NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.stats = {'hits': 0, 'near_hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0,
+                      'stale': 0}
+        self._lock = threading.Lock()
+
+        with connection(path) as conn:
+            init_answer_cache(conn)
+
+    def make_key(self, query: str, model: str, options: Dict, items: List[Dict]) -> Dict:
+        """Everything that determines an answer, plus its combined cache key"""
+        normalized = normalize_query(query)
+        context_hash = context_fingerprint(items)
+        model_id = f"{model}:{json.dumps(options, sort_keys=True)}"
+        key = hashlib.sha256('\0'.join((normalized, model_id, context_hash)).encode('utf-8')).hexdigest()
+        sources = sorted({item.get('source') for item in items if item.get('source')})
+        return {
+            "key": key,
+            "query": normalized,
+            "model": model_id,
+            "context_hash": context_hash,
+            "sources": sources,
+            "generations": self.generations(sources)
+        }
+
+    def generations(self, source_urls: Iterable[str]) -> Dict[str, int]:
+        """Current generation of each source URL (0 if it was never invalidated)"""
+        urls = list(source_urls)
+        found = {}
+        with connection(self.path) as conn:
+            for start in range(0, len(urls), LOOKUP_CHUNK):
+                chunk = urls[start:start + LOOKUP_CHUNK]
+                found.update(conn.execute(
+                    f"SELECT source_url, generation FROM answer_source_generations "
+                    f"WHERE source_url IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return {url: found.get(url, 0) for url in urls}
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self.stats[stat] += amount
+        inc('assistant_answer_cache_events_total', amount, event=stat)
+
+    def get(self, key: Dict) -> Optional[str]:
+        """Cached answer for a key, exact or near-duplicate, or None"""
+        now = time.time()
+        with connection(self.path) as conn:
+            row = conn.execute(
+                'SELECT answer, created_at FROM answer_cache WHERE key = ?', (key['key'],)
+            ).fetchone()
+            if row and now - row[1] < self.ttl:
+                conn.execute('UPDATE answer_cache SET last_access = ? WHERE key = ?', (now, key['key']))
+                self._count('hits')
+                return row[0]
+
+            if self.near_duplicate_threshold is not None:
+                for cached_key, query, answer in conn.execute('''
+                    SELECT key, query, answer FROM answer_cache
+                    WHERE context_hash = ? AND model = ? AND created_at > ?
+                ''', (key['context_hash'], key['model'], now - self.ttl)).fetchall():
+                    if near_duplicate(key['query'], query, self.near_duplicate_threshold):
+                        conn.execute('UPDATE answer_cache SET last_access = ? WHERE key = ?', (now, cached_key))
+                        self._count('near_hits')
+                        return answer
+
+        self._count('misses')
+        return None
+
+    def put(self, key: Dict, answer: str) -> bool:
+        """Store an answer and the source URLs it depended on; False if a source changed since `make_key`"""
+        now = time.time()
+        with connection(self.path) as conn:
+            # The insert takes the write lock (BEGIN IMMEDIATE), so no invalidation
+            # can slip in between the generation check and the commit
+            conn.execute('''
+                INSERT OR REPLACE INTO answer_cache
+                    (key, query, model, context_hash, answer, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key['key'], key['query'], key['model'], key['context_hash'], answer, now, now))
+            if key.get('generations') and self._changed(conn, key['generations']):
+                conn.rollback()
+                self._count('stale')
+                return False
+            conn.execute('DELETE FROM answer_sources WHERE key = ?', (key['key'],))
+            conn.executemany(
+                'INSERT OR IGNORE INTO answer_sources (key, source_url) VALUES (?, ?)',
+                [(key['key'], source) for source in key['sources']]
+            )
+            self._evict(conn, now)
+        return True
+
+    @staticmethod
+    def _changed(conn: sqlite3.Connection, generations: Dict[str, int]) -> bool:
+        """True if any source was invalidated after these generations were read"""
+        for url, generation in generations.items():
+            row = conn.execute('SELECT generation FROM answer_source_generations WHERE source_url = ?',
+                               (url,)).fetchone()
+            if (row[0] if row else 0) != generation:
+                return True
+        return False
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute('DELETE FROM answer_cache WHERE created_at <= ?', (now - self.ttl,)).rowcount
+        overflow = conn.execute('SELECT COUNT(*) FROM answer_cache').fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute('''
+                DELETE FROM answer_cache WHERE key IN (
+                    SELECT key FROM answer_cache ORDER BY last_access LIMIT ?
+                )
+            ''', (overflow,))
+        if expired or overflow > 0:
+            conn.execute('DELETE FROM answer_sources WHERE key NOT IN (SELECT key FROM answer_cache)')
+            self._count('evictions', expired + max(overflow, 0))
+
+    def invalidate_sources(self, conn: sqlite3.Connection, source_urls: Iterable[str]) -> int:
+        """Drop answers built from any of these URLs and bump their generations.
+
+        Runs in the caller's transaction, so it commits together with the new knowledge.
+        """
+        urls = [(url,) for url in set(source_urls)]
+        if not urls:
+            return 0
+
+        conn.executemany('''
+            INSERT INTO answer_source_generations (source_url, generation) VALUES (?, 1)
+            ON CONFLICT(source_url) DO UPDATE SET generation = generation + 1
+        ''', urls)
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS changed_sources (source_url TEXT PRIMARY KEY)')
+        conn.execute('DELETE FROM changed_sources')
+        conn.executemany('INSERT OR IGNORE INTO changed_sources VALUES (?)', urls)
+        removed = conn.execute('''
+            DELETE FROM answer_cache WHERE key IN (
+                SELECT s.key FROM answer_sources s JOIN changed_sources c ON c.source_url = s.source_url
+            )
+        ''').rowcount
+        conn.execute('DELETE FROM answer_sources WHERE key NOT IN (SELECT key FROM answer_cache)')
+        conn.execute('DELETE FROM changed_sources')
+        self._count('invalidations', removed)
+        return removed
+
+    def usage(self) -> Dict:
+        with connection(self.path) as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM answer_cache').fetchone()[0]
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['near_hits'] + stats['misses']
+        hit_rate = (stats['hits'] + stats['near_hits']) / lookups if lookups else 0.0
+        return dict(stats, entries=entries, max_entries=self.max_entries, hit_rate=hit_rate)
+
+    def clear(self):
+        with connection(self.path) as conn:
+            conn.execute('DELETE FROM answer_sources')
+            conn.execute('DELETE FROM answer_cache')
+
+
+describe('assistant_answer_cache_events_total', "Answer cache hits, near hits, misses, invalidations, evictions and stale answers refused")
+
+
+def init_answer_cache(conn: sqlite3.Connection):
+    """Create the answer cache tables in a knowledge database"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS answer_cache (
+            key TEXT PRIMARY KEY,
+            query TEXT NOT NULL,
+            model TEXT NOT NULL,
+            context_hash TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_answer_cache_context ON answer_cache(context_hash, model)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_answer_cache_access ON answer_cache(last_access)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS answer_sources (
+            key TEXT NOT NULL,
+            source_url TEXT NOT NULL,
+            PRIMARY KEY (key, source_url)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_answer_sources_url ON answer_sources(source_url)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS answer_source_generations (
+            source_url TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        )
+    ''')
+
+
+if __name__ == "__main__":
+    db_path = next((arg for arg in sys.argv[1:] if not arg.startswith('--')), 'ai_assistant.db')
+    cache = AnswerCache(db_path)
+    if '--clear' in sys.argv[1:]:
+        cache.clear()
+        print("Answer cache cleared")
+    print(cache.usage())
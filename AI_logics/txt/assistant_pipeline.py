@@ -0,0 +1,154 @@
+"""
+Non-interactive retrieval -> scrape -> LLM pipeline.
+
+The same steps as `voice_assistant.main_loop`, without prompts or speech, so
+other front ends (the Flask backend) can serve many chat sessions from one
+process. Requests run on a thread pool so retrieval and web fetches overlap,
+while a semaphore caps how many LLM generations hit Ollama at once. A bounded
+number of requests may wait behind those; anything beyond that is rejected
+with `Overloaded` instead of piling up.
+"""
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import voice_assistant as va
+from shared import shared
+from telemetry import trace
+
+# ===== CONFIGURATION ===== #
+MAX_CONCURRENT_LLM = 2  # generations running against Ollama at once
+MAX_QUEUED = 16  # requests allowed to wait for a free slot
+STREAM_TIMEOUT = 300  # seconds a stream consumer waits for the next token
+
+_END = object()
+
+
+class Overloaded(Exception):
+    """Raised when the wait queue is full"""
+
+    def __init__(self, queued: int):
+        super().__init__(f"Assistant is busy ({queued} requests waiting)")
+        self.queued = queued
+
+
+class AssistantPipeline:
+    """Thread-safe question answering over local knowledge, the web and the LLM"""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_LLM, max_queued: int = MAX_QUEUED,
+                 web_fallback: bool = True):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.web_fallback = web_fallback
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent + max_queued,
+                                            thread_name_prefix='assistant')
+        # Each request's semantic and web search overlap on a pool of their own
+        self._retrieval = ThreadPoolExecutor(max_workers=2 * (max_concurrent + max_queued),
+                                             thread_name_prefix='assistant-retrieve')
+        self._llm_slots = threading.BoundedSemaphore(max_concurrent)
+        self._pending = 0  # running + queued
+        self._lock = threading.Lock()
+        va.init_db()
+        va.sync_vector_index()  # existing knowledge is searchable by meaning, not just new rows
+
+    # ----- pipeline steps ----- #
+    def retrieve(self, query: str, use_web: Optional[bool] = None) -> List[Dict]:
+        """Local knowledge, plus the best web chunks when asked (or when WEB_POLICY calls for them)"""
+        if use_web is None:
+            policy = None if self.web_fallback else 'never'  # None: the assistant's WEB_POLICY
+        else:
+            policy = 'always' if use_web else 'never'
+        return va.gather_context(query, policy, self._retrieval)
+
+    def answer(self, query: str, use_web: Optional[bool] = None) -> Dict:
+        """Run the whole pipeline synchronously on the calling thread"""
+        with trace('ask', streamed=False):
+            context = self.retrieve(query, use_web)
+            with self._llm_slots:
+                response = va.generate_response(query, context)
+        return {
+            "answer": response,
+            "sources": sorted({item['source'] for item in context if item.get('source')})
+        }
+
+    # ----- admission control ----- #
+    @property
+    def queued(self) -> int:
+        """Requests waiting for a free slot"""
+        with self._lock:
+            return max(0, self._pending - self.max_concurrent)
+
+    def _admit(self) -> int:
+        """Reserve a place; returns the queue position (0 = runs immediately)"""
+        with self._lock:
+            position = max(0, self._pending - self.max_concurrent + 1)
+            if position > self.max_queued:
+                raise Overloaded(self._pending - self.max_concurrent)
+            self._pending += 1
+            return position
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, query: str, use_web: Optional[bool] = None) -> Tuple[Future, int]:
+        """Queue a question; returns (future of the answer dict, queue position)"""
+        position = self._admit()
+        try:
+            future = self._executor.submit(self.answer, query, use_web)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future, position
+
+    def submit_stream(self, query: str, use_web: Optional[bool] = None) -> Tuple[Iterator[Dict], int]:
+        """Queue a question whose answer is streamed.
+
+        Returns (events, queue position). Events are dicts: {"sources": [...]}
+        once retrieval is done, {"token": "..."} per generated token, and
+        {"error": "..."} if the pipeline fails.
+        """
+        events = queue.Queue()
+
+        def run():
+            try:
+                with trace('ask', streamed=True):
+                    context = self.retrieve(query, use_web)
+                    events.put({"sources": sorted({item['source'] for item in context if item.get('source')})})
+                    with self._llm_slots:
+                        for token in va.generate_response_stream(query, context):
+                            events.put({"token": token})
+            except Exception as e:
+                events.put({"error": str(e)})
+            finally:
+                events.put(_END)
+
+        position = self._admit()
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        def iterate() -> Iterator[Dict]:
+            while True:
+                try:
+                    event = events.get(timeout=STREAM_TIMEOUT)
+                except queue.Empty:
+                    yield {"error": "Timed out waiting for the model"}
+                    return
+                if event is _END:
+                    return
+                yield event
+
+        return iterate(), position
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._retrieval.shutdown(wait=False, cancel_futures=True)
+
+
+get_pipeline = shared(AssistantPipeline)
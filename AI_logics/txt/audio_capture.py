@@ -0,0 +1,402 @@
+"""
+Always-on audio capture with voice-activity detection.
+
+One capture thread keeps a single input stream open for the whole session
+and cuts it into utterances with an energy-based VAD: a short pre-roll ring
+buffer keeps the first syllable, an utterance ends after a stretch of
+silence, and the noise floor is re-estimated continuously from non-speech
+frames instead of a 0.5 s calibration before every turn. Background noise
+that rises above the speech threshold (a fan, a TV) never has a quiet frame,
+so an utterance that stays loud for SUSTAINED_LOUD_S is dropped and the floor
+re-calibrated from it. Finished utterances
+are queued for speech recognition.
+
+The microphone also hears the assistant's own voice, so capture takes a
+`paused` callback (the speech worker's `speaking` flag): while it is true, and
+for a short tail afterwards, frames are dropped instead of segmented. Speech
+clearly louder than that echo is a barge-in: `on_barge_in` is called (to cut
+playback off) and the utterance is captured from its first frames.
+
+The source can be the microphone or a WAV file replayed frame by frame, so
+the whole path can be exercised offline:
+    python audio_capture.py test.wav [--realtime] [--recognize]
+"""
+import sys
+import math
+import time
+import queue
+import wave
+import threading
+from array import array
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from lazy_imports import lazy_import
+
+sr = lazy_import('speech_recognition')
+
+# ===== CONFIGURATION ===== #
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+PRE_ROLL_MS = 300  # audio kept from before speech was detected
+START_FRAMES = 3  # consecutive loud frames that open an utterance
+END_SILENCE_MS = 700  # trailing silence that closes it
+MIN_UTTERANCE_MS = 250  # shorter bursts are clicks and coughs
+MAX_UTTERANCE_S = 15
+SPEECH_RATIO = 3.0  # speech = frame energy this many times the noise floor
+MIN_ENERGY = 150  # floor for the threshold in silent rooms (16-bit RMS)
+NOISE_ADAPT = 0.05  # how fast the noise floor follows non-speech frames
+SUSTAINED_LOUD_S = 4  # speech has gaps; this long without one is new background noise
+QUEUE_SIZE = 8  # utterances waiting for recognition; older ones are dropped
+PLAYBACK_TAIL_MS = 300  # keep ignoring the microphone this long after playback (room echo)
+BARGE_IN_RATIO = 2.0  # during playback, speech must be this many times louder than the echo
+BARGE_IN_FRAMES = 5  # consecutive frames that loud before playback is cut off
+ECHO_WINDOW_S = 2  # playback heard recently, the reference for barge-in
+
+
+class Utterance:
+    """A cut piece of 16-bit mono audio"""
+
+    def __init__(self, frames: bytes, sample_rate: int, started: float):
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+        self.started = started  # seconds into the stream
+        self.duration = len(frames) / (2 * sample_rate)
+
+    def to_audio_data(self):
+        """As speech_recognition.AudioData, for the recognizers"""
+        return sr.AudioData(self.frames, self.sample_rate, self.sample_width)
+
+    def __repr__(self):
+        return f"<Utterance {self.started:.2f}s +{self.duration:.2f}s>"
+
+
+def frame_rms(frame: bytes) -> float:
+    samples = array('h', frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def to_mono16(data: bytes, channels: int, width: int) -> bytes:
+    """Downmix interleaved PCM to 16-bit mono"""
+    if width == 2:
+        samples = array('h', data)
+    elif width == 1:
+        samples = array('h', ((b - 128) << 8 for b in data))
+    elif width == 4:
+        samples = array('h', (s >> 16 for s in array('i', data)))
+    else:
+        raise ValueError(f"Unsupported sample width {width}")
+    if channels > 1:
+        samples = array('h', (sum(samples[i:i + channels]) // channels
+                              for i in range(0, len(samples), channels)))
+    return samples.tobytes()
+
+
+def read_wav(path: str) -> Tuple[bytes, int]:
+    """Whole WAV file as (16-bit mono frames, sample rate)"""
+    with wave.open(path, 'rb') as wav:
+        data = wav.readframes(wav.getnframes())
+        return to_mono16(data, wav.getnchannels(), wav.getsampwidth()), wav.getframerate()
+
+
+class UtteranceSegmenter:
+    """Energy VAD with an adaptive noise floor; feed frames, get utterances"""
+
+    def __init__(self, sample_rate: int, frame_ms: int = FRAME_MS):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.noise_floor: Optional[float] = None
+        self.recalibrations = 0
+        self._pre_roll = deque(maxlen=max(1, PRE_ROLL_MS // frame_ms))
+        self._voiced: List[bytes] = []
+        self._loud_energies: List[float] = []  # unbroken loud stretch of the open utterance
+        self._loud_run = 0
+        self._silent_run = 0
+        self._pre_rolled = 0  # frames of the open utterance that came from the pre-roll
+        self._position = 0.0  # seconds of audio seen
+        self._started = 0.0
+
+    @property
+    def threshold(self) -> float:
+        return max(MIN_ENERGY, (self.noise_floor or 0.0) * SPEECH_RATIO)
+
+    def _adapt(self, energy: float):
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        else:
+            self.noise_floor += NOISE_ADAPT * (energy - self.noise_floor)
+
+    def feed(self, frame: bytes) -> Optional[Utterance]:
+        """Process one frame; returns an utterance when one has just ended"""
+        energy = frame_rms(frame)
+        loud = energy > self.threshold
+        self._position += self.frame_ms / 1000
+
+        if not self._voiced:
+            self._pre_roll.append(frame)
+            if not loud:
+                self._loud_run = 0
+                self._adapt(energy)
+                return None
+            self._loud_run += 1
+            if self._loud_run >= START_FRAMES:
+                self._voiced = list(self._pre_roll)
+                self._pre_rolled = len(self._voiced) - START_FRAMES
+                self._started = self._position - len(self._voiced) * self.frame_ms / 1000
+                self._pre_roll.clear()
+                self._silent_run = 0
+            return None
+
+        self._voiced.append(frame)
+        self._silent_run = 0 if loud else self._silent_run + 1
+        if not loud:
+            self._loud_energies = []
+        else:
+            self._loud_energies.append(energy)
+            if len(self._loud_energies) * self.frame_ms >= SUSTAINED_LOUD_S * 1000:
+                self._recalibrate()
+                return None
+        too_long = len(self._voiced) * self.frame_ms >= MAX_UTTERANCE_S * 1000
+        if self._silent_run * self.frame_ms >= END_SILENCE_MS or too_long:
+            return self._finish()
+        return None
+
+    def flush(self) -> Optional[Utterance]:
+        """End of stream: whatever speech is still open"""
+        return self._finish() if self._voiced else None
+
+    def reset(self):
+        """Drop any open utterance (e.g. while the assistant is talking); keeps the noise floor"""
+        self._pre_roll.clear()
+        self._voiced, self._loud_energies, self._loud_run, self._silent_run = [], [], 0, 0
+
+    def rewind(self, frames: int):
+        """Frames that were skipped are about to be fed after all"""
+        self._position -= frames * self.frame_ms / 1000
+
+    def skip(self):
+        """A frame that isn't segmented (muted); keeps `started` counting from the stream start"""
+        self.reset()
+        self._position += self.frame_ms / 1000
+
+    def _recalibrate(self):
+        """The 'utterance' is steady noise: take its median energy as the new floor"""
+        energies = sorted(self._loud_energies)
+        self.noise_floor = energies[len(energies) // 2]
+        self.recalibrations += 1
+        self.reset()
+
+    def _finish(self) -> Optional[Utterance]:
+        voiced = self._voiced[:len(self._voiced) - self._silent_run] or self._voiced
+        self._voiced, self._loud_energies, self._loud_run, self._silent_run = [], [], 0, 0
+        if (len(voiced) - self._pre_rolled) * self.frame_ms < MIN_UTTERANCE_MS:
+            return None
+        return Utterance(b''.join(voiced), self.sample_rate, self._started)
+
+
+# ===== SOURCES ===== #
+class WavSource:
+    """Replay a WAV file as if it came from a microphone"""
+
+    def __init__(self, path: str, realtime: bool = False, frame_ms: int = FRAME_MS):
+        self.path = path
+        self.realtime = realtime
+        self.frame_ms = frame_ms
+        with wave.open(path, 'rb') as wav:
+            self.sample_rate = wav.getframerate()
+
+    def frames(self) -> Iterator[bytes]:
+        with wave.open(self.path, 'rb') as wav:
+            channels, width = wav.getnchannels(), wav.getsampwidth()
+            per_frame = self.sample_rate * self.frame_ms // 1000
+            while True:
+                data = wav.readframes(per_frame)
+                if len(data) < per_frame * channels * width:
+                    break
+                if self.realtime:
+                    time.sleep(self.frame_ms / 1000)
+                yield to_mono16(data, channels, width)
+
+    def close(self):
+        pass
+
+
+class MicrophoneSource:
+    """One microphone stream, kept open for the whole session"""
+
+    def __init__(self, device_index: Optional[int] = None, sample_rate: int = SAMPLE_RATE,
+                 frame_ms: int = FRAME_MS):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self._microphone = sr.Microphone(device_index=device_index, sample_rate=sample_rate,
+                                         chunk_size=sample_rate * frame_ms // 1000)
+        self._closed = threading.Event()
+
+    def frames(self) -> Iterator[bytes]:
+        with self._microphone as source:
+            per_frame = source.CHUNK
+            while not self._closed.is_set():
+                yield to_mono16(source.stream.read(per_frame), 1, source.SAMPLE_WIDTH)
+
+    def close(self):
+        self._closed.set()
+
+
+# ===== CAPTURE ===== #
+class AudioCapture:
+    """Capture thread: source -> VAD -> queue of utterances"""
+
+    def __init__(self, source, queue_size: int = QUEUE_SIZE, paused: Optional[Callable[[], bool]] = None,
+                 on_barge_in: Optional[Callable[[], None]] = None):
+        self.source = source
+        self.segmenter = UtteranceSegmenter(source.sample_rate, source.frame_ms)
+        self.utterances: "queue.Queue[Utterance]" = queue.Queue(maxsize=queue_size)
+        self.paused = paused or (lambda: False)
+        self.on_barge_in = on_barge_in
+        self.stats = {'utterances': 0, 'dropped': 0, 'cleared': 0, 'muted_frames': 0, 'barge_ins': 0}
+        self._muted_until = 0.0
+        self._echo = deque(maxlen=ECHO_WINDOW_S * 1000 // source.frame_ms)  # playback energies heard
+        self._barge_frames = deque(maxlen=BARGE_IN_FRAMES)
+        self._barged_in = False  # playback is being cut off; listen until it has stopped
+        self.finished = threading.Event()
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name='audio-capture', daemon=True)
+
+    def start(self) -> "AudioCapture":
+        self._thread.start()
+        return self
+
+    def _emit(self, utterance: Optional[Utterance]):
+        if utterance is None:
+            return
+        self.stats['utterances'] += 1
+        while True:
+            try:
+                self.utterances.put_nowait(utterance)
+                return
+            except queue.Full:
+                # Nobody is listening; keep the newest speech
+                try:
+                    self.utterances.get_nowait()
+                    self.stats['dropped'] += 1
+                except queue.Empty:
+                    pass
+
+    def _muted(self) -> bool:
+        if self.paused():
+            if self._barged_in:
+                return False
+            self._muted_until = time.monotonic() + PLAYBACK_TAIL_MS / 1000
+            return True
+        self._barged_in = False
+        return time.monotonic() < self._muted_until
+
+    def _barge_in(self, frame: bytes) -> bool:
+        """Muted frame: True once the user has been talking over the playback for BARGE_IN_FRAMES"""
+        if self.on_barge_in is None:
+            return False
+        energy = frame_rms(frame)
+        if energy > self.segmenter.threshold:
+            # Needs some playback heard first, so the jump from silence to the echo isn't a barge-in
+            echo = sorted(self._echo)
+            if len(echo) >= 2 * BARGE_IN_FRAMES and energy > BARGE_IN_RATIO * echo[len(echo) // 2]:
+                self._barge_frames.append(frame)
+                return len(self._barge_frames) == BARGE_IN_FRAMES
+            self._echo.append(energy)
+        self._barge_frames.clear()
+        return False
+
+    def _run(self):
+        try:
+            for frame in self.source.frames():
+                if self._muted():
+                    self.stats['muted_frames'] += 1
+                    self.segmenter.skip()
+                    if not self._barge_in(frame):
+                        continue
+                    self.stats['barge_ins'] += 1
+                    self._barged_in, self._muted_until = True, 0.0
+                    self._echo.clear()
+                    self.on_barge_in()
+                    # The loud frames so far open the utterance
+                    self.segmenter.rewind(BARGE_IN_FRAMES)
+                    for loud in list(self._barge_frames)[:-1]:
+                        self._emit(self.segmenter.feed(loud))
+                    self._barge_frames.clear()
+                self._emit(self.segmenter.feed(frame))
+            self._emit(self.segmenter.flush())
+        except Exception as e:
+            self.error = e
+            print(f"Audio capture error: {e}")
+        finally:
+            self.finished.set()
+
+    def clear(self) -> int:
+        """Discard queued utterances, e.g. speech heard while a turn was being processed"""
+        cleared = 0
+        try:
+            while True:
+                self.utterances.get_nowait()
+                cleared += 1
+        except queue.Empty:
+            pass
+        self.stats['cleared'] += cleared
+        return cleared
+
+    def get(self, timeout: Optional[float] = None,
+            interrupted: Optional[Callable[[], bool]] = None) -> Optional[Utterance]:
+        """Next utterance, or None after `timeout` seconds of listening (or once a replay is exhausted).
+
+        Time spent paused doesn't count towards the timeout, but `interrupted`
+        (e.g. a typed line is waiting) returns None at once, paused or not.
+        """
+        listened, last = 0.0, time.monotonic()
+        while True:
+            try:
+                return self.utterances.get(timeout=0.1)
+            except queue.Empty:
+                if self.finished.is_set() and self.utterances.empty():
+                    return None
+                if interrupted is not None and interrupted():
+                    return None
+                now = time.monotonic()
+                if not self.paused():
+                    listened += now - last
+                last = now
+                if timeout is not None and listened >= timeout:
+                    return None
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def close(self):
+        self.source.close()
+        self._thread.join(timeout=1)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    source = WavSource(args[0], realtime='--realtime' in sys.argv) if args else MicrophoneSource()
+    capture = AudioCapture(source).start()
+    recognizer = sr.Recognizer() if '--recognize' in sys.argv else None
+    try:
+        while True:
+            utterance = capture.get()
+            if utterance is None:
+                break
+            line = f"{utterance} threshold {capture.segmenter.threshold:.0f}"
+            if recognizer is not None:
+                try:
+                    line += f": {recognizer.recognize_google(utterance.to_audio_data())}"
+                except Exception as e:
+                    line += f": ({e.__class__.__name__})"
+            print(line)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+    print(f"[Capture]: {capture.stats}")
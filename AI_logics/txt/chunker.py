@@ -0,0 +1,112 @@
+"""
+Paragraph-level chunking of scraped pages.
+
+Walks a page's headings and paragraphs in document order and packs them into
+overlapping, size-bounded chunks, each labelled with the page title and the
+section it came from, so a whole article can be stored as separate
+`knowledge_base` rows instead of being cut off after 2000 characters.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ===== CONFIGURATION ===== #
+CHUNK_MAX_CHARS = 1200
+CHUNK_OVERLAP = 200
+MIN_PARAGRAPH_CHARS = 50  # shorter paragraphs are usually captions or stubs
+
+HEADING_TAGS = ('h2', 'h3', 'h4')
+SKIP_SECTIONS = {'references', 'external links', 'further reading', 'see also', 'notes', 'bibliography'}
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def iter_blocks(soup) -> Iterator[Tuple[Optional[str], str]]:
+    """Yield (section heading, paragraph text) pairs in document order"""
+    section = None
+    for element in soup.find_all(('p',) + HEADING_TAGS):
+        if element.name in HEADING_TAGS:
+            for edit_link in element.select('.mw-editsection'):
+                edit_link.decompose()
+            section = ' '.join(element.get_text().split()) or None
+            continue
+
+        if section and section.lower() in SKIP_SECTIONS:
+            continue
+
+        text = ' '.join(element.get_text().split())
+        if len(text) > MIN_PARAGRAPH_CHARS:
+            yield section, text
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Break an oversized paragraph on sentence, then word, boundaries"""
+    pieces, current = [], ''
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _tail(text: str, overlap: int) -> str:
+    """Last `overlap` characters of a chunk, starting on a word boundary"""
+    if overlap <= 0 or len(text) <= overlap:
+        return text if overlap > 0 else ''
+    tail = text[-overlap:]
+    space = tail.find(' ')
+    return tail[space + 1:] if space != -1 else tail
+
+
+def chunk_blocks(blocks: Iterable[Tuple[Optional[str], str]], title: Optional[str] = None,
+                 max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP) -> Iterator[Dict]:
+    """Pack paragraphs into chunks of at most `max_chars` characters of body text.
+
+    Chunks never span sections; consecutive chunks of the same section share
+    up to `overlap` characters so a sentence cut at a boundary stays findable.
+    Each yielded chunk is {"section", "position", "content"}, with the heading
+    prefixed to the content.
+    """
+    position = 0
+    current_section, body = None, ''
+
+    def emit(section, text):
+        nonlocal position
+        heading = ' / '.join(part for part in (title, section) if part)
+        chunk = {
+            "section": section,
+            "position": position,
+            "content": f"[{heading}] {text}" if heading else text
+        }
+        position += 1
+        return chunk
+
+    for section, paragraph in blocks:
+        if section != current_section:
+            if body:
+                yield emit(current_section, body)
+            current_section, body = section, ''
+
+        # Room for a piece after the overlap carried over and the space joining them
+        piece_chars = max_chars - overlap - 1 if overlap + 1 < max_chars else max_chars
+        for piece in _split_long(paragraph, piece_chars):
+            if body and len(body) + 1 + len(piece) > max_chars:
+                yield emit(current_section, body)
+                body = _tail(body, overlap)
+            body = f"{body} {piece}".strip()
+
+    if body:
+        yield emit(current_section, body)
@@ -0,0 +1,106 @@
+"""
+Token-budgeted packing of retrieved context for the LLM prompt.
+
+Ranks context items by retrieval score, drops passages that mostly repeat one
+already chosen, and fills a fixed token budget so the prompt never overflows
+`num_ctx` and the prefill isn't spent on low-value text.
+
+Scores from different retrievers aren't comparable (hybrid scores are in
+[0, 1], FTS5 and in-memory BM25 depend on their own collections), so results
+from several sources are combined with `merge_sources`, which rescales each
+list to [0, 1] first.
+"""
+import re
+from typing import Dict, List, Set
+
+# ===== CONFIGURATION ===== #
+CHARS_PER_TOKEN = 4  # rough average for English text with llama-style tokenizers
+OVERLAP_THRESHOLD = 0.6  # share of shingles already seen that marks a duplicate
+SHINGLE_SIZE = 5
+MIN_PARTIAL_TOKENS = 64  # don't bother squeezing in a truncated item smaller than this
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; good enough to stay inside the context window"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shingles(text: str) -> Set[int]:
+    words = re.findall(r'\w+', text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + SHINGLE_SIZE])) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to roughly `max_tokens`, preferring a sentence boundary"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = max(cut.rfind('. '), cut.rfind('! '), cut.rfind('? '))
+    if sentence_end > limit // 2:
+        return cut[:sentence_end + 1]
+    return cut[:limit - 4].rsplit(' ', 1)[0] + ' ...'  # the marker counts against the budget too
+
+
+def normalize_scores(items: List[Dict]) -> List[Dict]:
+    """Copies of one source's results with scores scaled to [0, 1] by its best score.
+
+    Unscored results (e.g. the LIKE fallback) are scored by rank instead.
+    """
+    best = max((item.get('score') or 0 for item in items), default=0)
+    if best > 0:
+        return [dict(item, score=(item.get('score') or 0) / best) for item in items]
+    return [dict(item, score=1 - i / len(items)) for i, item in enumerate(items)]
+
+
+def merge_sources(*sources: List[Dict]) -> List[Dict]:
+    """Concatenate result lists from different retrievers on a common score scale"""
+    return [item for items in sources for item in normalize_scores(items)]
+
+
+def pack_context(items: List[Dict], budget_tokens: int) -> Dict:
+    """Choose the context items that fit in `budget_tokens`.
+
+    Items are taken best score first; near-duplicates of an already packed
+    item are skipped, and the last item that doesn't fit whole is truncated if
+    enough room is left. Returns {"items", "packed_tokens", "dropped_items",
+    "dropped_tokens"} with the chosen items in rank order.
+    """
+    ranked = sorted(items, key=lambda item: item.get('score') or 0, reverse=True)
+
+    packed, seen = [], set()
+    packed_tokens = dropped_tokens = dropped_items = 0
+
+    for item in ranked:
+        content = item.get('content') or ''
+        tokens = estimate_tokens(content)
+        remaining = budget_tokens - packed_tokens
+
+        shingles = _shingles(content)
+        if shingles and len(shingles & seen) / len(shingles) >= OVERLAP_THRESHOLD:
+            dropped_items += 1
+            dropped_tokens += tokens
+            continue
+
+        if tokens > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                dropped_items += 1
+                dropped_tokens += tokens
+                continue
+            content = _truncate(content, remaining)
+            dropped_tokens += tokens - estimate_tokens(content)
+            tokens = estimate_tokens(content)
+            item = dict(item, content=content)
+
+        packed.append(item)
+        seen |= shingles
+        packed_tokens += tokens
+
+    return {
+        "items": packed,
+        "packed_tokens": packed_tokens,
+        "dropped_items": dropped_items,
+        "dropped_tokens": dropped_tokens
+    }
@@ -0,0 +1,236 @@
+"""
+One knowledge store: schema migrations and ingest of the legacy sources.
+
+`knowledge_base` in ai_assistant.db is the single store the assistant
+queries. The older copies of the same content - `cultural_info` in
+cultural_data.db / cameroon_culture.db and the JSON dumps - are streamed into
+it with normalized categories, chunked like scraped pages and deduplicated by
+content hash. Each ingested file is recorded with its checksum, so re-running
+only picks up files that changed. The schema version lives in
+`PRAGMA user_version`.
+
+    python knowledge_ingest.py [--force] [extra .db / .json / .ndjson files]
+"""
+import os
+import sys
+import json
+import hashlib
+import sqlite3
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import unquote, urlparse
+
+from chunker import CHUNK_MAX_CHARS, MIN_PARAGRAPH_CHARS, chunk_blocks
+from knowledge_store import (ORIGIN_INGEST, ensure_chunk_columns, ensure_dedup_schema, ensure_origin_column,
+                             upsert_knowledge)
+from search_index import KNOWN_TABLES
+
+# ===== CONFIGURATION ===== #
+DATA_DIR = os.environ.get('ASSISTANT_DATA_DIR', '')
+LEGACY_SOURCES = tuple(os.path.join(DATA_DIR, name) for name in (
+    'cultural_data.db', 'cameroon_culture.db', 'cultural_data.json', 'web_data.json'
+))
+SCHEMA_VERSION = 3
+INGEST_BATCH = 500  # rows upserted per executemany
+CATEGORY_ALIASES = {
+    '': 'general',
+    'web': 'web_scrape',
+    'scrape': 'web_scrape',
+    'food': 'cuisine',
+    'heritage': 'unesco',
+}
+
+
+def normalize_category(category: Optional[str]) -> str:
+    """Lower-case snake_case category, with known synonyms merged"""
+    name = '_'.join((category or '').lower().replace('-', ' ').split())
+    return CATEGORY_ALIASES.get(name, name)
+
+
+# ===== MIGRATIONS ===== #
+def _migrate_dedup(conn: sqlite3.Connection):
+    ensure_chunk_columns(conn, 'knowledge_base')
+    removed = ensure_dedup_schema(conn, 'knowledge_base')
+    if removed:
+        print(f"Removed {removed} duplicate knowledge entries")
+
+
+def _migrate_ingest_log(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingested_sources (
+            path TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            ingested_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.create_function('normalize_category', 1, normalize_category, deterministic=True)
+    conn.execute('''
+        UPDATE knowledge_base SET category = normalize_category(category)
+        WHERE category != normalize_category(category)
+    ''')
+
+
+def _migrate_origin(conn: sqlite3.Connection):
+    ensure_origin_column(conn, 'knowledge_base')
+    # Read every legacy file once more so the rows it holds are tagged as ingested
+    conn.execute('DELETE FROM ingested_sources')
+
+
+MIGRATIONS = {
+    1: _migrate_dedup,
+    2: _migrate_ingest_log,
+    3: _migrate_origin,
+}
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations to a knowledge database; returns the schema version"""
+    version = schema_version(conn)
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[target](conn)
+        conn.execute(f'PRAGMA user_version = {target}')
+        version = target
+    return version
+
+
+# ===== INGEST ===== #
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _title(source_url: str) -> Optional[str]:
+    """Page title from a wiki-style URL, used to label chunks"""
+    name = unquote(urlparse(source_url or '').path.rstrip('/').rsplit('/', 1)[-1])
+    return name.replace('_', ' ') or None
+
+
+def split_item(item: Dict) -> List[Dict]:
+    """Cut whole-page dumps into chunks like the scraper stores"""
+    content = (item.get('content') or '').strip()
+    if len(content) <= CHUNK_MAX_CHARS:
+        return [item]
+
+    paragraphs = [(None, ' '.join(line.split())) for line in content.split('\n')
+                  if len(line.strip()) > MIN_PARAGRAPH_CHARS]
+    return [dict(item, content=chunk['content'], section=chunk['section'], position=chunk['position'])
+            for chunk in chunk_blocks(paragraphs, _title(item.get('source')))]
+
+
+def iter_source_items(path: str, batch: int = INGEST_BATCH) -> Iterator[Dict]:
+    """{source, category, content} items from a legacy database or JSON dump"""
+    if path.endswith('.db'):
+        # Read-only, so ingesting never rewrites the legacy files
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in KNOWN_TABLES:
+                if table not in tables:
+                    continue
+                cursor = conn.execute(f"SELECT source_url, category, content FROM {table} ORDER BY id")
+                while True:
+                    rows = cursor.fetchmany(batch)
+                    if not rows:
+                        break
+                    for source_url, category, content in rows:
+                        yield {"source": source_url, "category": category, "content": content}
+        finally:
+            conn.close()
+    elif path.endswith(('.ndjson', '.jsonl')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def ingest_file(conn: sqlite3.Connection, path: str, force: bool = False) -> Optional[Dict]:
+    """Stream one source file into knowledge_base unless its checksum is unchanged.
+
+    Returns {"rows", "inserted", "skipped", "changed"} (skipped = rows already
+    stored, changed = source URLs that gained content), or None when the file
+    was skipped.
+    """
+    checksum = file_checksum(path)
+    key = os.path.abspath(path)
+    if not force and conn.execute(
+            'SELECT 1 FROM ingested_sources WHERE path = ? AND checksum = ?', (key, checksum)
+    ).fetchone():
+        return None
+
+    before = conn.execute('SELECT COUNT(*) FROM knowledge_base').fetchone()[0]
+    rows, changed, pending = 0, set(), []
+    for item in iter_source_items(path):
+        if not item.get('content') or not item.get('source'):
+            continue
+        item = dict(item, category=normalize_category(item.get('category') or 'general'))
+        pending.extend(split_item(item))
+        if len(pending) >= INGEST_BATCH:
+            changed |= upsert_knowledge(conn, pending, origin=ORIGIN_INGEST)
+            rows += len(pending)
+            pending = []
+    if pending:
+        changed |= upsert_knowledge(conn, pending, origin=ORIGIN_INGEST)
+        rows += len(pending)
+
+    conn.execute('''
+        INSERT OR REPLACE INTO ingested_sources (path, checksum, rows, ingested_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (key, checksum, rows))
+    # Ingest never deletes, so growth is what was new; the rest were dedup no-ops
+    inserted = conn.execute('SELECT COUNT(*) FROM knowledge_base').fetchone()[0] - before
+    return {"rows": rows, "inserted": inserted, "skipped": rows - inserted, "changed": changed}
+
+
+def ingest_sources(conn: sqlite3.Connection, paths: Iterable[str] = LEGACY_SOURCES,
+                   force: bool = False) -> Dict[str, Dict]:
+    """Ingest every existing source file; returns results for the files that were read"""
+    target = conn.execute('PRAGMA database_list').fetchone()[2]
+    results = {}
+    for path in paths:
+        if not os.path.exists(path) or (target and os.path.samefile(path, target)):
+            continue
+        try:
+            result = ingest_file(conn, path, force)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Ingest error for {path}: {e}")
+            continue
+        if result is not None:
+            results[path] = result
+    return results
+
+
+def changed_sources(results: Dict[str, Dict]) -> Set[str]:
+    return set().union(*(result['changed'] for result in results.values())) if results else set()
+
+
+if __name__ == "__main__":
+    import voice_assistant
+    from sqlite_pool import connection
+
+    force = '--force' in sys.argv[1:]
+    extra = [arg for arg in sys.argv[1:] if arg != '--force']
+
+    voice_assistant.init_db()  # migrates and picks up changed legacy files
+    with connection(voice_assistant.DB_NAME) as conn:
+        results = ingest_sources(conn, (list(LEGACY_SOURCES) if force else []) + extra, force)
+        voice_assistant.get_answer_cache().invalidate_sources(conn, changed_sources(results))
+        total = conn.execute('SELECT COUNT(*) FROM knowledge_base').fetchone()[0]
+        categories = conn.execute(
+            'SELECT category, COUNT(*) FROM knowledge_base GROUP BY category ORDER BY 2 DESC'
+        ).fetchall()
+
+    for path, result in results.items():
+        print(f"{path}: {result['rows']} rows read, {result['inserted']} inserted, "
+              f"{result['skipped']} already stored, {len(result['changed'])} sources changed")
+    print(f"Schema v{SCHEMA_VERSION}, {total} knowledge rows: "
+          + ', '.join(f"{category} {count}" for category, count in categories))
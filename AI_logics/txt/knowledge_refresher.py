@@ -0,0 +1,147 @@
+"""
+Background refresh of scraped knowledge.
+
+Walks the source URLs known from `knowledge_base` and `web_data.json`,
+re-fetches the ones whose chunks are older than SCRAPE_INTERVAL (rate
+limited), and updates their stored chunks in place, so questions are answered
+from a warm local store without network access on the critical path.
+
+Runs as a daemon thread inside the assistant, or standalone:
+    python knowledge_refresher.py [--once]
+"""
+import os
+import sys
+import json
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+from sqlite_pool import connection
+
+# ===== CONFIGURATION ===== #
+SEED_FILES = (os.path.join(os.environ.get('ASSISTANT_DATA_DIR', ''), 'web_data.json'),)
+REFRESH_DELAY = 2.0  # seconds between page fetches, to stay polite to the sites
+REFRESH_BATCH = 50  # most pages refreshed per pass
+CHECK_INTERVAL = 600  # seconds between passes looking for stale sources
+
+
+def seed_sources(paths=SEED_FILES) -> Dict[str, str]:
+    """source URL -> category from the JSON dumps"""
+    sources = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, encoding='utf-8') as f:
+                for item in json.load(f):
+                    if item.get('source'):
+                        sources.setdefault(item['source'], item.get('category') or 'web_scrape')
+        except (OSError, ValueError) as e:
+            print(f"Could not read seed file {path}: {e}")
+    return sources
+
+
+def stale_sources(db_path: str, max_age: float, seeds: Optional[Dict[str, str]] = None,
+                  limit: int = REFRESH_BATCH) -> List[Dict]:
+    """Sources never stored or last refreshed more than `max_age` seconds ago, oldest first"""
+    seeds = seeds or {}
+    with connection(db_path) as conn:
+        rows = conn.execute('''
+            SELECT source_url, MIN(category), MAX(timestamp) AS refreshed
+            FROM knowledge_base
+            GROUP BY source_url
+        ''').fetchall()
+        cutoff = conn.execute(
+            "SELECT datetime('now', ?)", (f'-{int(max_age)} seconds',)
+        ).fetchone()[0]
+
+    known = {url for url, _, _ in rows}
+    stale = [
+        {"source": url, "category": category}
+        for url, category, refreshed in sorted(rows, key=lambda row: row[2] or '')
+        if not refreshed or refreshed < cutoff
+    ]
+    missing = [
+        {"source": url, "category": category}
+        for url, category in seeds.items()
+        if url not in known
+    ]
+    return (missing + stale)[:limit]
+
+
+class KnowledgeRefresher:
+    """Periodically re-fetches stale sources on a daemon thread"""
+
+    def __init__(self, fetch_chunks: Callable[[str], Optional[List[Dict]]],
+                 store_chunks: Callable[[str, List[Dict], str], bool],
+                 db_path: str, max_age: float,
+                 delay: float = REFRESH_DELAY, check_interval: float = CHECK_INTERVAL):
+        self.fetch_chunks = fetch_chunks
+        self.store_chunks = store_chunks
+        self.db_path = db_path
+        self.max_age = max_age
+        self.delay = delay
+        self.check_interval = check_interval
+        self.stats = {'passes': 0, 'refreshed': 0, 'changed': 0, 'failed': 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh_once(self) -> int:
+        """One pass over the stale sources; returns how many were refreshed"""
+        refreshed = 0
+        for source in stale_sources(self.db_path, self.max_age, seed_sources()):
+            if self._stop.is_set():
+                break
+
+            chunks = self.fetch_chunks(source['source'])
+            if chunks:
+                if self.store_chunks(source['source'], chunks, source['category']):
+                    self.stats['changed'] += 1
+                self.stats['refreshed'] += 1
+                refreshed += 1
+            else:
+                self.stats['failed'] += 1
+
+            self._stop.wait(self.delay)
+
+        self.stats['passes'] += 1
+        return refreshed
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception as e:
+                print(f"Knowledge refresh error: {e}")
+            self._stop.wait(self.check_interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='knowledge-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    import voice_assistant
+
+    voice_assistant.init_db()
+    refresher = voice_assistant.create_refresher()
+    if '--once' in sys.argv[1:]:
+        count = refresher.refresh_once()
+        print(f"Refreshed {count} sources: {refresher.stats}")
+    else:
+        print(f"Refreshing sources older than {voice_assistant.SCRAPE_INTERVAL}s every "
+              f"{refresher.check_interval}s (Ctrl+C to stop)")
+        try:
+            while True:
+                refresher.refresh_once()
+                print(f"[Refresher]: {refresher.stats}")
+                time.sleep(refresher.check_interval)
+        except KeyboardInterrupt:
+            pass
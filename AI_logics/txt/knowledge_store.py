@@ -0,0 +1,206 @@
+"""
+Deduplicated writes to the knowledge tables.
+
+Every row carries a hash of its normalized content, and (source_url,
+content_hash) is unique, so storing the same scraped text again only refreshes
+its timestamp instead of adding another copy. Rows also record their origin:
+a refresh only deletes chunks the scraper wrote, never ones ingested from the
+legacy sources (those would not come back).
+
+Run directly to deduplicate existing databases in place:
+    python knowledge_store.py ai_assistant.db cultural_data.db cameroon_culture.db
+"""
+import re
+import sys
+import hashlib
+import sqlite3
+from typing import List, Dict, Set
+
+from search_index import KNOWN_TABLES, DEFAULT_DATABASES, has_search_index, rebuild_search_index
+
+CHUNK_COLUMNS = {'section': 'TEXT', 'chunk_index': 'INTEGER'}
+ORIGIN_SCRAPE = 'scrape'
+ORIGIN_INGEST = 'ingest'  # sticky: a chunk that is also in a legacy source is never deleted
+
+
+def normalize_content(text: str) -> str:
+    """Canonical form used for hashing: case, whitespace and [n] citations ignored"""
+    text = re.sub(r'\[\d+\]', '', text or '')
+    return ' '.join(text.lower().split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(normalize_content(text).encode('utf-8')).hexdigest()
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _dedup_index(table: str) -> str:
+    return f"idx_{table}_dedup"
+
+
+def ensure_dedup_schema(conn: sqlite3.Connection, table: str = 'knowledge_base') -> int:
+    """Add the content_hash column and unique key, collapsing existing duplicates.
+
+    Cheap once the unique index exists. Returns the number of duplicate rows removed.
+    """
+    index = _dedup_index(table)
+    if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)
+    ).fetchone():
+        return 0
+
+    if 'content_hash' not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN content_hash TEXT")
+
+    removed = _collapse_duplicates(conn, table)
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table}(source_url, content_hash)")
+    return removed
+
+
+def _collapse_duplicates(conn: sqlite3.Connection, table: str) -> int:
+    """Hash unhashed rows, then keep one row per (source_url, content_hash)"""
+    conn.create_function('content_hash', 1, content_hash, deterministic=True)
+    conn.execute(f"UPDATE {table} SET content_hash = content_hash(content) WHERE content_hash IS NULL")
+
+    # The surviving copy inherits the most recent timestamp of its group
+    conn.execute(f'''
+        UPDATE {table}
+        SET timestamp = (
+            SELECT MAX(d.timestamp) FROM {table} d
+            WHERE IFNULL(d.source_url, '') = IFNULL({table}.source_url, '')
+              AND d.content_hash = {table}.content_hash
+        )
+        WHERE id IN (
+            SELECT MAX(id) FROM {table}
+            GROUP BY IFNULL(source_url, ''), content_hash
+            HAVING COUNT(*) > 1
+        )
+    ''')
+    cursor = conn.execute(f'''
+        DELETE FROM {table}
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM {table}
+            GROUP BY IFNULL(source_url, ''), content_hash
+        )
+    ''')
+    return cursor.rowcount
+
+
+def ensure_chunk_columns(conn: sqlite3.Connection, table: str = 'knowledge_base'):
+    """Add the section / chunk_index columns to tables created before chunking"""
+    existing = _columns(conn, table)
+    for column, column_type in CHUNK_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def ensure_origin_column(conn: sqlite3.Connection, table: str = 'knowledge_base'):
+    """Add the origin column (scrape / ingest) to tables created before it"""
+    if 'origin' not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN origin TEXT")
+
+
+def upsert_knowledge(conn: sqlite3.Connection, data: List[Dict], category: str = 'web_scrape',
+                     origin: str = ORIGIN_SCRAPE) -> Set[str]:
+    """Insert scraped items, refreshing the timestamp of ones already stored.
+
+    Returns the source URLs that gained new content, so anything derived from
+    those sources (e.g. cached answers) can be invalidated.
+    """
+    rows = [
+        (item['source'], item.get('category', category), item['content'], content_hash(item['content']),
+         item.get('section'), item.get('position'), origin)
+        for item in data
+    ]
+
+    known = set()
+    for source_url in {row[0] for row in rows}:
+        known.update(
+            (source_url, row[0]) for row in conn.execute(
+                'SELECT content_hash FROM knowledge_base WHERE source_url = ?', (source_url,)
+            ).fetchall()
+        )
+
+    conn.executemany('''
+        INSERT INTO knowledge_base (source_url, category, content, content_hash, section, chunk_index, origin)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_url, content_hash) DO UPDATE SET
+            timestamp = CURRENT_TIMESTAMP,
+            section = excluded.section,
+            chunk_index = excluded.chunk_index,
+            origin = CASE WHEN knowledge_base.origin = 'ingest' THEN 'ingest' ELSE excluded.origin END
+    ''', rows)
+
+    return {row[0] for row in rows if (row[0], row[3]) not in known}
+
+
+def replace_source_chunks(conn: sqlite3.Connection, source_url: str, chunks: List[Dict],
+                          category: str = 'web_scrape') -> bool:
+    """Make the stored chunks of one page match a fresh scrape of it.
+
+    Unchanged chunks only get their timestamp refreshed, new ones are inserted
+    and scraped chunks no longer on the page are deleted; rows ingested from
+    the legacy sources under the same URL are kept. Returns True if anything
+    other than timestamps changed.
+    """
+    changed = bool(upsert_knowledge(conn, [dict(chunk, source=source_url) for chunk in chunks], category))
+
+    current = [(content_hash(chunk['content']),) for chunk in chunks]
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS current_chunks (content_hash TEXT PRIMARY KEY)')
+    conn.execute('DELETE FROM current_chunks')
+    conn.executemany('INSERT OR IGNORE INTO current_chunks VALUES (?)', current)
+    removed = conn.execute('''
+        DELETE FROM knowledge_base
+        WHERE source_url = ?
+          AND IFNULL(origin, ?) = ?
+          AND IFNULL(content_hash, '') NOT IN (SELECT content_hash FROM current_chunks)
+    ''', (source_url, ORIGIN_SCRAPE, ORIGIN_SCRAPE)).rowcount
+    conn.execute('DELETE FROM current_chunks')
+
+    return changed or removed > 0
+
+
+def compact(db_path: str):
+    """Deduplicate every knowledge table in a database file and reclaim the space"""
+    with sqlite3.connect(db_path) as conn:
+        tables = [
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()
+            if row[0] in KNOWN_TABLES
+        ]
+        if not tables:
+            print(f"{db_path}: no knowledge tables found, skipping")
+            return
+
+        for table in tables:
+            before = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            removed = ensure_dedup_schema(conn, table)
+            # Rows written without a hash by older code since the last run
+            if removed == 0 and conn.execute(
+                    f"SELECT 1 FROM {table} WHERE content_hash IS NULL LIMIT 1").fetchone():
+                conn.execute(f"DROP INDEX {_dedup_index(table)}")
+                removed = ensure_dedup_schema(conn, table)
+
+            if removed and has_search_index(conn, table):
+                rebuild_search_index(conn, table)
+            print(f"{db_path}: {table} {before} -> {before - removed} rows ({removed} duplicates removed)")
+        conn.commit()
+
+    # VACUUM can't run inside a transaction
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:] or DEFAULT_DATABASES:
+        try:
+            compact(path)
+        except sqlite3.Error as e:
+            print(f"{path}: compaction failed: {e}")
@@ -0,0 +1,67 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+`ollama` (httpx, pydantic), `numpy`, `speech_recognition`, `bs4` and
+`requests` together take a large share of the assistant's start-up time, yet
+none of them is needed to show the first prompt. `lazy_import` returns a
+stand-in that imports the real module on first attribute access, and
+`module_available` answers "is it installed?" without importing anything.
+Load times are kept in LOAD_TIMES for `--profile-startup`.
+"""
+import time
+import importlib
+import importlib.util
+import threading
+from typing import Dict
+
+LOAD_TIMES: Dict[str, float] = {}  # module name -> seconds spent importing it
+
+
+class LazyModule:
+    """Proxy that imports `name` the first time one of its attributes is used.
+
+    Its own attributes are underscored so they can't shadow the module's
+    (`np.load` must reach numpy, not the proxy).
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _import(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    LOAD_TIMES[self._name] = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    @property
+    def _loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._import(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}{' (loaded)' if self._loaded else ''}>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def load_now(module):
+    """Import a lazy module straight away (e.g. to warm it up off the prompt path)"""
+    return module._import() if isinstance(module, LazyModule) else module
+
+
+def module_available(name: str) -> bool:
+    """True if `name` can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
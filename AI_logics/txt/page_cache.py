@@ -0,0 +1,176 @@
+"""
+On-disk cache for scraped web pages.
+
+Keyed by URL, each entry keeps the raw (zlib-compressed) response body, the
+cleaned text extracted from it, the ETag / Last-Modified validators and the
+fetch time. Fresh entries are served without touching the network; stale ones
+are revalidated with a conditional GET. Total size is bounded by evicting the
+least recently used entries.
+
+Run directly to inspect or clear the cache:
+    python page_cache.py [--clear]
+"""
+import os
+import sys
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+from shared import shared
+from telemetry import describe, inc
+
+# ===== CONFIGURATION ===== #
+CACHE_DB = os.path.join(os.environ.get('ASSISTANT_DATA_DIR', ''), "web_cache.db")
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+PAGE_CACHE_METRIC = 'assistant_page_cache_events_total'
+describe(PAGE_CACHE_METRIC, "Web page cache hits, stale hits, misses, revalidations and evictions")
+
+
+class PageCache:
+    """Size-bounded LRU cache of fetched pages backed by SQLite"""
+
+    def __init__(self, path: str = CACHE_DB, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'revalidated': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS page_cache (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                content TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_page_cache_access ON page_cache(last_access)')
+        self._conn.commit()
+
+    def get(self, url: str, ttl: float) -> Tuple[Optional[Dict], bool]:
+        """Look up a URL; returns (entry, is_fresh) and updates the counters"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT body, content, etag, last_modified, fetched_at
+                FROM page_cache WHERE url = ?
+            ''', (url,)).fetchone()
+
+            if row is None:
+                self.stats['misses'] += 1
+                inc(PAGE_CACHE_METRIC, event='misses')
+                return None, False
+
+            self._conn.execute('UPDATE page_cache SET last_access = ? WHERE url = ?', (now, url))
+            self._conn.commit()
+
+            fresh = now - row[4] < ttl
+            self.stats['hits' if fresh else 'stale'] += 1
+            inc(PAGE_CACHE_METRIC, event='hits' if fresh else 'stale')
+
+        return {
+            "url": url,
+            "body": zlib.decompress(row[0]).decode('utf-8'),
+            "content": row[1],
+            "etag": row[2],
+            "last_modified": row[3],
+            "fetched_at": row[4]
+        }, fresh
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """Validators to send with a revalidation request"""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, body: str, content: Optional[str],
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store a freshly downloaded page, evicting old entries if over budget"""
+        blob = zlib.compress(body.encode('utf-8'))
+        size = len(blob) + len(content or '')
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO page_cache
+                    (url, body, content, etag, last_modified, fetched_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (url, blob, content, etag, last_modified, now, now, size))
+            self._evict()
+            self._conn.commit()
+
+    def mark_revalidated(self, url: str, etag: Optional[str] = None,
+                         last_modified: Optional[str] = None):
+        """Record a 304 Not Modified: the stored copy is good for another TTL"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+                UPDATE page_cache
+                SET fetched_at = ?, last_access = ?,
+                    etag = COALESCE(?, etag),
+                    last_modified = COALESCE(?, last_modified)
+                WHERE url = ?
+            ''', (now, now, etag, last_modified, url))
+            self._conn.commit()
+            self.stats['revalidated'] += 1
+            inc(PAGE_CACHE_METRIC, event='revalidated')
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM page_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        cursor = self._conn.execute('SELECT url, size FROM page_cache ORDER BY last_access')
+        victims = []
+        for url, size in cursor.fetchall():
+            if total <= self.max_bytes:
+                break
+            victims.append((url,))
+            total -= size
+
+        self._conn.executemany('DELETE FROM page_cache WHERE url = ?', victims)
+        self.stats['evictions'] += len(victims)
+        inc(PAGE_CACHE_METRIC, len(victims), event='evictions')
+
+    def usage(self) -> Dict:
+        """Counters plus current entry count and size on disk"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_cache'
+            ).fetchone()
+            return dict(self.stats, entries=entries, bytes=size, max_bytes=self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM page_cache')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+get_page_cache = shared(PageCache)
+
+
+if __name__ == "__main__":
+    cache = PageCache()
+    if '--clear' in sys.argv[1:]:
+        cache.clear()
+        print("Page cache cleared")
+
+    usage = cache.usage()
+    print(f"{usage['entries']} cached pages, {usage['bytes'] / 1024:.1f} KiB "
+          f"of {usage['max_bytes'] / 1024:.0f} KiB")
+    cache.close()
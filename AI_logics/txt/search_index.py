@@ -0,0 +1,242 @@
+"""
+Full-text search over the local knowledge tables.
+
+Keeps an FTS5 index in sync with `knowledge_base` (and the older `cultural_info`
+tables) through triggers, and ranks matches with BM25 instead of scanning the
+whole table with LIKE '%query%'.
+
+Raw BM25 scores grow with the collection (rarer terms weigh more), so results
+also carry a `match` in [0, 1]: the score relative to a passage that contains
+every query term once, which can be compared with a fixed threshold.
+
+Run directly to backfill the index into existing databases:
+    python search_index.py ai_assistant.db cultural_data.db cameroon_culture.db
+"""
+import re
+import sys
+import math
+import sqlite3
+from collections import Counter
+from typing import List, Dict, Optional
+
+# ===== CONFIGURATION ===== #
+KNOWN_TABLES = ('knowledge_base', 'cultural_info')
+DEFAULT_DATABASES = ('ai_assistant.db', 'cultural_data.db', 'cameroon_culture.db')
+SEARCH_LIMIT = 3
+MAX_QUERY_TERMS = 12
+
+# Words that match almost every row and only slow the ranking down
+STOPWORDS = {
+    'a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does',
+    'for', 'from', 'how', 'i', 'in', 'is', 'it', 'me', 'of', 'on', 'or', 'tell',
+    'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'which', 'who',
+    'why', 'with', 'you'
+}
+
+
+def fts_table(table: str) -> str:
+    """Name of the FTS5 index attached to a content table"""
+    return f"{table}_fts"
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """Check whether this SQLite build was compiled with FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_search_index(conn: sqlite3.Connection, table: str = 'knowledge_base') -> bool:
+    """Check whether the FTS5 index for a table exists"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (fts_table(table),)
+    ).fetchone()
+    return row is not None
+
+
+def ensure_search_index(conn: sqlite3.Connection, table: str = 'knowledge_base') -> bool:
+    """Create the FTS5 index and its sync triggers, backfilling existing rows.
+
+    Returns False when FTS5 isn't available, so callers can fall back to LIKE.
+    """
+    if has_search_index(conn, table):
+        return True
+    if not fts5_available(conn):
+        return False
+
+    fts = fts_table(table)
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            content,
+            content='{table}',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    # Keep the index in sync with the content table
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+
+    rebuild_search_index(conn, table)
+    return True
+
+
+def rebuild_search_index(conn: sqlite3.Connection, table: str = 'knowledge_base'):
+    """Re-read every row of the content table into the index"""
+    fts = fts_table(table)
+    conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct, lower-cased search terms of a question, stopwords removed"""
+    terms = []
+    for term in re.findall(r'\w+', query.lower()):
+        if term in STOPWORDS or len(term) < 2 or term in terms:
+            continue
+        terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Turn a free-text question into an FTS5 MATCH expression.
+
+    Every term is quoted so user input can never be parsed as FTS syntax, and
+    terms are OR-ed so partial matches still rank instead of returning nothing.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return ' OR '.join(f'"{term}"' for term in terms)
+
+
+def reference_score(conn: sqlite3.Connection, query: str, table: str = 'knowledge_base') -> float:
+    """BM25 of an average-length passage holding each query term once: the sum of the terms' IDFs"""
+    fts = fts_table(table)
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    score = 0.0
+    for term in query_terms(query):
+        df = conn.execute(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?", (f'"{term}"',)).fetchone()[0]
+        # FTS5's idf, including its floor for terms in more than half the rows
+        score += max(math.log((total - df + 0.5) / (df + 0.5)), 1e-6)
+    return score
+
+
+def search(conn: sqlite3.Connection, query: str, table: str = 'knowledge_base',
+           limit: int = SEARCH_LIMIT) -> List[Dict]:
+    """Return the best BM25 matches for a query, best first, with their `match` in [0, 1]"""
+    match = build_match_query(query)
+    if match is None:
+        return []
+
+    fts = fts_table(table)
+    cursor = conn.execute(f'''
+        SELECT t.source_url, t.content, bm25({fts}) AS score
+        FROM {fts}
+        JOIN {table} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH ?
+        ORDER BY score
+        LIMIT ?
+    ''', (match, limit))
+
+    # bm25() is lower-is-better; flip it so higher scores mean more relevant
+    rows = cursor.fetchall()
+    reference = reference_score(conn, query, table) if rows else 0.0
+    return [
+        {"source": row[0], "content": row[1], "score": -row[2],
+         "match": min(1.0, -row[2] / reference) if reference > 0 else 0.0}
+        for row in rows
+    ]
+
+
+def rank_passages(query: str, items: List[Dict], limit: int = SEARCH_LIMIT,
+                  k1: float = 1.2, b: float = 0.75) -> List[Dict]:
+    """BM25-rank in-memory items (e.g. freshly scraped chunks) against a query.
+
+    Same BM25 formula as FTS5's bm25(), with the statistics taken from the
+    given items. Returns copies of the best items with a "score" key.
+    """
+    terms = query_terms(query)
+    if not terms or not items:
+        return []
+
+    docs = [Counter(re.findall(r'\w+', item['content'].lower())) for item in items]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(docs) or 1
+    n = len(docs)
+    idf = {}
+    for term in terms:
+        df = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+
+    ranked = sorted(zip(scores, range(n)), key=lambda pair: -pair[0])
+    return [dict(items[i], score=score) for score, i in ranked[:limit] if score > 0]
+
+
+def backfill(db_path: str, rebuild: bool = False):
+    """Add (or rebuild) the search index in an existing database file"""
+    with sqlite3.connect(db_path) as conn:
+        tables = [
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()
+            if row[0] in KNOWN_TABLES
+        ]
+        if not tables:
+            print(f"{db_path}: no knowledge tables found, skipping")
+            return
+
+        for table in tables:
+            existed = has_search_index(conn, table)
+            if not ensure_search_index(conn, table):
+                print(f"{db_path}: SQLite was built without FTS5, cannot index {table}")
+                continue
+            if existed and rebuild:
+                rebuild_search_index(conn, table)
+
+            # The B-tree index on content can't serve '%query%' lookups
+            conn.execute("DROP INDEX IF EXISTS idx_content_search")
+
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"{db_path}: indexed {count} rows from {table}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rebuild = '--rebuild' in args
+    paths = [arg for arg in args if arg != '--rebuild'] or list(DEFAULT_DATABASES)
+
+    for path in paths:
+        try:
+            backfill(path, rebuild=rebuild)
+        except sqlite3.Error as e:
+            print(f"{path}: search index backfill failed: {e}")
@@ -0,0 +1,38 @@
+"""
+Process-wide objects created on first use.
+
+The fetcher, page cache, assistant pipeline, password hasher and import pool
+are each shared by every thread, but creating them opens files, sessions or
+worker pools, so it waits until something needs them:
+
+    get_fetcher = shared(Fetcher)
+    get_fetcher()           # the first caller creates it, under a lock
+    get_fetcher.current()   # the instance if it exists yet, without creating it
+"""
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class Shared(Generic[T]):
+    """Callable returning the one instance `factory()` builds on the first call"""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def __call__(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def current(self) -> Optional[T]:
+        return self._instance
+
+
+def shared(factory: Callable[[], T]) -> Shared[T]:
+    return Shared(factory)
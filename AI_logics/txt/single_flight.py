@@ -0,0 +1,130 @@
+"""
+Request coalescing ("single flight") for duplicate concurrent work.
+
+When a class asks the same question at once, identical page fetches,
+embeddings and LLM generations would otherwise all run in parallel. Here the
+first caller for a key does the work and everyone else arriving while it is in
+flight shares the result - including a streamed result, which is fanned out
+token by token to every subscriber.
+"""
+import threading
+import contextvars
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight call per key between concurrent callers"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'shared': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run `fn` unless a call for `key` is already in flight, then share its outcome.
+
+        Joiners wait at most `timeout` seconds and get TimeoutError after that;
+        the leader always runs to completion.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['calls'] += 1
+            else:
+                call.waiters += 1
+                self.stats['shared'] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for shared call {key!r}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Broadcast:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.cond = threading.Condition()
+
+
+class SharedStream:
+    """Fan one streamed computation per key out to every concurrent subscriber"""
+
+    def __init__(self):
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._lock = threading.Lock()
+        self.stats = {'streams': 0, 'shared': 0}
+
+    def subscribe(self, key: Hashable, produce: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Iterate the stream for `key`, starting `produce()` if nobody else has.
+
+        The producer runs on its own thread, so a slow or vanished subscriber
+        never stalls the others. Late subscribers first replay what was
+        already produced. Producer errors are re-raised in every subscriber.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = self._streams[key] = _Broadcast()
+                self.stats['streams'] += 1
+                # In the subscriber's context, so its trace sees the producer's spans
+                threading.Thread(target=contextvars.copy_context().run,
+                                 args=(self._produce, key, broadcast, produce),
+                                 name='shared-stream', daemon=True).start()
+            else:
+                self.stats['shared'] += 1
+        return self._follow(broadcast)
+
+    def _produce(self, key: Hashable, broadcast: _Broadcast, produce: Callable[[], Iterator[Any]]):
+        try:
+            for item in produce():
+                with broadcast.cond:
+                    broadcast.items.append(item)
+                    broadcast.cond.notify_all()
+        except BaseException as e:
+            broadcast.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with broadcast.cond:
+                broadcast.finished = True
+                broadcast.cond.notify_all()
+
+    @staticmethod
+    def _follow(broadcast: _Broadcast) -> Iterator[Any]:
+        index = 0
+        while True:
+            with broadcast.cond:
+                while index >= len(broadcast.items) and not broadcast.finished:
+                    broadcast.cond.wait()
+                pending = broadcast.items[index:]
+                finished = broadcast.finished
+            for item in pending:
+                yield item
+            index += len(pending)
+            if finished and index >= len(broadcast.items):
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
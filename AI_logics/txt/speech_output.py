@@ -0,0 +1,121 @@
+"""
+Incremental speech output for streamed LLM answers.
+
+`SentenceSplitter` turns a stream of tokens into complete sentences, and
+`SpeechWorker` speaks queued sentences on a background thread, so speech can
+start after the first sentence instead of after the whole answer. Playback can
+be interrupted when the user starts a new turn.
+"""
+import re
+import queue
+import threading
+from typing import List, Optional
+
+from telemetry import span
+
+# ===== CONFIGURATION ===== #
+MIN_SENTENCE_CHARS = 20  # avoid speaking "e.g." or "Dr." as their own sentence
+
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n{2,}')
+_LAST_WORD = re.compile(r'(\S+)\.\s*$')
+ABBREVIATIONS = {'dr', 'mr', 'mrs', 'ms', 'prof', 'st', 'mt', 'vs', 'etc', 'e.g', 'i.e', 'no', 'approx', 'ca'}
+
+
+class SentenceSplitter:
+    """Accumulate streamed text and release it one sentence at a time"""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ''
+
+    def feed(self, text: str) -> List[str]:
+        """Add a chunk of streamed text; returns the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.end() - start < self.min_chars or self._abbreviation(match):
+                continue
+            sentence = self._buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def _abbreviation(self, match) -> bool:
+        """A full stop after "e.g." or an initial ("J. Biya") doesn't end the sentence"""
+        if match.group(0).strip() != '.':
+            return False
+        word = _LAST_WORD.search(self._buffer, 0, match.end())
+        if word is None:
+            return False
+        word = word.group(1).lstrip('("\'').lower()
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    def flush(self) -> Optional[str]:
+        """Whatever is left once the stream has ended"""
+        rest, self._buffer = self._buffer.strip(), ''
+        return rest or None
+
+
+class SpeechWorker:
+    """Speaks queued text on a background thread with a pyttsx3 engine"""
+
+    def __init__(self, voice_engine):
+        self.voice_engine = voice_engine
+        self._queue = queue.Queue()
+        self._generation = 0  # bumped on interrupt so stale sentences are skipped
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='speech', daemon=True)
+        self._thread.start()
+
+    def say(self, text: str):
+        """Queue text to be spoken after anything already queued"""
+        with self._lock:
+            self._queue.put((self._generation, text))
+
+    def interrupt(self):
+        """Drop queued speech and cut off the sentence being spoken"""
+        with self._lock:
+            self._generation += 1
+            try:
+                while True:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+            except queue.Empty:
+                pass
+        try:
+            self.voice_engine.stop()
+        except Exception as e:
+            print(f"Voice interrupt error: {e}")
+
+    @property
+    def speaking(self) -> bool:
+        """True while any queued sentence is still to be spoken"""
+        return self._queue.unfinished_tasks > 0
+
+    def wait(self):
+        """Block until everything queued so far has been spoken"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                generation, text = item
+                if generation != self._generation:
+                    continue
+                with span('speak', chars=len(text)):  # synthesis and playback together
+                    self.voice_engine.say(text)
+                    self.voice_engine.runAndWait()
+            except Exception as e:
+                print(f"Voice output error: {e}")
+            finally:
+                self._queue.task_done()
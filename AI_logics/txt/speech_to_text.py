@@ -0,0 +1,306 @@
+"""
+Speech recognition backends behind one interface.
+
+Every backend takes 16-bit mono PCM and returns the recognized text (or None
+when nothing was understood). The offline engines load their model once and
+keep it for the session, so recognition latency is local and the assistant
+keeps working without a network:
+
+    vosk     Kaldi models, fast on CPU (pip install vosk + a model folder)
+    whisper  faster-whisper, int8 on CPU (pip install faster-whisper)
+    sphinx   PocketSphinx through speech_recognition (pip install pocketsphinx)
+    google   the online Google Web Speech API (the previous behaviour)
+
+ASSISTANT_STT picks one; `auto` takes the first offline engine installed and
+falls back to google. Batch mode transcribes a folder of WAV files on a
+process pool and reports the real-time factor (processing time / audio
+length) of each file:
+
+    python speech_to_text.py recordings/ [--backend vosk] [--workers 4]
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from lazy_imports import lazy_import, module_available
+from audio_capture import read_wav
+
+sr = lazy_import('speech_recognition')
+np = lazy_import('numpy')
+
+# ===== CONFIGURATION ===== #
+DATA_DIR = os.environ.get('ASSISTANT_DATA_DIR', '')
+STT_BACKEND = os.environ.get('ASSISTANT_STT', 'auto')
+STT_LANGUAGE = os.environ.get('ASSISTANT_STT_LANGUAGE', 'en')
+VOSK_MODEL_PATH = os.environ.get('VOSK_MODEL_PATH', os.path.join(DATA_DIR, 'models', 'vosk'))
+WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')
+WHISPER_THREADS = int(os.environ.get('WHISPER_THREADS', 0))  # 0: all cores, or cores / workers in batch mode
+WHISPER_RATE = 16000  # whisper only takes 16 kHz input
+AUTO_ORDER = ('vosk', 'whisper', 'sphinx', 'google')
+
+
+class RecognitionError(Exception):
+    """The backend failed (network down, model missing), as opposed to hearing nothing"""
+
+
+class SpeechRecognizer(ABC):
+    """Base class: load the model once, then transcribe PCM frames"""
+    name = ''
+    offline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @classmethod
+    def available(cls) -> bool:
+        return False
+
+    def load(self) -> "SpeechRecognizer":
+        """Load the model; safe to call from a warm-up thread"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        return self
+
+    def _load(self):
+        pass
+
+    def transcribe(self, frames: bytes, sample_rate: int) -> Optional[str]:
+        self.load()
+        text = self._transcribe(frames, sample_rate)
+        return (text or '').strip() or None
+
+    @abstractmethod
+    def _transcribe(self, frames: bytes, sample_rate: int) -> Optional[str]:
+        """Backend-specific recognition of loaded-model input"""
+
+
+class VoskRecognizer(SpeechRecognizer):
+    name = 'vosk'
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH):
+        super().__init__()
+        self.model_path = model_path
+        self._model = None
+
+    @classmethod
+    def available(cls) -> bool:
+        return module_available('vosk') and os.path.isdir(VOSK_MODEL_PATH)
+
+    def _load(self):
+        import vosk
+        vosk.SetLogLevel(-1)
+        try:
+            self._model = vosk.Model(self.model_path)
+        except Exception as e:
+            raise RecognitionError(f"Can't load the Vosk model at {self.model_path}: {e}")
+
+    def _transcribe(self, frames: bytes, sample_rate: int) -> Optional[str]:
+        import vosk
+        recognizer = vosk.KaldiRecognizer(self._model, sample_rate)
+        recognizer.AcceptWaveform(frames)
+        return json.loads(recognizer.FinalResult()).get('text')
+
+
+class WhisperRecognizer(SpeechRecognizer):
+    name = 'whisper'
+
+    def __init__(self, model: str = WHISPER_MODEL, threads: Optional[int] = None):
+        super().__init__()
+        self.model_name = model
+        self.threads = threads or _worker_threads or WHISPER_THREADS or os.cpu_count() or 1
+        self._model = None
+
+    @classmethod
+    def available(cls) -> bool:
+        return module_available('faster_whisper')
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+        try:
+            self._model = WhisperModel(self.model_name, device='cpu', compute_type='int8',
+                                       cpu_threads=self.threads)
+        except Exception as e:
+            raise RecognitionError(f"Can't load the Whisper model {self.model_name}: {e}")
+
+    def _transcribe(self, frames: bytes, sample_rate: int) -> Optional[str]:
+        audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768
+        if sample_rate != WHISPER_RATE:
+            length = int(len(audio) * WHISPER_RATE / sample_rate)
+            audio = np.interp(np.linspace(0, len(audio) - 1, length), np.arange(len(audio)), audio)
+            audio = audio.astype(np.float32)
+        segments, _ = self._model.transcribe(audio, language=STT_LANGUAGE, beam_size=1,
+                                             vad_filter=False, condition_on_previous_text=False)
+        return ' '.join(segment.text.strip() for segment in segments)
+
+
+class _SpeechRecognitionBackend(SpeechRecognizer):
+    """Engines reached through speech_recognition.Recognizer"""
+    method = ''
+
+    @classmethod
+    def available(cls) -> bool:
+        return module_available('speech_recognition')
+
+    def _load(self):
+        self._recognizer = sr.Recognizer()
+
+    def _transcribe(self, frames: bytes, sample_rate: int) -> Optional[str]:
+        audio = sr.AudioData(frames, sample_rate, 2)
+        try:
+            return getattr(self._recognizer, self.method)(audio, **self._options())
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError as e:
+            raise RecognitionError(str(e))
+
+    def _options(self) -> Dict:
+        return {}
+
+
+class SphinxRecognizer(_SpeechRecognitionBackend):
+    name = 'sphinx'
+    method = 'recognize_sphinx'
+
+    @classmethod
+    def available(cls) -> bool:
+        return super().available() and module_available('pocketsphinx')
+
+    def _options(self) -> Dict:
+        return {'language': 'en-US'} if STT_LANGUAGE == 'en' else {'language': STT_LANGUAGE}
+
+
+class GoogleRecognizer(_SpeechRecognitionBackend):
+    name = 'google'
+    method = 'recognize_google'
+    offline = False
+
+
+BACKENDS = {cls.name: cls for cls in (VoskRecognizer, WhisperRecognizer, SphinxRecognizer, GoogleRecognizer)}
+
+_recognizers: Dict[str, SpeechRecognizer] = {}
+_recognizers_lock = threading.Lock()
+
+
+def resolve_backend(name: str = STT_BACKEND) -> str:
+    """Backend name for a setting, resolving `auto` to the best one installed"""
+    if name != 'auto':
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown speech backend {name!r}; choose from {', '.join(BACKENDS)}")
+        return name
+    for candidate in AUTO_ORDER:
+        if BACKENDS[candidate].available():
+            return candidate
+    return 'google'
+
+
+def get_recognizer(name: str = STT_BACKEND) -> SpeechRecognizer:
+    """Shared recognizer for a backend, created once per process"""
+    name = resolve_backend(name)
+    with _recognizers_lock:
+        if name not in _recognizers:
+            _recognizers[name] = BACKENDS[name]()
+        return _recognizers[name]
+
+
+# ===== BATCH TRANSCRIPTION ===== #
+_worker_backend = STT_BACKEND
+_worker_threads = 0  # CPU threads per recognizer in a batch worker; 0 outside batch mode
+
+
+def _init_worker(backend: str, threads: int):
+    global _worker_backend, _worker_threads
+    _worker_backend = backend
+    _worker_threads = threads
+    # Once per process, not per file. A model that can't load breaks the pool
+    # rather than turning every file into the same error
+    get_recognizer(backend).load()
+
+
+def transcribe_file(path: str) -> Dict:
+    """Transcribe one WAV file; returns the text with timing"""
+    try:
+        frames, sample_rate = read_wav(path)
+    except (OSError, EOFError, wave.Error) as e:
+        return {'path': path, 'text': None, 'error': f"unreadable WAV: {e}",
+                'audio_seconds': 0.0, 'seconds': 0.0, 'rtf': 0.0}
+    duration = len(frames) / (2 * sample_rate)
+    start = time.perf_counter()
+    try:
+        text, error = get_recognizer(_worker_backend).transcribe(frames, sample_rate), None
+    except RecognitionError as e:
+        text, error = None, str(e)
+    elapsed = time.perf_counter() - start
+    return {
+        'path': path,
+        'text': text,
+        'error': error,
+        'audio_seconds': duration,
+        'seconds': elapsed,
+        'rtf': elapsed / duration if duration else 0.0
+    }
+
+
+def find_wavs(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(folder, name) for folder, _, names in os.walk(path)
+                         for name in sorted(names) if name.lower().endswith('.wav'))
+        else:
+            files.append(path)
+    return files
+
+
+def transcribe_batch(paths: List[str], backend: str = STT_BACKEND, workers: Optional[int] = None):
+    """Yield transcriptions in input order, spread over a process pool.
+
+    Raises RecognitionError if the workers can't load the model.
+    """
+    backend = resolve_backend(backend)
+    workers = workers or max(1, (os.cpu_count() or 1) // 2)
+    # Split the cores between the processes instead of each one using all of them
+    threads = WHISPER_THREADS or max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend, threads)) as pool:
+        try:
+            yield from pool.map(transcribe_file, paths)
+        except BrokenProcessPool as e:
+            raise RecognitionError(f"The {backend} workers failed to start (see the error above)") from e
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe WAV files and report the real-time factor")
+    parser.add_argument('paths', nargs='+', help="WAV files or folders of them")
+    parser.add_argument('--backend', default=STT_BACKEND, choices=['auto'] + list(BACKENDS))
+    parser.add_argument('--workers', type=int, help="processes (default: half the CPU cores)")
+    args = parser.parse_args()
+
+    files = find_wavs(args.paths)
+    if not files:
+        sys.exit("No WAV files found")
+    backend = resolve_backend(args.backend)
+    print(f"Transcribing {len(files)} files with {backend}")
+
+    start = time.perf_counter()
+    audio = 0.0
+    try:
+        for result in transcribe_batch(files, backend, args.workers):
+            audio += result['audio_seconds']
+            text = result['text'] if result['error'] is None else f"error: {result['error']}"
+            print(f"{result['path']}  {result['audio_seconds']:.1f}s audio  {result['seconds']:.2f}s  "
+                  f"RTF {result['rtf']:.2f}  {text or '(nothing recognized)'}")
+    except RecognitionError as e:
+        sys.exit(f"Speech model error: {e}")
+    wall = time.perf_counter() - start
+    print(f"{audio:.1f}s of audio in {wall:.1f}s wall time (overall RTF {wall / audio if audio else 0:.2f})")
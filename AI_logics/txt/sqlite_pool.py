@@ -0,0 +1,158 @@
+"""
+Pooled SQLite access shared by the assistant and the Flask backend.
+
+Opening a connection per call costs a file open, schema parse and cold page
+cache every time, and the default rollback journal makes every writer block
+every reader. Connections here are opened once per database in WAL mode with
+tuned pragmas and a large prepared-statement cache, and handed out from a
+small pool - a connection is only ever used by one thread at a time, so it
+works for Flask's thread-per-request server as well as long-lived workers.
+
+    with connection(DB_NAME) as conn:   # commits on success, rolls back on error
+        conn.execute(...)
+"""
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from telemetry import observe, register_collector
+
+# ===== CONFIGURATION ===== #
+BUSY_TIMEOUT = 10.0  # seconds a statement waits on a lock before "database is locked"
+STATEMENT_CACHE = 256  # prepared statements kept per connection
+POOL_SIZE = 8  # idle connections kept per database
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, fsyncs only at checkpoints
+    "PRAGMA cache_size = -16000",  # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # read through 256 MB of memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Records how long each statement takes to execute, by database and verb.
+
+    Only the `execute` call is timed: rows fetched lazily afterwards aren't.
+    """
+    database = ''
+
+    def _timed(self, method, sql: str, *args):
+        start = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+            observe('sqlite_statement_seconds', time.perf_counter() - start, db=self.database, op=verb)
+
+    def execute(self, sql: str, *args):
+        return self._timed(super().execute, sql, *args)
+
+    def executemany(self, sql: str, *args):
+        return self._timed(super().executemany, sql, *args)
+
+    def executescript(self, sql: str):
+        return self._timed(super().executescript, sql)
+
+
+class ConnectionPool:
+    """Reusable WAL-mode connections to one database file"""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'reused': 0}
+
+    def _open(self) -> sqlite3.Connection:
+        # Writes take the lock up front (BEGIN IMMEDIATE), so two readers
+        # upgrading to writers can't deadlock and fail without waiting
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level='IMMEDIATE',
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE,
+                               factory=TimedConnection)
+        conn.database = os.path.basename(self.path)
+        conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        if self.path != ':memory:':
+            conn.execute("PRAGMA journal_mode = WAL")
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                self.stats['reused'] += 1
+                return self._idle.pop()
+            self.stats['opened'] += 1
+        return self._open()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self, row_factory: Optional[Callable] = None) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; the transaction commits on success and rolls back on error"""
+        conn = self.acquire()
+        conn.row_factory = row_factory
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str) -> ConnectionPool:
+    """Process-wide pool for a database file"""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def connection(path: str, row_factory: Optional[Callable] = None):
+    """Borrow a pooled connection to `path` (see ConnectionPool.connection)"""
+    return get_pool(path).connection(row_factory)
+
+
+def pool_gauges():
+    """Pool counters for the metrics endpoint"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        labels = {'db': os.path.basename(pool.path)}
+        with pool._lock:
+            idle = len(pool._idle)
+        yield 'sqlite_pool_idle_connections', labels, idle
+        yield 'sqlite_pool_opened_connections', labels, pool.stats['opened']
+        yield 'sqlite_pool_reused_connections', labels, pool.stats['reused']
+
+
+register_collector(pool_gauges)
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
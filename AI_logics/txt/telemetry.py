@@ -0,0 +1,278 @@
+"""
+Latency histograms and per-turn traces for the assistant and the backend.
+
+`span('fetch', url=...)` times a block: the duration goes into a fixed-bucket
+histogram (a few adds under a lock, cheap enough for every SQLite statement)
+and, when a trace is active on this thread, into that trace as a span. A
+trace covers one turn or request; finished traces are appended as one JSON
+line each to ASSISTANT_TRACE_FILE when it is set.
+
+    with trace('turn', mode='voice'):
+        with span('retrieve'):
+            ...
+
+`render_prometheus()` turns the histograms, counters and registered gauge
+collectors into the Prometheus text format, for the backend's /metrics.
+Stages recorded: listen, recognize, retrieve, fetch, parse, store, llm
+(plus llm_first_token, llm_prefill and a tokens-per-second histogram), tts and
+speak (playback), plus HTTP routes and SQLite statements.
+"""
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ===== CONFIGURATION ===== #
+TRACE_FILE = os.environ.get('ASSISTANT_TRACE_FILE')  # JSONL trace export; off when unset
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)  # tokens per second
+STAGE_METRIC = 'assistant_stage_seconds'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with sum and count"""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        counts, _, count = self.snapshot()
+        if not count:
+            return None
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+_histograms: Dict[Tuple[str, Labels], Histogram] = {}
+_counters: Dict[Tuple[str, Labels], float] = {}
+_help: Dict[str, str] = {}
+_collectors: List[Callable[[], Iterable[Tuple[str, Dict, float]]]] = []
+_registry_lock = threading.Lock()
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def describe(name: str, text: str):
+    """HELP text for a metric"""
+    _help[name] = text
+
+
+def histogram(name: str, buckets: Iterable[float] = LATENCY_BUCKETS, **labels) -> Histogram:
+    key = (name, _labels(labels))
+    found = _histograms.get(key)
+    if found is None:
+        with _registry_lock:
+            found = _histograms.setdefault(key, Histogram(buckets))
+    return found
+
+
+def observe(name: str, value: float, buckets: Iterable[float] = LATENCY_BUCKETS, **labels):
+    histogram(name, buckets, **labels).observe(value)
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, _labels(labels))
+    with _registry_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_collector(collect: Callable[[], Iterable[Tuple[str, Dict, float]]]):
+    """Add a callback returning (gauge name, labels, value) tuples, read at export time"""
+    _collectors.append(collect)
+
+
+# ===== TRACES ===== #
+class Trace:
+    """Spans recorded during one turn or request"""
+
+    def __init__(self, name: str, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.discarded = False
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float, **attrs):
+        with self._lock:
+            self.spans.append(dict(attrs, name=name, offset=round(start - self._start, 6),
+                                   seconds=round(seconds, 6)))
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def discard(self):
+        """Don't export this trace (e.g. an empty turn)"""
+        self.discarded = True
+
+    def to_dict(self, seconds: float) -> Dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['offset'])
+        return {'trace': self.id, 'name': self.name, 'started': self.started,
+                'seconds': round(seconds, 6), 'attrs': self.attrs, 'spans': spans}
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('trace', default=None)
+_export_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[Trace]:
+    """Collect the spans of one turn/request; exported to TRACE_FILE when it ends"""
+    active = Trace(name, **attrs)
+    token = _current.set(active)
+    try:
+        yield active
+    finally:
+        _current.reset(token)
+        seconds = time.perf_counter() - active._start
+        if not active.discarded:
+            observe(f'assistant_{name}_seconds', seconds)
+            export(active, seconds)
+
+
+def export(finished: Trace, seconds: float):
+    if not TRACE_FILE:
+        return
+    line = json.dumps(finished.to_dict(seconds), default=str)
+    try:
+        with _export_lock, open(TRACE_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        print(f"Trace export error: {e}")
+
+
+def record(stage: str, seconds: float, start: Optional[float] = None, **attrs):
+    """Add a measured stage to the stage histogram and the active trace"""
+    observe(STAGE_METRIC, seconds, stage=stage)
+    active = _current.get()
+    if active is not None:
+        active.add(stage, time.perf_counter() - seconds if start is None else start, seconds, **attrs)
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Dict]:
+    """Time a block as one stage; the yielded dict can take extra attributes"""
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs['error'] = e.__class__.__name__
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, start, **attrs)
+
+
+# ===== EXPORT ===== #
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def _number(value: float) -> str:
+    return '+Inf' if value == float('inf') else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    with _registry_lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    typed = set()
+    for (name, labels), hist in histograms:
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        counts, total, count = hist.snapshot()
+        cumulative = 0
+        for bound, bucket_count in zip(hist.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', _number(float(bound))),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_number(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    for (name, labels), value in counters:
+        if name not in typed:
+            typed.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+
+    # Several collectors may report the same gauge (one per pool); its samples must be contiguous
+    gauges: Dict[str, List[str]] = {}
+    for collect in list(_collectors):
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"Metrics collector error: {e}")
+            continue
+        for name, labels, value in samples:
+            gauges.setdefault(name, []).append(f"{name}{_format_labels(_labels(labels))} {_number(value)}")
+    for name, samples in gauges.items():
+        if name in typed:
+            continue  # already exported as a histogram or counter
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+def stage_summary() -> Dict[str, Dict]:
+    """count / mean / p50 / p95 per stage, for printing"""
+    summary = {}
+    with _registry_lock:
+        stages = [(dict(labels).get('stage'), hist) for (name, labels), hist in _histograms.items()
+                  if name == STAGE_METRIC]
+    for stage, hist in sorted(stages, key=lambda item: str(item[0])):
+        _, total, count = hist.snapshot()
+        if count:
+            summary[stage] = {'count': count, 'mean': total / count,
+                              'p50': hist.quantile(0.5), 'p95': hist.quantile(0.95)}
+    return summary
+
+
+describe(STAGE_METRIC, "Time spent per assistant stage")
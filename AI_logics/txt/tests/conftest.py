@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The assistant modules import each other as siblings
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
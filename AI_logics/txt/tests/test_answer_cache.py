@@ -0,0 +1,69 @@
+from answer_cache import AnswerCache, near_duplicate
+from sqlite_pool import connection
+
+CONTEXT = [{'source': 'https://en.wikipedia.org/wiki/Cameroon',
+            'content': 'French Cameroon became independent on 1 January 1960.'}]
+
+
+def make_cache(tmp_path, threshold=0.9):
+    return AnswerCache(str(tmp_path / 'answers.db'), near_duplicate_threshold=threshold)
+
+
+def test_exact_hit_ignores_punctuation_and_case(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(cache.make_key("When did Cameroon gain independence?", 'm', {}, CONTEXT), "In 1960.")
+    key = cache.make_key("when did cameroon gain independence", 'm', {}, CONTEXT)
+    assert cache.get(key) == "In 1960."
+    assert cache.stats['hits'] == 1
+
+
+def test_different_question_word_is_not_a_near_duplicate(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(cache.make_key("When did Cameroon gain independence?", 'm', {}, CONTEXT), "In 1960.")
+    for question in ("How did Cameroon gain independence?", "Why did Cameroon gain independence?"):
+        assert cache.get(cache.make_key(question, 'm', {}, CONTEXT)) is None
+    assert cache.stats['near_hits'] == 0
+
+
+def test_reordered_question_is_a_near_duplicate(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(cache.make_key("What are the tribes of Cameroon?", 'm', {}, CONTEXT), "Many.")
+    assert cache.get(cache.make_key("What are Cameroon tribes?", 'm', {}, CONTEXT)) == "Many."
+    assert cache.stats['near_hits'] == 1
+
+
+def test_near_duplicates_off_by_default(tmp_path):
+    cache = AnswerCache(str(tmp_path / 'answers.db'))
+    cache.put(cache.make_key("What are the tribes of Cameroon?", 'm', {}, CONTEXT), "Many.")
+    assert cache.get(cache.make_key("What are Cameroon tribes?", 'm', {}, CONTEXT)) is None
+
+
+def test_near_duplicate_keeps_intent_words():
+    assert not near_duplicate("who founded douala", "where founded douala", 0.5)
+    assert not near_duplicate("is bamenda a capital", "is bamenda not a capital", 0.5)
+    assert not near_duplicate("did they win", "didn t they win", 0.5)
+    assert near_duplicate("tribes of cameroon", "cameroon tribes", 0.9)
+
+
+def test_invalidation_drops_answers_using_the_source(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(cache.make_key("When did Cameroon gain independence?", 'm', {}, CONTEXT), "In 1960.")
+    with connection(cache.path) as conn:
+        assert cache.invalidate_sources(conn, [CONTEXT[0]['source']]) == 1
+    assert cache.get(cache.make_key("When did Cameroon gain independence?", 'm', {}, CONTEXT)) is None
+
+
+def test_answer_is_refused_if_its_source_changed_while_generating(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.make_key("When did Cameroon gain independence?", 'm', {}, CONTEXT)
+    # The background writer refreshes the page before the answer is stored
+    with connection(cache.path) as conn:
+        assert cache.invalidate_sources(conn, [CONTEXT[0]['source']]) == 0
+    assert cache.put(key, "In 1960.") is False
+    assert cache.stats['stale'] == 1
+    assert cache.get(key) is None
+
+    fresh = cache.make_key("When did Cameroon gain independence?", 'm', {}, CONTEXT)
+    assert fresh['generations'] == {CONTEXT[0]['source']: 1}
+    assert cache.put(fresh, "In 1960.") is True
+    assert cache.get(fresh) == "In 1960."
@@ -0,0 +1,33 @@
+import pytest
+
+import voice_assistant as va
+from assistant_pipeline import AssistantPipeline
+
+
+@pytest.fixture
+def policies(monkeypatch):
+    calls = []
+    monkeypatch.setattr(va, 'init_db', lambda: None)
+    monkeypatch.setattr(va, 'sync_vector_index', lambda: None)
+    monkeypatch.setattr(va, 'gather_context', lambda query, policy=None, executor=None: calls.append(policy) or [])
+    return calls
+
+
+def test_retrieve_uses_the_assistants_web_policy(policies):
+    pipeline = AssistantPipeline()
+    try:
+        pipeline.retrieve('Who are the Bamileke?')
+        pipeline.retrieve('Who are the Bamileke?', use_web=True)
+        pipeline.retrieve('Who are the Bamileke?', use_web=False)
+    finally:
+        pipeline.close()
+    assert policies == [None, 'always', 'never']  # None: WEB_POLICY, as in the CLI
+
+
+def test_web_fallback_off_never_searches(policies):
+    pipeline = AssistantPipeline(web_fallback=False)
+    try:
+        pipeline.retrieve('Who are the Bamileke?')
+    finally:
+        pipeline.close()
+    assert policies == ['never']
@@ -0,0 +1,242 @@
+import os
+import math
+import threading
+from array import array
+
+import audio_capture
+from audio_capture import AudioCapture, UtteranceSegmenter
+
+RATE = 16000
+FRAME_MS = 30
+
+
+def tone(amplitude: float, ms: int = FRAME_MS) -> bytes:
+    """One frame of a 440 Hz sine; amplitude 0 is silence"""
+    count = RATE * ms // 1000
+    return array('h', (int(amplitude * math.sin(2 * math.pi * 440 * i / RATE)) for i in range(count))).tobytes()
+
+
+def frames(amplitude: float, seconds: float):
+    return [tone(amplitude)] * int(seconds * 1000 / FRAME_MS)
+
+
+def run(segmenter, stream):
+    utterances = [segmenter.feed(frame) for frame in stream]
+    utterances.append(segmenter.flush())
+    return [u for u in utterances if u is not None]
+
+
+def test_speech_between_silences_is_one_utterance():
+    segmenter = UtteranceSegmenter(RATE, FRAME_MS)
+    found = run(segmenter, frames(100, 1) + frames(5000, 1.2) + frames(100, 1))
+    assert len(found) == 1
+    assert 1.1 <= found[0].duration <= 1.6  # pre-roll, no trailing silence
+    assert 0.7 <= found[0].started <= 1.0
+
+
+def test_short_click_is_ignored():
+    segmenter = UtteranceSegmenter(RATE, FRAME_MS)
+    assert run(segmenter, frames(100, 1) + frames(5000, 0.1) + frames(100, 1)) == []
+
+
+def test_floor_recalibrates_when_background_noise_rises():
+    segmenter = UtteranceSegmenter(RATE, FRAME_MS)
+    # A fan comes on at 10x the calibrated floor and stays on
+    found = run(segmenter, frames(100, 1) + frames(1000, 30))
+    assert found == []
+    assert segmenter.recalibrations == 1
+    assert segmenter.threshold > 1000 / math.sqrt(2)  # the fan's RMS is now below the threshold
+
+    # Speech over the fan is still picked up
+    found = run(segmenter, frames(8000, 1) + frames(1000, 2))
+    assert len(found) == 1
+
+
+def test_reset_drops_open_utterance_but_keeps_floor():
+    segmenter = UtteranceSegmenter(RATE, FRAME_MS)
+    run(segmenter, frames(100, 1))
+    floor = segmenter.noise_floor
+    for frame in frames(5000, 0.5):
+        segmenter.feed(frame)
+    segmenter.reset()
+    assert segmenter.flush() is None
+    assert segmenter.noise_floor == floor
+
+
+class ListSource:
+    sample_rate = RATE
+    frame_ms = FRAME_MS
+
+    def __init__(self, stream, on_frame=None):
+        self.stream = stream
+        self.on_frame = on_frame
+
+    def frames(self):
+        for index, frame in enumerate(self.stream):
+            if self.on_frame:
+                self.on_frame(index)
+            yield frame
+
+    def close(self):
+        pass
+
+
+def test_capture_ignores_audio_while_paused(monkeypatch):
+    monkeypatch.setattr(audio_capture, 'PLAYBACK_TAIL_MS', 0)
+    speaking = threading.Event()
+    speaking.set()
+    stream = frames(100, 1) + frames(5000, 1) + frames(100, 1)  # heard while "speaking"
+    quiet_from = len(stream)
+    stream += frames(5000, 1) + frames(100, 1)  # heard afterwards
+
+    def on_frame(index):
+        if index == quiet_from:
+            speaking.clear()
+
+    capture = AudioCapture(ListSource(stream, on_frame), paused=speaking.is_set).start()
+    capture.finished.wait(5)
+    found = []
+    while True:
+        utterance = capture.get(timeout=0.2)
+        if utterance is None:
+            break
+        found.append(utterance)
+    assert len(found) == 1
+    assert found[0].started > quiet_from * FRAME_MS / 1000 - 0.01  # only the speech after playback
+    assert capture.stats['muted_frames'] == quiet_from
+
+
+def test_clear_discards_queued_utterances():
+    capture = AudioCapture(ListSource(frames(100, 1) + frames(5000, 1) + frames(100, 1))).start()
+    capture.finished.wait(5)
+    assert capture.clear() == 1
+    assert capture.get(timeout=0.2) is None
+
+
+def test_talking_over_playback_interrupts_it(monkeypatch):
+    monkeypatch.setattr(audio_capture, 'PLAYBACK_TAIL_MS', 0)
+    speaking = threading.Event()
+    speaking.set()
+    echo = frames(100, 0.5) + frames(1500, 2)  # the assistant's voice through the microphone
+    barge_from = len(echo)
+    stream = echo + frames(8000, 1) + frames(100, 1)
+    interrupted_at = []
+    position = [0]
+
+    def on_frame(index):
+        position[0] = index
+
+    def interrupt():
+        interrupted_at.append(position[0])
+        speaking.clear()  # the worker stops playing
+
+    capture = AudioCapture(ListSource(stream, on_frame), paused=speaking.is_set,
+                           on_barge_in=interrupt).start()
+    capture.finished.wait(5)
+    assert capture.stats['barge_ins'] == 1
+    # Cut off within a few frames of the user starting to talk, long before playback would end
+    assert barge_from <= interrupted_at[0] < barge_from + 10
+    utterance = capture.get(timeout=0.2)
+    assert utterance is not None
+    assert abs(utterance.started - barge_from * FRAME_MS / 1000) < 0.1  # from the first loud frame
+    assert utterance.duration >= 0.9
+
+
+def test_echo_alone_is_not_a_barge_in(monkeypatch):
+    monkeypatch.setattr(audio_capture, 'PLAYBACK_TAIL_MS', 0)
+    calls = []
+    stream = frames(100, 0.5) + frames(1500, 3) + frames(2500, 1)  # louder passage, still echo
+    capture = AudioCapture(ListSource(stream), paused=lambda: True, on_barge_in=lambda: calls.append(1)).start()
+    capture.finished.wait(5)
+    assert calls == []
+    assert capture.get(timeout=0.2) is None
+
+
+def test_get_returns_while_paused_when_interrupted():
+    release = threading.Event()
+
+    class EndlessSource(ListSource):
+        def frames(self):
+            while not release.is_set():
+                yield tone(100)
+
+    capture = AudioCapture(EndlessSource([]), paused=lambda: True).start()
+    typed = threading.Event()
+    threading.Timer(0.3, typed.set).start()
+    try:
+        # Paused time doesn't count towards the timeout, but a typed line ends the wait
+        assert capture.get(timeout=0.1, interrupted=typed.is_set) is None
+        assert typed.is_set()
+    finally:
+        release.set()
+        capture.close()
+
+
+def write_wav(path, stream, rate=RATE, channels=1):
+    """16-bit WAV from mono frames, duplicated across `channels`"""
+    import wave
+    samples = array('h')
+    for frame in stream:
+        for sample in array('h', frame):
+            samples.extend([sample] * channels)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+
+def replay(path):
+    capture = AudioCapture(audio_capture.WavSource(path)).start()
+    found = []
+    while True:
+        utterance = capture.get(timeout=1)
+        if utterance is None:
+            break
+        found.append(utterance)
+    return found
+
+
+def test_wav_replay_finds_utterance_boundaries(tmp_path):
+    # Stereo, like most recordings; two phrases separated by more than END_SILENCE_MS
+    stream = frames(100, 1) + frames(6000, 0.9) + frames(100, 1.2) + frames(4000, 0.6) + frames(100, 1)
+    found = replay(write_wav(tmp_path / 'two.wav', stream, channels=2))
+    # Each utterance keeps the quiet part of the pre-roll and drops the trailing silence
+    lead = (audio_capture.PRE_ROLL_MS / FRAME_MS - audio_capture.START_FRAMES) * FRAME_MS / 1000
+    assert len(found) == 2
+    assert abs(found[0].started - (1.0 - lead)) < 0.05
+    assert abs(found[1].started - (3.1 - lead)) < 0.05
+    assert abs(found[0].duration - (0.9 + lead)) < 0.05
+    assert abs(found[1].duration - (0.6 + lead)) < 0.05
+    assert all(u.sample_rate == RATE for u in found)
+
+
+def test_read_wav_downmixes_to_mono(tmp_path):
+    path = write_wav(tmp_path / 'stereo.wav', frames(3000, 0.3), channels=2)
+    data, rate = audio_capture.read_wav(path)
+    assert rate == RATE
+    assert data == b''.join(frames(3000, 0.3))
+
+
+def test_bundled_recording_replays():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test.wav')
+    found = replay(path)
+    assert len(found) == 1
+    assert found[0].sample_rate == 44100
+    assert 2.5 <= found[0].duration <= 3.0
+
+
+def test_assistant_replays_the_configured_wav(tmp_path, monkeypatch):
+    import voice_assistant
+    path = write_wav(tmp_path / 'question.wav', frames(100, 0.5) + frames(6000, 0.6) + frames(100, 1))
+    monkeypatch.setattr(voice_assistant, 'AUDIO_REPLAY', path)
+    monkeypatch.setattr(voice_assistant, '_in_background', lambda step, fn: None)  # no speech model
+    capture = voice_assistant.start_audio_capture()
+    try:
+        assert isinstance(capture.source, audio_capture.WavSource)
+        utterance = capture.get(timeout=5)
+        assert utterance is not None
+        assert 0.2 < utterance.started < 0.5
+    finally:
+        capture.close()
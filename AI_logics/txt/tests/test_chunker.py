@@ -0,0 +1,76 @@
+import bs4
+
+from chunker import chunk_blocks, iter_blocks
+
+MAX, OVERLAP = 200, 50
+
+
+def sentences(count, prefix='Sentence'):
+    return ' '.join(f"{prefix} number {i} about the Sawa coast." for i in range(count))
+
+
+def body(chunk):
+    return chunk['content'].split('] ', 1)[1] if chunk['content'].startswith('[') else chunk['content']
+
+
+def test_consecutive_chunks_share_the_overlap():
+    chunks = list(chunk_blocks([('History', sentences(20))], max_chars=MAX, overlap=OVERLAP))
+    assert len(chunks) > 2
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert len(body(previous)) <= MAX
+        # The next chunk opens with the last few words of the previous one
+        shared = max(size for size in range(OVERLAP + 1) if body(previous).endswith(body(chunk)[:size]))
+        assert 0.5 * OVERLAP < shared <= OVERLAP
+    assert [chunk['position'] for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_chunks_are_labelled_and_never_span_sections():
+    blocks = [('Music', 'Makossa comes from Douala.'), ('Music', 'Bikutsi comes from the Beti.'),
+              ('Food', 'Ndole is a bitterleaf stew.'), (None, 'Untitled paragraph.')]
+    chunks = list(chunk_blocks(blocks, title='Culture of Cameroon', max_chars=MAX, overlap=OVERLAP))
+    assert [(chunk['section'], chunk['content']) for chunk in chunks] == [
+        ('Music', '[Culture of Cameroon / Music] Makossa comes from Douala. Bikutsi comes from the Beti.'),
+        ('Food', '[Culture of Cameroon / Food] Ndole is a bitterleaf stew.'),
+        (None, '[Culture of Cameroon] Untitled paragraph.'),
+    ]
+    assert list(chunk_blocks([(None, 'No title or section.')]))[0]['content'] == 'No title or section.'
+
+
+def test_empty_input_gives_no_chunks():
+    assert list(chunk_blocks([])) == []
+    assert list(chunk_blocks([('Intro', '')])) == []
+    assert list(iter_blocks(bs4.BeautifulSoup('<html><body></body></html>', 'html.parser'))) == []
+
+
+def test_sentence_longer_than_a_chunk_is_cut_on_words():
+    words = ' '.join(f"word{i}" for i in range(200))  # ~1.3k chars, no sentence breaks
+    chunks = list(chunk_blocks([('Intro', words)], max_chars=MAX, overlap=OVERLAP))
+    assert len(chunks) > 1
+    assert all(len(body(chunk)) <= MAX for chunk in chunks)
+    # No word is split, and every word appears
+    seen = set()
+    for chunk in chunks:
+        for word in body(chunk).split():
+            assert word.startswith('word') and word[4:].isdigit()
+            seen.add(word)
+    assert seen == set(words.split())
+
+    unbroken = 'x' * (3 * MAX)  # not even a space to cut on
+    pieces = [body(chunk) for chunk in chunk_blocks([(None, unbroken)], max_chars=MAX, overlap=OVERLAP)]
+    assert all(len(piece) <= MAX for piece in pieces)
+    assert sum(piece.count('x') for piece in pieces) >= len(unbroken)  # nothing dropped
+
+
+def test_iter_blocks_skips_reference_sections_and_edit_links():
+    html = '''
+        <h1>Culture of Cameroon</h1>
+        <p>Intro paragraph that is long enough to be kept by the block filter.</p>
+        <h2>Music<span class="mw-editsection">[edit]</span></h2>
+        <p>Makossa is a popular style of music from the city of Douala.</p>
+        <p>Too short.</p>
+        <h2>References</h2>
+        <p>A citation that is long enough but belongs to the references.</p>
+    '''
+    blocks = list(iter_blocks(bs4.BeautifulSoup(html, 'html.parser')))
+    assert blocks == [(None, 'Intro paragraph that is long enough to be kept by the block filter.'),
+                      ('Music', 'Makossa is a popular style of music from the city of Douala.')]
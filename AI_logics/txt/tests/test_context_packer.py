@@ -0,0 +1,25 @@
+from context_packer import merge_sources, normalize_scores, pack_context
+
+
+def passage(source, score, words=40):
+    return {'source': source, 'content': ' '.join(f"{source}{i}" for i in range(words)), 'score': score}
+
+
+def test_sources_compete_on_rank_not_units():
+    local = [passage('local', 0.9), passage('local2', 0.3)]
+    web = [passage('web', 14.0), passage('web2', 2.0)]  # raw BM25 from a different collection
+    packed = pack_context(merge_sources(local, web), 1000)['items']
+    assert [item['source'] for item in packed] == ['local', 'web', 'local2', 'web2']
+
+
+def test_unscored_results_are_ranked_by_position():
+    scores = [item['score'] for item in normalize_scores([{'content': 'a'}, {'content': 'b'}])]
+    assert scores == [1.0, 0.5]
+
+
+def test_budget_truncates_and_skips_duplicates():
+    first = passage('a', 1.0, 200)
+    packed = pack_context([first, dict(first, score=0.9), passage('b', 0.5, 400)], 300)
+    assert [item['source'] for item in packed['items']] == ['a', 'b']
+    assert packed['packed_tokens'] <= 300
+    assert packed['dropped_items'] == 1
@@ -0,0 +1,61 @@
+import time
+import threading
+
+import pytest
+
+import voice_assistant as va
+
+STRONG = [{'source': 'kb', 'content': 'The Bamileke live in the West Region.', 'score': 9.0, 'match': 0.9}]
+WEAK = [{'source': 'kb', 'content': 'Cameroon has ten regions.', 'score': 0.4, 'match': 0.1}]
+PAGE = [{'source': 'wiki', 'content': 'The Bamileke are known for their chiefdoms.'}]
+
+
+@pytest.fixture
+def retrieval(monkeypatch):
+    state = {'keyword': STRONG, 'web_delay': 0.0, 'searched': 0, 'stored': [], 'stored_event': threading.Event()}
+
+    def search_web(query):
+        state['searched'] += 1
+        time.sleep(state['web_delay'])
+        return PAGE
+
+    def store(data):
+        state['stored'].append(data)
+        state['stored_event'].set()
+
+    monkeypatch.setattr(va, 'keyword_search', lambda query: state['keyword'])
+    monkeypatch.setattr(va, 'semantic_search', lambda query, limit: [])
+    monkeypatch.setattr(va, 'search_web', search_web)
+    monkeypatch.setattr(va, 'store_knowledge_later', store)
+    monkeypatch.setattr(va, 'WEB_GRACE', 0.2)
+    return state
+
+
+def test_strong_local_match_skips_the_web_on_auto(retrieval):
+    context = va.gather_context('Who are the Bamileke?', 'auto')
+    assert retrieval['searched'] == 0
+    assert [item['source'] for item in context] == ['kb']
+
+
+def test_weak_local_match_waits_for_the_web(retrieval):
+    retrieval['keyword'], retrieval['web_delay'] = WEAK, 0.5
+    context = va.gather_context('Who are the Bamileke?', 'auto')
+    assert {item['source'] for item in context} == {'kb', 'wiki'}
+    assert retrieval['stored'] == [PAGE]
+
+
+def test_slow_web_does_not_hold_up_a_good_local_answer(retrieval):
+    retrieval['web_delay'] = 1.0
+    start = time.monotonic()
+    context = va.gather_context('Who are the Bamileke?', 'always')
+    assert time.monotonic() - start < 0.6  # WEB_GRACE, not the whole scrape
+    assert [item['source'] for item in context] == ['kb']
+    # The pages still arrive and are kept for the next question
+    assert retrieval['stored_event'].wait(3)
+    assert retrieval['stored'] == [PAGE]
+
+
+def test_wants_web_compares_the_normalized_match():
+    assert va.wants_web(va.best_match(WEAK), 'auto')
+    assert not va.wants_web(va.best_match(STRONG), 'auto')
+    assert va.wants_web(1.0, 'always') and not va.wants_web(0.0, 'never')
@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+from knowledge_ingest import (MIGRATIONS, SCHEMA_VERSION, file_checksum, ingest_file, ingest_sources, migrate,
+                              schema_version)
+from knowledge_store import content_hash
+
+URL = 'https://en.wikipedia.org/wiki/Bamileke_people'
+
+
+def legacy_knowledge_base(path):
+    """knowledge_base as the first version of the assistant created it"""
+    conn = sqlite3.connect(str(path))
+    conn.execute('''
+        CREATE TABLE knowledge_base (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, source_url TEXT NOT NULL, category TEXT NOT NULL,
+            content TEXT NOT NULL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany('INSERT INTO knowledge_base (source_url, category, content) VALUES (?, ?, ?)', [
+        (URL, 'Food', 'Achu is eaten with yellow soup.'),
+        (URL, 'food', 'achu is eaten with  yellow soup.'),
+        (URL, 'Web', 'The Bamileke live in the West Region.'),
+    ])
+    return conn
+
+
+def snapshot(conn):
+    return conn.execute('SELECT * FROM knowledge_base ORDER BY id').fetchall()
+
+
+def test_migrating_twice_changes_nothing(tmp_path):
+    conn = legacy_knowledge_base(tmp_path / 'kb.db')
+    assert schema_version(conn) == 0
+    assert migrate(conn) == SCHEMA_VERSION == schema_version(conn)
+
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(knowledge_base)')]
+    assert {'content_hash', 'section', 'chunk_index', 'origin'} <= set(columns)
+    assert [(row[0], row[1]) for row in conn.execute('SELECT category, content FROM knowledge_base ORDER BY id')] == [
+        ('cuisine', 'achu is eaten with  yellow soup.'), ('web_scrape', 'The Bamileke live in the West Region.')]
+
+    before = snapshot(conn)
+    assert migrate(conn) == SCHEMA_VERSION
+    assert snapshot(conn) == before
+
+
+def test_origin_migration_rereads_the_legacy_files_once(tmp_path):
+    dump = tmp_path / 'web_data.json'
+    dump.write_text(json.dumps([{'source': URL, 'category': 'culture', 'content': 'Masks at funerals.'}]))
+    conn = legacy_knowledge_base(tmp_path / 'kb.db')
+    # A database left at version 2 by older code, with the dump already ingested (no origin column yet)
+    for version in (1, 2):
+        MIGRATIONS[version](conn)
+    conn.execute('PRAGMA user_version = 2')
+    conn.execute("INSERT INTO knowledge_base (source_url, category, content, content_hash) "
+                 "VALUES (?, 'culture', 'Masks at funerals.', ?)", (URL, content_hash('Masks at funerals.')))
+    conn.execute('INSERT INTO ingested_sources (path, checksum, rows) VALUES (?, ?, 1)',
+                 (str(dump.resolve()), file_checksum(str(dump))))
+
+    migrate(conn)  # version 3 forgets the ingest log so the rows get tagged
+    result = ingest_file(conn, str(dump))
+    assert result['inserted'] == 0 and result['skipped'] == 1
+    assert conn.execute("SELECT origin FROM knowledge_base WHERE content = 'Masks at funerals.'").fetchone() == (
+        'ingest',)
+
+    migrate(conn)  # already at version 3: the log is kept
+    assert ingest_file(conn, str(dump)) is None
+
+
+def test_ingest_picks_up_only_what_changed(tmp_path):
+    conn = legacy_knowledge_base(tmp_path / 'kb.db')
+    migrate(conn)
+    legacy = tmp_path / 'cultural_data.db'
+    with sqlite3.connect(str(legacy)) as old:
+        old.execute('CREATE TABLE cultural_info (id INTEGER PRIMARY KEY, source_url TEXT, category TEXT, content TEXT)')
+        old.execute("INSERT INTO cultural_info (source_url, category, content) VALUES (?, 'Heritage', 'Bafut palace.')",
+                    (URL,))
+    old.close()
+
+    results = ingest_sources(conn, [str(legacy), str(tmp_path / 'missing.json')])
+    assert list(results) == [str(legacy)]
+    assert results[str(legacy)]['inserted'] == 1 and results[str(legacy)]['changed'] == {URL}
+    assert ingest_sources(conn, [str(legacy)]) == {}
+
+    forced = ingest_sources(conn, [str(legacy)], force=True)[str(legacy)]
+    assert (forced['inserted'], forced['skipped'], forced['changed']) == (0, 1, set())
+    assert conn.execute("SELECT category FROM knowledge_base WHERE content = 'Bafut palace.'").fetchone() == (
+        'unesco',)
+
+
+def test_target_database_is_never_ingested_into_itself(tmp_path):
+    path = tmp_path / 'kb.db'
+    conn = legacy_knowledge_base(path)
+    migrate(conn)
+    conn.commit()
+    assert ingest_sources(conn, [str(path)]) == {}
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+from knowledge_ingest import ingest_file, migrate
+from knowledge_store import compact, content_hash, replace_source_chunks, upsert_knowledge
+from search_index import ensure_search_index, search
+
+URL = 'https://en.wikipedia.org/wiki/Culture_of_Cameroon'
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'kb.db'))
+    conn.execute('''
+        CREATE TABLE knowledge_base (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, source_url TEXT NOT NULL, category TEXT NOT NULL,
+            content TEXT NOT NULL, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def contents(conn):
+    return sorted(row[0] for row in conn.execute('SELECT content FROM knowledge_base WHERE source_url = ?', (URL,)))
+
+
+def test_refresh_keeps_rows_ingested_from_legacy_sources(conn, tmp_path):
+    legacy = tmp_path / 'legacy.ndjson'
+    legacy.write_text('{"source": "%s", "category": "Culture", "content": "Legacy row about music."}\n' % URL)
+    ingest_file(conn, str(legacy))
+    upsert_knowledge(conn, [{'source': URL, 'content': 'Old scraped paragraph.'}])
+
+    assert replace_source_chunks(conn, URL, [{'content': 'New scraped paragraph.'}], 'culture')
+    # The stale scraped chunk goes; the ingested one stays, as the legacy file won't be read again
+    assert contents(conn) == ['Legacy row about music.', 'New scraped paragraph.']
+
+
+def test_ingested_origin_is_sticky(conn, tmp_path):
+    upsert_knowledge(conn, [{'source': URL, 'content': 'Shared paragraph.'}])
+    legacy = tmp_path / 'legacy.ndjson'
+    legacy.write_text('{"source": "%s", "category": "culture", "content": "Shared paragraph."}\n' % URL)
+    ingest_file(conn, str(legacy))
+    upsert_knowledge(conn, [{'source': URL, 'content': 'Shared paragraph.'}])  # scraped again
+
+    replace_source_chunks(conn, URL, [{'content': 'Something else.'}])
+    assert 'Shared paragraph.' in contents(conn)
+
+
+def test_dedup_key_ignores_case_spacing_and_citations(conn):
+    assert content_hash('Douala is  a PORT city.[12]') == content_hash('douala is a port city.')
+    assert content_hash('Douala is a port city.') != content_hash('Douala is not a port city.')
+
+    assert upsert_knowledge(conn, [{'source': URL, 'content': 'Douala is a port city.'}]) == {URL}
+    # The same text again is only a timestamp refresh; under another URL it is a new row
+    assert upsert_knowledge(conn, [{'source': URL, 'content': 'Douala is  a PORT city.[3]'}]) == set()
+    other = 'https://example.com/douala'
+    assert upsert_knowledge(conn, [{'source': other, 'content': 'Douala is a port city.'}]) == {other}
+    assert conn.execute('SELECT COUNT(*) FROM knowledge_base').fetchone()[0] == 2
+
+
+def test_replace_reports_only_real_changes(conn):
+    other = 'https://example.com/other'
+    upsert_knowledge(conn, [{'source': other, 'content': 'Unrelated page.'}])
+    chunks = [{'content': 'First paragraph.', 'section': 'Intro', 'position': 0},
+              {'content': 'Second paragraph.', 'section': 'Intro', 'position': 1}]
+    assert replace_source_chunks(conn, URL, chunks)
+    assert not replace_source_chunks(conn, URL, chunks)  # same page again
+
+    # A moved chunk keeps its row but takes its new position
+    assert replace_source_chunks(conn, URL, [dict(chunks[1], position=0)])
+    assert conn.execute('SELECT content, chunk_index FROM knowledge_base WHERE source_url = ?',
+                        (URL,)).fetchall() == [('Second paragraph.', 0)]
+    assert contents(conn) == ['Second paragraph.']
+    assert conn.execute('SELECT content FROM knowledge_base WHERE source_url = ?', (other,)).fetchall() == [
+        ('Unrelated page.',)]
+
+
+def test_compact_collapses_duplicates_of_an_old_database(tmp_path):
+    path = str(tmp_path / 'old.db')
+    with sqlite3.connect(path) as old:
+        old.execute('''
+            CREATE TABLE knowledge_base (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, source_url TEXT, category TEXT,
+                content TEXT, timestamp DATETIME
+            )
+        ''')
+        old.executemany('INSERT INTO knowledge_base (source_url, category, content, timestamp) VALUES (?, ?, ?, ?)', [
+            (URL, 'culture', 'Makossa is popular music.', '2023-01-01'),
+            (URL, 'culture', 'makossa is  popular music.[1]', '2024-06-01'),
+            (URL, 'culture', 'Bikutsi comes from the Beti.', '2023-01-01'),
+            (None, 'culture', 'No source row.', '2023-01-01'),
+            (None, 'culture', 'No source row.', '2023-02-01'),
+        ])
+        if not ensure_search_index(old):
+            pytest.skip("SQLite built without FTS5")
+
+    compact(path)
+    with sqlite3.connect(path) as db:
+        rows = db.execute('SELECT content, timestamp FROM knowledge_base ORDER BY id').fetchall()
+        # One copy per (source, normalized text) survives, with the group's latest timestamp
+        assert rows == [('makossa is  popular music.[1]', '2024-06-01'),
+                        ('Bikutsi comes from the Beti.', '2023-01-01'),
+                        ('No source row.', '2023-02-01')]
+        assert len(search(db, 'makossa')) == 1  # the index was rebuilt without the removed copy
+
+    compact(path)  # a second run finds nothing to do
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT COUNT(*) FROM knowledge_base').fetchone()[0] == 3
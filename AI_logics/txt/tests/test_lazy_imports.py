@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import threading
+import subprocess
+
+import pytest
+
+from lazy_imports import LOAD_TIMES, lazy_import, load_now, module_available
+
+
+def test_module_is_imported_on_first_attribute_use():
+    sys.modules.pop('colorsys', None)
+    LOAD_TIMES.pop('colorsys', None)
+    colorsys = lazy_import('colorsys')
+    assert 'colorsys' not in sys.modules
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert 'colorsys' in sys.modules and 'colorsys' in LOAD_TIMES
+    assert 'loaded' in repr(colorsys)
+
+
+def test_proxy_does_not_shadow_module_attributes(tmp_path):
+    np = pytest.importorskip('numpy')
+    lazy_np = lazy_import('numpy')
+    path = str(tmp_path / 'a.npy')
+    lazy_np.save(path, np.arange(3))
+    assert lazy_np.load(path).tolist() == [0, 1, 2]  # numpy.load, not the proxy's own import
+
+
+def test_load_now_and_module_available():
+    lazy_json = lazy_import('json')
+    assert load_now(lazy_json) is sys.modules['json']
+    assert load_now(sys) is sys
+    assert module_available('json')
+    assert not module_available('no_such_module_here')
+    assert not module_available('json.no_such_submodule')
+
+
+def test_concurrent_first_use_imports_once(monkeypatch):
+    import importlib
+    calls = []
+    real_import = importlib.import_module
+
+    def slow_import(name):
+        calls.append(name)
+        threading.Event().wait(0.05)
+        return real_import(name)
+
+    monkeypatch.setattr(importlib, 'import_module', slow_import)
+    proxy = lazy_import('string')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(proxy.ascii_lowercase)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ['string'] and results == ['abcdefghijklmnopqrstuvwxyz'] * 8
+
+
+def test_assistant_starts_without_the_heavy_modules():
+    heavy = ('ollama', 'numpy', 'speech_recognition', 'bs4', 'requests', 'pyttsx3')
+    code = f"import sys, json, voice_assistant; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+    txt_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=txt_dir, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,87 @@
+import pytest
+
+import page_cache
+from page_cache import PageCache
+
+URL = 'https://en.wikipedia.org/wiki/Douala'
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(page_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = PageCache(str(tmp_path / 'pages.db'))
+    yield cache
+    cache.close()
+
+
+def test_entry_is_fresh_until_the_ttl(cache, clock):
+    assert cache.get(URL, ttl=60) == (None, False)
+    cache.put(URL, '<p>Douala</p>', 'Douala', etag='"v1"')
+
+    clock.now += 59
+    entry, fresh = cache.get(URL, ttl=60)
+    assert fresh and entry['body'] == '<p>Douala</p>' and entry['content'] == 'Douala'
+
+    clock.now += 2
+    entry, fresh = cache.get(URL, ttl=60)
+    assert not fresh and entry['etag'] == '"v1"'
+    assert (cache.stats['misses'], cache.stats['hits'], cache.stats['stale']) == (1, 1, 1)
+
+
+def test_not_modified_renews_the_entry(cache, clock):
+    cache.put(URL, '<p>Douala</p>', 'Douala', etag='"v1"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+    clock.now += 120
+    entry, fresh = cache.get(URL, ttl=60)
+    assert not fresh
+    assert PageCache.conditional_headers(entry) == {'If-None-Match': '"v1"',
+                                                    'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+    # A 304 only refreshes the validators it carries
+    cache.mark_revalidated(URL, etag='"v2"')
+    entry, fresh = cache.get(URL, ttl=60)
+    assert fresh and entry['fetched_at'] == clock.now
+    assert entry['etag'] == '"v2"' and entry['last_modified'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    assert entry['body'] == '<p>Douala</p>'
+    assert cache.stats['revalidated'] == 1
+
+
+def test_least_recently_used_pages_are_evicted_over_budget(tmp_path, clock):
+    # Incompressible-ish bodies so each entry's size is predictable
+    pages = {f'https://example.com/{i}': ''.join(chr(0x4e00 + (i * 7919 + j * 31) % 20000) for j in range(400))
+             for i in range(4)}
+    cache = PageCache(str(tmp_path / 'pages.db'), max_bytes=10 ** 9)
+    sizes = {}
+    for url, body in pages.items():
+        clock.now += 1
+        cache.put(url, body, None)
+        sizes[url] = cache.usage()['bytes'] - sum(sizes.values())
+    cache.close()
+
+    urls = list(pages)
+    budget = sum(sizes.values()) - 1  # one entry too many
+    cache = PageCache(str(tmp_path / 'pages.db'), max_bytes=budget)
+    clock.now += 1
+    cache.get(urls[0], ttl=60)  # the oldest page was just read, so the second one goes
+
+    clock.now += 1
+    cache.put(urls[3], pages[urls[3]], None)  # re-storing triggers eviction
+    assert cache.get(urls[1], ttl=60) == (None, False)
+    for url in (urls[0], urls[2], urls[3]):
+        assert cache.get(url, ttl=60)[0] is not None
+    usage = cache.usage()
+    assert usage['evictions'] == 1 and usage['bytes'] <= budget
+    cache.close()
@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+from search_index import build_match_query, ensure_search_index, rank_passages, search
+
+TARGET = 'The Bamileke people live in the West Region of Cameroon and keep their chiefdoms.'
+
+
+def make_conn(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE knowledge_base (id INTEGER PRIMARY KEY, source_url TEXT, content TEXT)')
+    conn.executemany('INSERT INTO knowledge_base (source_url, content) VALUES (?, ?)', rows)
+    if not ensure_search_index(conn):
+        pytest.skip("SQLite built without FTS5")
+    return conn
+
+
+def fillers(count):
+    return [(f'f{i}', f'Filler passage {i} about the coast, markets and football clubs.') for i in range(count)]
+
+
+def test_match_does_not_depend_on_collection_size():
+    small = search(make_conn([('t', TARGET)] + fillers(5)), 'Where do the Bamileke people live?')
+    large = search(make_conn([('t', TARGET)] + fillers(2000)), 'Where do the Bamileke people live?')
+    assert large[0]['score'] > 3 * small[0]['score']  # raw BM25 grows with the collection
+    assert abs(large[0]['match'] - small[0]['match']) < 0.05
+    assert 0.5 < small[0]['match'] <= 1.0
+
+
+def test_missing_terms_lower_the_match():
+    conn = make_conn([('t', TARGET)] + fillers(50))
+    full = search(conn, 'Bamileke chiefdoms')[0]['match']
+    partial = search(conn, 'Bamileke masquerade dances')[0]['match']
+    assert partial < 0.5 < full
+
+
+def test_triggers_follow_insert_update_and_delete():
+    conn = make_conn(fillers(3))
+    assert search(conn, 'Bamileke') == []
+
+    conn.execute('INSERT INTO knowledge_base (source_url, content) VALUES (?, ?)', ('t', TARGET))
+    assert [r['source'] for r in search(conn, 'Bamileke')] == ['t']
+
+    conn.execute("UPDATE knowledge_base SET content = 'The Duala are a coastal people.' WHERE source_url = 't'")
+    assert search(conn, 'Bamileke') == []
+    assert [r['source'] for r in search(conn, 'Duala')] == ['t']
+
+    conn.execute("DELETE FROM knowledge_base WHERE source_url = 't'")
+    assert search(conn, 'Duala') == []
+    # The index holds no stale entries: an integrity check compares it with the table
+    conn.execute("INSERT INTO knowledge_base_fts(knowledge_base_fts) VALUES ('integrity-check')")
+
+
+def test_search_orders_best_first_and_respects_limit():
+    conn = make_conn([
+        ('one', 'Bamileke masks.'),
+        ('two', 'Bamileke chiefdoms and Bamileke masks.'),
+        ('none', 'Football clubs on the coast.'),
+    ] + fillers(20))
+    results = search(conn, 'Bamileke masks', limit=5)
+    assert [r['source'] for r in results] == ['one', 'two']  # the shorter passage matches more densely
+    assert results[0]['score'] >= results[1]['score'] > 0
+    assert [r['source'] for r in search(conn, 'Bamileke masks', limit=1)] == ['one']
+
+
+def test_query_syntax_is_quoted_and_stopwords_dropped():
+    assert build_match_query('What is the "Ngondo" NEAR festival*?') == '"ngondo" OR "near" OR "festival"'
+    assert build_match_query('what is the') is None
+    conn = make_conn([('t', TARGET)])
+    # Unquoted, this would be an FTS syntax error; quoted, it is just a search for bamileke
+    assert [r['source'] for r in search(conn, 'NEAR(bamileke) AND -')] == ['t']
+
+
+def test_rank_passages_without_the_index():
+    items = [{'source': 'a', 'content': 'The coast has football clubs.'},
+             {'source': 'b', 'content': TARGET},
+             {'source': 'c', 'content': 'Bamileke masks are worn at funerals of the Bamileke.'}]
+    ranked = rank_passages('Bamileke chiefdoms', items, limit=5)
+    assert [item['source'] for item in ranked] == ['b', 'c']  # 'a' matches nothing and is dropped
+    assert ranked[0]['score'] > ranked[1]['score'] > 0
+    assert 'score' not in items[0]  # copies, not the caller's dicts
+    assert rank_passages('the of', items) == []
+    assert rank_passages('Bamileke', []) == []
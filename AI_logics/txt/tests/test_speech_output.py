@@ -0,0 +1,76 @@
+import threading
+
+from speech_output import SentenceSplitter, SpeechWorker
+
+
+def split(chunks, min_chars=20):
+    splitter = SentenceSplitter(min_chars)
+    sentences = [sentence for chunk in chunks for sentence in splitter.feed(chunk)]
+    rest = splitter.flush()
+    return sentences + ([rest] if rest else [])
+
+
+def test_sentences_released_across_token_boundaries():
+    tokens = ["The Bamileke live in", " the West Region. They are", " known for their chiefdoms!",
+              " Masks are central."]
+    assert split(tokens) == ["The Bamileke live in the West Region.",
+                             "They are known for their chiefdoms!", "Masks are central."]
+
+
+def test_short_fragments_wait_for_more_text():
+    assert split(["Dr. Mbarga wrote about e.g. the Sawa people. ", "Next."]) == \
+        ["Dr. Mbarga wrote about e.g. the Sawa people.", "Next."]
+
+
+def test_initials_do_not_end_a_sentence():
+    assert split(["President P. Biya was born in 1933. He lives in Yaounde."]) == \
+        ["President P. Biya was born in 1933.", "He lives in Yaounde."]
+
+
+def test_paragraph_break_ends_a_sentence():
+    assert split(["A heading without a full stop\n\nThen the body text follows here."]) == \
+        ["A heading without a full stop", "Then the body text follows here."]
+
+
+def test_nothing_left_after_flush():
+    splitter = SentenceSplitter()
+    assert splitter.flush() is None
+
+
+class FakeEngine:
+    def __init__(self):
+        self.spoken = []
+        self.stopped = 0
+        self.speaking = threading.Event()
+        self.release = threading.Event()
+
+    def say(self, text):
+        self.spoken.append(text)
+
+    def runAndWait(self):
+        self.speaking.set()
+        self.release.wait(5)
+
+    def stop(self):
+        self.stopped += 1
+        self.release.set()
+
+
+def test_interrupt_drops_queued_sentences():
+    engine = FakeEngine()
+    worker = SpeechWorker(engine)
+    for text in ("One.", "Two.", "Three."):
+        worker.say(text)
+    assert engine.speaking.wait(5)
+    assert worker.speaking
+
+    worker.interrupt()
+    worker.wait()
+    assert engine.spoken == ["One."]
+    assert engine.stopped == 1
+    assert not worker.speaking
+
+    worker.say("After.")
+    worker.wait()
+    assert engine.spoken == ["One.", "After."]
+    worker.close()
@@ -0,0 +1,105 @@
+import time
+import wave
+
+import pytest
+
+import speech_to_text as stt
+from speech_to_text import RecognitionError, SpeechRecognizer
+
+RATE = 16000
+
+
+class FakeRecognizer(SpeechRecognizer):
+    """Says how long the audio was; short clips take longer, so they finish out of order"""
+    name = 'fake'
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def _transcribe(self, frames, sample_rate):
+        seconds = len(frames) / (2 * sample_rate)
+        time.sleep(0.3 / seconds / 10)
+        return f"{seconds:.1f} seconds"
+
+
+class BrokenModel(FakeRecognizer):
+    name = 'broken'
+
+    def _load(self):
+        raise RecognitionError("model folder missing")
+
+
+class Offline(SpeechRecognizer):
+    """Succeeds at loading, fails at every request"""
+    name = 'offline'
+
+    def _transcribe(self, frames, sample_rate):
+        raise RecognitionError("network unreachable")
+
+
+@pytest.fixture(autouse=True)
+def backends(monkeypatch):
+    # Batch workers are forked, so they see these too
+    monkeypatch.setitem(stt.BACKENDS, 'fake', FakeRecognizer)
+    monkeypatch.setitem(stt.BACKENDS, 'broken', BrokenModel)
+    monkeypatch.setitem(stt.BACKENDS, 'offline', Offline)
+    monkeypatch.setattr(stt, '_recognizers', {})
+    monkeypatch.setattr(stt, '_worker_backend', 'fake')
+
+
+def tone_wav(path, seconds):
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(b'\x10\x00' * int(RATE * seconds))
+    return str(path)
+
+
+def test_resolve_backend(monkeypatch):
+    assert stt.resolve_backend('sphinx') == 'sphinx'
+    with pytest.raises(ValueError):
+        stt.resolve_backend('dragon')
+
+    installed = set()
+    for name in stt.AUTO_ORDER:
+        monkeypatch.setattr(stt.BACKENDS[name], 'available', classmethod(lambda cls: cls.name in installed))
+    assert stt.resolve_backend('auto') == 'google'  # nothing offline installed
+    installed.update({'sphinx', 'whisper'})
+    assert stt.resolve_backend('auto') == 'whisper'  # first in AUTO_ORDER wins
+    installed.add('vosk')
+    assert stt.resolve_backend('auto') == 'vosk'
+
+
+def test_transcribe_file_reports_text_and_real_time_factor(tmp_path):
+    result = stt.transcribe_file(tone_wav(tmp_path / 'two.wav', 2.0))
+    assert result['text'] == '2.0 seconds' and result['error'] is None
+    assert result['audio_seconds'] == pytest.approx(2.0)
+    assert result['rtf'] == pytest.approx(result['seconds'] / 2.0)
+    assert 0 < result['rtf'] < 1
+
+
+def test_transcribe_file_reports_errors(tmp_path, monkeypatch):
+    bad = tmp_path / 'bad.wav'
+    bad.write_bytes(b'not a wav file')
+    result = stt.transcribe_file(str(bad))
+    assert result['text'] is None and result['error'].startswith('unreadable WAV')
+
+    monkeypatch.setattr(stt, '_worker_backend', 'offline')
+    result = stt.transcribe_file(tone_wav(tmp_path / 'one.wav', 1.0))
+    assert (result['text'], result['error']) == (None, 'network unreachable')
+
+
+def test_batch_keeps_input_order(tmp_path):
+    lengths = [0.5, 3.0, 1.0, 2.0]
+    paths = [tone_wav(tmp_path / f'{i}.wav', seconds) for i, seconds in enumerate(lengths)]
+    results = list(stt.transcribe_batch(paths, 'fake', workers=2))
+    assert [result['path'] for result in results] == paths
+    assert [result['text'] for result in results] == [f"{seconds:.1f} seconds" for seconds in lengths]
+    assert all(result['rtf'] > 0 for result in results)
+
+
+def test_batch_fails_when_the_model_cannot_load(tmp_path):
+    with pytest.raises(RecognitionError):
+        list(stt.transcribe_batch([tone_wav(tmp_path / 'a.wav', 0.5)], 'broken', workers=1))
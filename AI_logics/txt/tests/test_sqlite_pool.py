@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+
+import pytest
+
+import sqlite_pool
+from sqlite_pool import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused(pool):
+    with pool.connection() as conn:
+        first = conn
+        conn.execute('CREATE TABLE t (x)')
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.stats == {'opened': 1, 'reused': 1}
+
+    # Two borrowed at once need two connections; only `size` are kept idle
+    held = [pool.acquire() for _ in range(3)]
+    assert len({id(conn) for conn in held}) == 3
+    for conn in held:
+        pool.release(conn)
+    assert len(pool._idle) == 2
+
+
+def test_connections_use_wal_and_the_tuned_pragmas(pool):
+    with pool.connection(row_factory=sqlite3.Row) as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA temp_store').fetchone()[0] == 2  # MEMORY
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == int(sqlite_pool.BUSY_TIMEOUT * 1000)
+        assert conn.isolation_level == 'IMMEDIATE'
+    with pool.connection() as conn:
+        assert conn.row_factory is None  # reset before the next borrower
+
+
+def test_failed_block_rolls_back(pool):
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x)')
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            raise RuntimeError
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+
+def test_writers_queue_on_the_lock_instead_of_failing(pool):
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE counter (n INTEGER)')
+        conn.execute('INSERT INTO counter VALUES (0)')
+
+    errors = []
+    holding = threading.Event()
+
+    def hold():
+        with pool.connection() as conn:
+            conn.execute('UPDATE counter SET n = n + 1')  # BEGIN IMMEDIATE: the write lock is ours
+            holding.set()
+            threading.Event().wait(0.3)
+
+    def bump():
+        holding.wait()
+        try:
+            for _ in range(10):
+                with pool.connection() as conn:
+                    conn.execute('UPDATE counter SET n = n + 1')
+                    # Still inside the same write transaction, so nobody else can change n here
+                    n = conn.execute('SELECT n FROM counter').fetchone()[0]
+                    conn.execute('UPDATE counter SET n = ?', (n + 1,))
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=hold)] + [threading.Thread(target=bump) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []  # waited out the 0.3 s holder instead of "database is locked"
+    with pool.connection() as conn:
+        assert conn.execute('SELECT n FROM counter').fetchone()[0] == 1 + 6 * 10 * 2
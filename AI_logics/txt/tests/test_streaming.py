@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TXT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOLD_S = 1.0  # the fake model pauses this long before its last sentence
+
+CHUNKS = ["The Bamileke live in", " the West Region. ", "They are known", " for their chiefdoms. "]
+LATE_CHUNKS = ["Masks are", " central to their festivals."]
+
+# Runs in a fresh interpreter: ollama reads OLLAMA_HOST when it is first imported
+CLIENT = '''
+import json, time
+import voice_assistant as va
+
+class Speech:
+    said = []
+    def say(self, text):
+        self.said.append((time.time(), text))
+
+va.init_db()
+answer = va.respond_stream(va.generate_response_stream("Who are the Bamileke?", []), 'voice', Speech())
+print(json.dumps({'answer': answer, 'said': Speech.said}))
+'''
+
+
+class FakeOllama(BaseHTTPRequestHandler):
+    requests = []
+    resumed_at = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        FakeOllama.requests.append((self.path, body))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for text in CHUNKS:
+            self._chunk(text)
+        time.sleep(HOLD_S)
+        FakeOllama.resumed_at = time.time()
+        for text in LATE_CHUNKS:
+            self._chunk(text)
+        self._chunk('', done=True)
+
+    def _chunk(self, text, done=False):
+        chunk = {'model': 'llama3', 'created_at': '2024-01-01T00:00:00Z',
+                 'message': {'role': 'assistant', 'content': text}, 'done': done}
+        if done:
+            chunk.update(eval_count=6, eval_duration=int(HOLD_S * 1e9))
+        self.wfile.write(json.dumps(chunk).encode() + b'\n')
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_sentences_are_spoken_before_the_stream_ends(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = dict(os.environ, OLLAMA_HOST=f'http://127.0.0.1:{server.server_port}',
+               ASSISTANT_DATA_DIR=str(tmp_path), VECTOR_SEARCH='0', PYTHONPATH=TXT_DIR)
+    try:
+        result = subprocess.run([sys.executable, '-c', CLIENT], cwd=TXT_DIR, env=env,
+                                capture_output=True, text=True, timeout=60)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result.returncode == 0, result.stderr
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert output['answer'] == ''.join(CHUNKS + LATE_CHUNKS)
+    path, body = FakeOllama.requests[0]
+    assert path == '/api/chat' and body['stream'] is True
+
+    said = output['said']
+    assert [text for _, text in said] == ["The Bamileke live in the West Region.",
+                                          "They are known for their chiefdoms.",
+                                          "Masks are central to their festivals."]
+    # The first two were queued for speech while the model was still generating
+    assert said[0][0] < FakeOllama.resumed_at
+    assert said[1][0] < FakeOllama.resumed_at
+    assert said[2][0] >= FakeOllama.resumed_at
@@ -0,0 +1,26 @@
+import telemetry
+
+
+def test_counters_and_gauges_render_grouped(monkeypatch):
+    monkeypatch.setattr(telemetry, '_histograms', {})
+    monkeypatch.setattr(telemetry, '_counters', {})
+    monkeypatch.setattr(telemetry, '_collectors', [])
+    telemetry.inc('test_events_total', event='hit')
+    telemetry.inc('test_events_total', 2, event='hit')
+    telemetry.register_collector(lambda: [('test_pool_idle', {'db': 'a'}, 1), ('test_pool_open', {'db': 'a'}, 2)])
+    telemetry.register_collector(lambda: [('test_pool_idle', {'db': 'b'}, 3)])
+
+    lines = telemetry.render_prometheus().splitlines()
+    assert 'test_events_total{event="hit"} 3' in lines
+    assert lines.count('# TYPE test_pool_idle gauge') == 1
+    idle = [i for i, line in enumerate(lines) if line.startswith('test_pool_idle{')]
+    assert idle == [idle[0], idle[0] + 1]  # both pools' samples in one block
+
+
+def test_span_lands_in_trace_and_stage_summary(monkeypatch):
+    monkeypatch.setattr(telemetry, '_histograms', {})
+    with telemetry.trace('turn') as turn:
+        with telemetry.span('retrieve'):
+            pass
+    assert [s['name'] for s in turn.spans] == ['retrieve']
+    assert telemetry.stage_summary()['retrieve']['count'] == 1
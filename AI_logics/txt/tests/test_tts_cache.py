@@ -0,0 +1,73 @@
+import threading
+import wave
+
+from tts_cache import CachedSpeech, ClipCache
+
+
+class FakeEngine:
+    """Writes a short silent WAV instead of synthesizing"""
+
+    def __init__(self):
+        self._pending = None
+
+    def getProperty(self, name):
+        return {'voice': 'test', 'rate': 150, 'volume': 1.0}[name]
+
+    def save_to_file(self, text, path):
+        self._pending = path
+
+    def runAndWait(self):
+        if self._pending:
+            with wave.open(self._pending, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(16000)
+                wav.writeframes(b'\0\0' * 160)
+            self._pending = None
+
+    def stop(self):
+        pass
+
+
+def test_speaking_until_every_sentence_has_played(tmp_path):
+    release = threading.Event()
+    played = []
+
+    def player(path, stopped):
+        release.wait(5)
+        played.append(path)
+        return True
+
+    speech = CachedSpeech(FakeEngine(), ClipCache(str(tmp_path)), player=player)
+    assert not speech.speaking
+    speech.prerender(["Processing your request..."])
+    speech.wait()
+    assert not speech.speaking  # pre-rendering isn't speech
+
+    speech.say("First sentence.")
+    speech.say("Second sentence.")
+    assert speech.speaking
+    release.set()
+    speech.wait()
+    assert not speech.speaking
+    assert len(played) == 2
+    speech.close()
+
+
+def test_interrupt_clears_speaking(tmp_path):
+    started = threading.Event()
+
+    def player(path, stopped):
+        started.set()
+        while not stopped():
+            pass
+        return False
+
+    speech = CachedSpeech(FakeEngine(), ClipCache(str(tmp_path)), player=player)
+    for index in range(5):
+        speech.say(f"Sentence number {index}.")
+    assert started.wait(5)
+    speech.interrupt()
+    speech.wait()
+    assert not speech.speaking
+    speech.close()
@@ -0,0 +1,96 @@
+import os
+import math
+import threading
+from array import array
+
+import audio_capture
+import voice_assistant as va
+from audio_capture import AudioCapture
+from speech_output import SpeechWorker
+
+RATE = 16000
+FRAME_MS = 30
+
+
+def tone(amplitude: float) -> bytes:
+    count = RATE * FRAME_MS // 1000
+    return array('h', (int(amplitude * math.sin(2 * math.pi * 440 * i / RATE)) for i in range(count))).tobytes()
+
+
+class LongEngine:
+    """Plays every sentence until stopped"""
+
+    def __init__(self):
+        self.playing = threading.Event()
+        self.stopped = threading.Event()
+
+    def say(self, text):
+        pass
+
+    def runAndWait(self):
+        self.playing.set()
+        self.stopped.wait(10)
+
+    def stop(self):
+        self.stopped.set()
+
+
+class Microphone:
+    """Silence until told to stop, or a fixed list of frames"""
+    sample_rate = RATE
+    frame_ms = FRAME_MS
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.closed = threading.Event()
+
+    def frames(self):
+        if self.stream is not None:
+            yield from self.stream
+            return
+        while not self.closed.wait(FRAME_MS / 1000):
+            yield tone(50)
+
+    def close(self):
+        self.closed.set()
+
+
+def test_typed_line_reaches_interrupt_during_playback():
+    engine = LongEngine()
+    speech = SpeechWorker(engine)
+    speech.say("A long answer that is still playing.")
+    assert engine.playing.wait(5)
+
+    capture = AudioCapture(Microphone(), paused=lambda: speech.speaking, on_barge_in=speech.interrupt).start()
+    read_end, write_end = os.pipe()
+    console = va.ConsoleInput(os.fdopen(read_end))
+    writer = os.fdopen(write_end, 'w')
+    threading.Timer(0.3, lambda: (writer.write("next question\n"), writer.flush())).start()
+    try:
+        query, mode = va.get_user_input(capture, console)
+        assert (query, mode) == ("next question", 'text')
+        assert speech.speaking and not engine.stopped.is_set()  # returned mid-playback
+        speech.interrupt()  # what main_loop does with new input
+        assert engine.stopped.is_set()
+    finally:
+        capture.close()
+        writer.close()
+        speech.close()
+
+
+def test_talking_over_the_answer_stops_it(monkeypatch):
+    monkeypatch.setattr(audio_capture, 'PLAYBACK_TAIL_MS', 0)
+    engine = LongEngine()
+    speech = SpeechWorker(engine)
+    speech.say("A long answer that is still playing.")
+    assert engine.playing.wait(5)
+
+    echo = [tone(1500)] * 60
+    stream = echo + [tone(8000)] * 30 + [tone(50)] * 40
+    capture = AudioCapture(Microphone(stream), paused=lambda: speech.speaking,
+                           on_barge_in=speech.interrupt).start()
+    assert capture.finished.wait(5)
+    assert engine.stopped.is_set()
+    assert capture.stats['barge_ins'] == 1
+    assert capture.get(timeout=0.2) is not None  # the interruption is the next question
+    speech.close()
@@ -0,0 +1,130 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from web_fetch import DeadlineExceeded, Fetcher
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = Fetcher(max_workers=4, per_host=1)
+    yield fetcher
+    fetcher.close()
+
+
+def test_map_returns_partial_results_at_the_deadline(fetcher):
+    delays = {'https://a.test/fast': 0.0, 'https://b.test/slow': 2.0, 'https://c.test/fast': 0.05}
+
+    def fetch(url):
+        time.sleep(delays[url])
+        return url.rsplit('/', 1)[1]
+
+    start = time.monotonic()
+    results = fetcher.map(fetch, list(delays), deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - start < 1.5
+    assert results == {'https://a.test/fast': 'fast', 'https://c.test/fast': 'fast'}
+
+
+def test_map_skips_failed_urls_and_duplicates(fetcher):
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        if 'bad' in url:
+            raise ValueError("boom")
+        return len(url)
+
+    results = fetcher.map(fetch, ['https://x.test/ok', 'https://x.test/bad', 'https://x.test/ok'])
+    assert results == {'https://x.test/ok': len('https://x.test/ok')}
+    assert sorted(calls) == ['https://x.test/bad', 'https://x.test/ok']
+
+
+def test_get_gives_up_when_no_host_slot_frees_before_the_deadline(fetcher):
+    url = 'https://busy.test/page'
+    slot = fetcher._slot(url)
+    slot.acquire()  # another request to the same host is in flight
+    try:
+        with pytest.raises(DeadlineExceeded):
+            fetcher.get(url, deadline=time.monotonic() + 0.1)
+    finally:
+        slot.release()
+
+
+class Pages(BaseHTTPRequestHandler):
+    """Stand-in web server; /slow/<seconds>/<name> answers after a delay"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse can be seen
+    lock = threading.Lock()
+    connections = set()
+    in_flight = 0
+    most_in_flight = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.connections.add(self.client_address)
+            cls.in_flight += 1
+            cls.most_in_flight = max(cls.most_in_flight, cls.in_flight)
+        try:
+            parts = self.path.strip('/').split('/')
+            if parts[0] == 'slow':
+                time.sleep(float(parts[1]))
+            body = parts[-1].encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Pages.connections, Pages.in_flight, Pages.most_in_flight = set(), 0, 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Pages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_reuses_one_connection(server, fetcher):
+    for i in range(5):
+        assert fetcher.get(f'{server}/page{i}').text == f'page{i}'
+    assert len(Pages.connections) == 1
+
+
+def test_per_host_limit_over_http(server):
+    fetcher = Fetcher(max_workers=6, per_host=2)
+    try:
+        urls = [f'{server}/slow/0.2/p{i}' for i in range(6)]
+        start = time.monotonic()
+        results = fetcher.map(lambda url: fetcher.get(url).text, urls)
+        elapsed = time.monotonic() - start
+    finally:
+        fetcher.close()
+    assert results == {url: url.rsplit('/', 1)[1] for url in urls}
+    assert Pages.most_in_flight == 2
+    assert elapsed >= 0.55  # three rounds of two
+    assert len(Pages.connections) <= 2  # the pool kept the host's connections open
+
+
+def test_deadline_returns_partial_results_over_http(server):
+    fetcher = Fetcher(max_workers=4, per_host=4)
+    urls = [f'{server}/fast', f'{server}/slow/0.1/medium', f'{server}/slow/5/late']
+    try:
+        deadline = time.monotonic() + 1.0
+        start = time.monotonic()
+        results = fetcher.map(lambda url: fetcher.get(url, deadline=deadline).text, urls, deadline=deadline)
+        elapsed = time.monotonic() - start
+    finally:
+        fetcher.close()
+    assert results == {urls[0]: 'fast', urls[1]: 'medium'}
+    assert elapsed < 2
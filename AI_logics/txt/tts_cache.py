@@ -0,0 +1,294 @@
+"""
+Cached text-to-speech clips.
+
+Instead of speaking through pyttsx3 directly, text is rendered to WAV clips
+that are kept in an on-disk LRU cache keyed by (text, voice, rate, volume).
+Fixed phrases are pre-rendered at startup and repeated answers play straight
+from the cache. `CachedSpeech` has the same interface as `SpeechWorker`: a
+synthesis thread owns the engine and renders the next sentence while the
+playback thread is still playing the previous one.
+
+Playback uses PyAudio (already needed for the microphone); without it the
+assistant keeps using `SpeechWorker`.
+"""
+import os
+import re
+import json
+import wave
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from lazy_imports import lazy_import, module_available
+from telemetry import describe, inc, span
+
+pyaudio = lazy_import('pyaudio')
+PLAYBACK_AVAILABLE = module_available('pyaudio')
+
+# ===== CONFIGURATION ===== #
+CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MB', 200)) * 1024 * 1024
+PLAYBACK_CHUNK = 1024  # frames per write; also how quickly an interrupt takes effect
+
+CLIP_CACHE_METRIC = 'assistant_tts_cache_events_total'
+describe(CLIP_CACHE_METRIC, "Speech clip cache hits, misses and evictions")
+
+_CLIP_NAME = re.compile(r'^[0-9a-f]{40}\.wav$')
+
+
+def clip_key(text: str, voice_id: Optional[str], rate: float, volume: float) -> str:
+    return hashlib.sha1(json.dumps([text, voice_id, int(rate), round(float(volume), 2)]).encode()).hexdigest()
+
+
+class ClipCache:
+    """WAV clips on disk, evicting the least recently played over `max_bytes`"""
+
+    def __init__(self, directory: str, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, oldest first
+        self._bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+        clips = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if _CLIP_NAME.match(name):
+                clips.append((os.path.getmtime(path), name[:-4], os.path.getsize(path)))
+            elif name.endswith('.partial.wav'):
+                os.remove(path)  # left behind by an interrupted render
+        for _, key, size in sorted(clips):
+            self._entries[key] = size
+            self._bytes += size
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached clip, marking it recently used"""
+        path = self.path(key)
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                inc(CLIP_CACHE_METRIC, event='hits')
+            else:
+                self.stats['misses'] += 1
+                inc(CLIP_CACHE_METRIC, event='misses')
+                return None
+        try:
+            os.utime(path)  # recency survives restarts
+        except OSError:
+            pass
+        return path
+
+    def add(self, key: str, rendered: str) -> str:
+        """Move a freshly rendered file into the cache"""
+        path = self.path(key)
+        os.replace(rendered, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self.stats['evicted'] += 1
+                inc(CLIP_CACHE_METRIC, event='evicted')
+                try:
+                    os.remove(self.path(old))
+                except OSError:
+                    pass
+        return path
+
+    def usage(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, clips=len(self._entries), bytes=self._bytes)
+
+
+_audio = None
+
+
+def play_wav(path: str, stopped: Callable[[], bool]) -> bool:
+    """Play a WAV file; returns False if `stopped()` cut it short"""
+    global _audio
+    if _audio is None:
+        _audio = pyaudio.PyAudio()
+    with wave.open(path, 'rb') as wav:
+        stream = _audio.open(format=_audio.get_format_from_width(wav.getsampwidth()),
+                             channels=wav.getnchannels(), rate=wav.getframerate(), output=True)
+        try:
+            while not stopped():
+                data = wav.readframes(PLAYBACK_CHUNK)
+                if not data:
+                    return True
+                stream.write(data)
+            return False
+        finally:
+            stream.stop_stream()
+            stream.close()
+
+
+class CachedSpeech:
+    """Drop-in for SpeechWorker that renders through the clip cache"""
+
+    def __init__(self, voice_engine, cache: ClipCache, player=play_wav):
+        self.voice_engine = voice_engine
+        self.cache = cache
+        self.player = player
+        self._texts = queue.Queue()  # (generation, text, play) for the synthesis thread
+        self._clips = queue.Queue()  # (generation, clip path) for the playback thread
+        self._generation = 0  # bumped on interrupt so stale sentences are skipped
+        self._speaking_directly = False
+        self._unspoken = 0  # sentences queued, rendering or playing
+        self._lock = threading.Lock()
+        self._synth_thread = threading.Thread(target=self._synthesize_loop, name='speech-synth', daemon=True)
+        self._play_thread = threading.Thread(target=self._play_loop, name='speech-play', daemon=True)
+        self._synth_thread.start()
+        self._play_thread.start()
+
+    def say(self, text: str):
+        """Queue text to be spoken after anything already queued"""
+        with self._lock:
+            self._unspoken += 1
+            self._texts.put((self._generation, text, True))
+
+    def prerender(self, phrases: Iterable[str]):
+        """Render phrases into the cache without playing them"""
+        for phrase in phrases:
+            self._texts.put((None, phrase, False))
+
+    def interrupt(self):
+        """Drop queued speech and cut off the clip being played"""
+        with self._lock:
+            self._generation += 1
+            for pending in (self._texts, self._clips):
+                kept = []  # pre-rendering and shutdown aren't speech
+                try:
+                    while True:
+                        item = pending.get_nowait()
+                        if item is None or item[0] is None:
+                            kept.append(item)
+                        else:
+                            self._unspoken -= 1
+                        pending.task_done()
+                except queue.Empty:
+                    pass
+                for item in kept:
+                    pending.put(item)
+        if self._speaking_directly:
+            try:
+                self.voice_engine.stop()
+            except Exception as e:
+                print(f"Voice interrupt error: {e}")
+
+    @property
+    def speaking(self) -> bool:
+        """True while any queued sentence is still to be played"""
+        return self._unspoken > 0
+
+    def _spoken(self):
+        with self._lock:
+            self._unspoken -= 1
+
+    def wait(self):
+        """Block until everything queued so far has been spoken"""
+        self._texts.join()
+        self._clips.join()
+
+    def close(self):
+        self._texts.put(None)
+        self._synth_thread.join(timeout=5)
+        self._play_thread.join(timeout=5)
+
+    def usage(self) -> Dict:
+        return self.cache.usage()
+
+    # ----- threads ----- #
+    def _settings(self) -> Tuple[Optional[str], float, float]:
+        engine = self.voice_engine
+        return engine.getProperty('voice'), engine.getProperty('rate'), engine.getProperty('volume')
+
+    def _render(self, text: str) -> Optional[str]:
+        """Cached clip for text in the current voice, rendering it if needed"""
+        key = clip_key(text, *self._settings())
+        path = self.cache.get(key)
+        if path is not None:
+            return path
+
+        partial = os.path.join(self.cache.directory, f"{key}.{threading.get_ident()}.partial.wav")
+        try:
+            with span('tts', chars=len(text)):
+                self.voice_engine.save_to_file(text, partial)
+                self.voice_engine.runAndWait()
+            with wave.open(partial, 'rb') as wav:
+                if wav.getnframes() == 0:
+                    raise ValueError("empty clip")
+        except Exception as e:
+            print(f"Speech synthesis error: {e}")
+            if os.path.exists(partial):
+                os.remove(partial)
+            return None
+        return self.cache.add(key, partial)
+
+    def _speak_directly(self, generation: int, text: str):
+        """Fallback when a clip can't be rendered: speak in order, through the engine"""
+        self._clips.join()  # let the clips queued before this sentence finish
+        if generation != self._generation:
+            return
+        self._speaking_directly = True
+        try:
+            self.voice_engine.say(text)
+            self.voice_engine.runAndWait()
+        finally:
+            self._speaking_directly = False
+
+    def _synthesize_loop(self):
+        while True:
+            item = self._texts.get()
+            try:
+                if item is None:
+                    self._clips.put(None)
+                    return
+                generation, text, play = item
+                if not play:
+                    self._render(text)
+                    continue
+                handed_off = False
+                try:
+                    if generation != self._generation:
+                        continue
+                    path = self._render(text)
+                    if path is None:
+                        self._speak_directly(generation, text)
+                    else:
+                        self._clips.put((generation, path))
+                        handed_off = True
+                finally:
+                    if not handed_off:
+                        self._spoken()
+            except Exception as e:
+                print(f"Voice output error: {e}")
+            finally:
+                self._texts.task_done()
+
+    def _play_loop(self):
+        while True:
+            item = self._clips.get()
+            try:
+                if item is None:
+                    return
+                generation, path = item
+                try:
+                    if generation == self._generation:
+                        with span('speak'):
+                            self.player(path, lambda: generation != self._generation)
+                finally:
+                    self._spoken()
+            except Exception as e:
+                print(f"Voice playback error: {e}")
+            finally:
+                self._clips.task_done()
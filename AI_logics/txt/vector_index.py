@@ -0,0 +1,479 @@
+"""
+Embedding-based retrieval over the knowledge tables.
+
+Chunks from `knowledge_base` and the `cultural_info` tables are embedded with a
+local model (Ollama's embedding endpoint by default) and stored in a
+memory-mapped float32 matrix. An IVF index (k-means centroids + inverted lists)
+keeps queries to a few milliseconds at 10^5-10^6 chunks on one CPU: a query
+is compared with the centroids, then only with the vectors in the closest
+few lists.
+
+New rows are picked up incrementally by `sync`: they are assigned to their
+nearest centroid and kept in a small tail that is merged into the inverted
+lists now and then, so adding a batch doesn't re-sort the whole index. The
+clustering is retrained only when the index has grown several times over,
+into temporary files that are swapped in, so searches carry on meanwhile. `sync` also forgets the
+vectors of rows that were deleted (or compacted away) since: the matrix is
+append-only, so they stay in the file but are masked out of every search.
+
+Run directly to build or update the index:
+    python vector_index.py [ai_assistant.db:knowledge_base cultural_data.db:cultural_info ...]
+"""
+import os
+import sys
+import json
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from lazy_imports import lazy_import, module_available
+
+# Both are loaded on first use, so importing this module stays cheap
+np = lazy_import('numpy')
+NUMPY_AVAILABLE = module_available('numpy')
+ollama = lazy_import('ollama')
+OLLAMA_AVAILABLE = module_available('ollama')
+
+from knowledge_store import content_hash
+from single_flight import SingleFlight
+from sqlite_pool import connection
+
+# ===== CONFIGURATION ===== #
+DATA_DIR = os.environ.get('ASSISTANT_DATA_DIR', '')
+INDEX_DIR = os.path.join(DATA_DIR, "vector_index")
+EMBED_MODEL = os.environ.get('EMBED_MODEL', 'nomic-embed-text')
+EMBED_BATCH = 32
+# The legacy databases are ingested into knowledge_base (see knowledge_ingest)
+DEFAULT_SOURCES = (
+    (os.path.join(DATA_DIR, 'ai_assistant.db'), 'knowledge_base'),
+)
+MIN_TRAIN_VECTORS = 2048  # below this a brute-force scan is already sub-millisecond
+TRAIN_SAMPLE = 50000
+KMEANS_ITERATIONS = 12
+NPROBE = 8  # inverted lists scanned per query
+RETRAIN_GROWTH = 4  # retrain once the index is this many times its trained size
+TAIL_MERGE = 8192  # rows added since the lists were built; merged in past this (or 1/8 of the index)
+HYBRID_WEIGHT = 0.5  # share of the semantic score in hybrid ranking
+
+
+def ollama_embedder(texts: List[str]) -> "np.ndarray":
+    """Embed texts with the local Ollama embedding model"""
+    if hasattr(ollama, 'embed'):
+        vectors = ollama.embed(model=EMBED_MODEL, input=texts)['embeddings']
+    else:
+        vectors = [ollama.embeddings(model=EMBED_MODEL, prompt=text)['embedding'] for text in texts]
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _assign(centroids: "np.ndarray", vectors: "np.ndarray") -> "np.ndarray":
+    """Nearest centroid of each vector"""
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+class VectorIndex:
+    """Memory-mapped embedding matrix with an incrementally updated IVF index"""
+
+    def __init__(self, directory: str = INDEX_DIR,
+                 embedder: Optional[Callable[[List[str]], "np.ndarray"]] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for vector search. Install with: pip install numpy")
+
+        self.directory = directory
+        self.embedder = embedder or ollama_embedder
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._meta = sqlite3.connect(os.path.join(directory, 'meta.db'), check_same_thread=False)
+        self._meta.executescript('''
+            CREATE TABLE IF NOT EXISTS vectors (
+                vec_row INTEGER PRIMARY KEY,
+                source_db TEXT NOT NULL,
+                source_table TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                content_hash TEXT,
+                UNIQUE (source_db, source_table, row_id)
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                source_db TEXT NOT NULL,
+                source_table TEXT NOT NULL,
+                last_row_id INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (source_db, source_table)
+            );
+            CREATE TABLE IF NOT EXISTS info (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        self._meta.commit()
+
+        self.dim = int(self._info('dim') or 0)
+        self.trained_size = int(self._info('trained_size') or 0)
+        self._vectors = None
+        self._centroids = None
+        # Inverted lists: (sorted rows, per-centroid offsets, tail rows, tail assignments)
+        self._lists: Optional[Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]] = None
+        self._load()
+        # Rows with no metadata left (pruned or replaced) must never be returned
+        live = np.fromiter((row for (row,) in self._meta.execute('SELECT vec_row FROM vectors')), dtype=np.int64)
+        self._dead = np.setdiff1d(np.arange(len(self), dtype=np.int64), live)
+
+    # ----- storage ----- #
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _info(self, key: str) -> Optional[str]:
+        row = self._meta.execute('SELECT value FROM info WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_info(self, key: str, value):
+        self._meta.execute('INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def __len__(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _map_vectors(self):
+        """(Re)map the vector file after it has grown"""
+        path = self._path('vectors.f32')
+        if not self.dim or not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._vectors = None
+            return
+        rows = os.path.getsize(path) // (4 * self.dim)
+        self._vectors = np.memmap(path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+
+    def _load(self):
+        """(Re)map the vector file and rebuild the inverted lists"""
+        self._map_vectors()
+        if self._vectors is None:
+            return
+
+        if os.path.exists(self._path('centroids.npy')):
+            self._centroids = np.load(self._path('centroids.npy'))
+            assignments = np.fromfile(self._path('assignments.i32'), dtype=np.int32)[:len(self)]
+            self._lists = self._build_lists(assignments)
+        else:
+            self._centroids = None
+            self._lists = None
+
+    def _build_lists(self, assignments: "np.ndarray"):
+        """Inverted lists as one sorted row array plus per-centroid offsets, and an empty tail"""
+        order = np.argsort(assignments, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+        return order, offsets, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+    def _extend_lists(self, start: int, assignments: "np.ndarray"):
+        """Add rows start.. to the tail, merging it into the sorted lists once it has grown"""
+        order, offsets, tail_rows, tail_assignments = self._lists
+        tail_rows = np.concatenate((tail_rows, np.arange(start, start + len(assignments), dtype=np.int64)))
+        tail_assignments = np.concatenate((tail_assignments, assignments))
+        if len(tail_rows) > max(TAIL_MERGE, len(order) // 8):
+            by_list = np.argsort(tail_assignments, kind='stable')
+            # Tail rows are newer than every listed row, so each goes to the end of its list
+            order = np.insert(order, offsets[tail_assignments[by_list] + 1], tail_rows[by_list])
+            counts = np.bincount(tail_assignments, minlength=len(self._centroids))
+            offsets = offsets + np.concatenate(([0], np.cumsum(counts)))
+            tail_rows, tail_assignments = tail_rows[:0], tail_assignments[:0]
+        self._lists = (order, offsets, tail_rows, tail_assignments)
+
+    def _assign(self, vectors: "np.ndarray") -> "np.ndarray":
+        return _assign(self._centroids, vectors)
+
+    def add(self, vectors: "np.ndarray", refs: Sequence[Tuple[str, str, int, Optional[str]]]):
+        """Append embeddings for (source_db, source_table, row_id, content_hash) rows"""
+        if len(vectors) == 0:
+            return
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+
+        with self._lock:
+            if not self.dim:
+                self.dim = vectors.shape[1]
+                self._set_info('dim', self.dim)
+                self._set_info('model', EMBED_MODEL)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding size changed from {self.dim} to {vectors.shape[1]}; "
+                                 f"delete {self.directory} to rebuild with the new model")
+
+            start = len(self)
+            with open(self._path('vectors.f32'), 'ab') as f:
+                f.write(vectors.tobytes())
+            assignments = None
+            if self._centroids is not None:
+                assignments = self._assign(vectors)
+                with open(self._path('assignments.i32'), 'ab') as f:
+                    f.write(assignments.tobytes())
+
+            replaced = self._existing_rows(refs)  # re-embedded rows; their old vectors go dead
+            self._meta.executemany('''
+                INSERT OR REPLACE INTO vectors (vec_row, source_db, source_table, row_id, content_hash)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(start + i,) + tuple(ref) for i, ref in enumerate(refs)])
+            self._meta.commit()
+            self._mark_dead(replaced)
+
+            self._vectors = None  # drop the old mapping before remapping the grown file
+            self._map_vectors()
+            if assignments is not None:
+                self._extend_lists(start, assignments)
+
+            size = len(self)
+            retrain = size >= MIN_TRAIN_VECTORS and (
+                self._centroids is None or size >= self.trained_size * RETRAIN_GROWTH)
+        if retrain:
+            self.train()
+
+    def _existing_rows(self, refs: Sequence[Tuple[str, str, int, Optional[str]]]) -> List[int]:
+        found = []
+        for source_db, source_table, row_id, _ in refs:
+            row = self._meta.execute(
+                'SELECT vec_row FROM vectors WHERE source_db = ? AND source_table = ? AND row_id = ?',
+                (source_db, source_table, row_id)
+            ).fetchone()
+            if row:
+                found.append(row[0])
+        return found
+
+    def _mark_dead(self, vec_rows: Sequence[int]):
+        if len(vec_rows):
+            self._dead = np.union1d(self._dead, np.asarray(vec_rows, dtype=np.int64))
+
+    def prune(self, source_db: str, source_table: str) -> int:
+        """Forget vectors whose source rows no longer exist; returns how many"""
+        with connection(source_db) as conn:
+            existing = {row_id for (row_id,) in conn.execute(f'SELECT id FROM {source_table}')}
+        with self._lock:
+            gone = [(vec_row, row_id) for vec_row, row_id in self._meta.execute(
+                'SELECT vec_row, row_id FROM vectors WHERE source_db = ? AND source_table = ?',
+                (source_db, source_table)
+            ).fetchall() if row_id not in existing]
+            if gone:
+                self._meta.executemany('DELETE FROM vectors WHERE vec_row = ?', [(vec_row,) for vec_row, _ in gone])
+                self._meta.commit()
+                self._mark_dead([vec_row for vec_row, _ in gone])
+        return len(gone)
+
+    def train(self):
+        """Cluster the vectors (spherical k-means) and rebuild every inverted list.
+
+        Runs outside the index lock on a snapshot of the rows, writing to temporary
+        files; only assigning rows added meanwhile and swapping the files in block
+        searches.
+        """
+        with self._train_lock:
+            with self._lock:
+                vectors = self._vectors
+            size = 0 if vectors is None else len(vectors)
+            if size == 0:
+                return
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(size, min(size, TRAIN_SAMPLE), replace=False))
+            sample = np.asarray(vectors[sample_rows])
+
+            nlist = int(min(4096, len(sample), max(16, np.sqrt(size))))
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+
+            for _ in range(KMEANS_ITERATIONS):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                # Per-cluster sums via one sort + reduceat instead of a scatter-add
+                order = np.argsort(labels, kind='stable')
+                counts = np.bincount(labels, minlength=nlist)
+                filled = np.flatnonzero(counts)
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+                sums = sample[rng.choice(len(sample), nlist)]  # re-seeds empty clusters
+                sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+                centroids = _normalize(sums)
+
+            # Assign everything in blocks so memory stays flat
+            np.save(self._path('centroids.tmp.npy'), centroids)
+            with open(self._path('assignments.tmp'), 'wb') as f:
+                for block in range(0, size, 65536):
+                    f.write(_assign(centroids, np.asarray(vectors[block:block + 65536])).tobytes())
+
+            with self._lock:
+                added = self._vectors[size:]  # rows added while training
+                with open(self._path('assignments.tmp'), 'ab') as f:
+                    f.write(_assign(centroids, np.asarray(added)).tobytes())
+                os.replace(self._path('assignments.tmp'), self._path('assignments.i32'))
+                os.replace(self._path('centroids.tmp.npy'), self._path('centroids.npy'))
+                self.trained_size = size
+                self._set_info('trained_size', size)
+                self._meta.commit()
+                self._load()
+
+    # ----- queries ----- #
+    def search_vector(self, query: "np.ndarray", k: int = 10, nprobe: int = NPROBE) -> List[Tuple[float, int]]:
+        """(cosine score, vec_row) pairs of the nearest stored vectors"""
+        with self._lock:
+            vectors, centroids, lists, dead = self._vectors, self._centroids, self._lists, self._dead
+        if vectors is None:
+            return []
+
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        if centroids is None:
+            candidates = None
+            scores = vectors @ query
+        else:
+            order, offsets, tail_rows, tail_assignments = lists
+            probe = np.argpartition(-(centroids @ query), min(nprobe, len(centroids) - 1))[:nprobe]
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe]
+                                        + [tail_rows[np.isin(tail_assignments, probe)]])
+            candidates.sort()  # sequential reads from the memory map
+            scores = vectors[candidates] @ query
+
+        if len(dead):
+            rows = np.arange(len(vectors)) if candidates is None else candidates
+            scores = np.where(np.isin(rows, dead), -np.inf, scores)
+        if len(scores) == 0:
+            return []
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if candidates is None else candidates[top]
+        return [(float(scores[i]), int(row)) for i, row in zip(top, rows) if scores[i] > -np.inf]
+
+    def search(self, text: str, k: int = 10) -> List[Dict]:
+        """Nearest chunks to a question, with their source rows' content"""
+        hits = self.search_vector(_embed_query(self.embedder, text), k)
+        if not hits:
+            return []
+
+        with self._lock:
+            refs = {
+                row[0]: row[1:] for row in self._meta.execute(
+                    f"SELECT vec_row, source_db, source_table, row_id FROM vectors "
+                    f"WHERE vec_row IN ({','.join('?' * len(hits))})", [row for _, row in hits]
+                ).fetchall()
+            }
+
+        by_source: Dict[Tuple[str, str], Dict[int, float]] = {}
+        for score, row in hits:
+            if row in refs:
+                source_db, source_table, row_id = refs[row]
+                by_source.setdefault((source_db, source_table), {})[row_id] = score
+
+        results = []
+        for (source_db, source_table), scores in by_source.items():
+            try:
+                with connection(source_db) as conn:
+                    for row_id, source_url, content in conn.execute(
+                            f"SELECT id, source_url, content FROM {source_table} "
+                            f"WHERE id IN ({','.join('?' * len(scores))})", list(scores)
+                    ).fetchall():
+                        results.append({"source": source_url, "content": content, "score": scores[row_id]})
+            except sqlite3.Error as e:
+                print(f"Vector lookup error in {source_db}: {e}")
+
+        # Rows deleted since they were embedded simply drop out here
+        return sorted(results, key=lambda item: -item['score'])
+
+    # ----- incremental build ----- #
+    def sync(self, sources: Sequence[Tuple[str, str]] = DEFAULT_SOURCES, batch: int = EMBED_BATCH) -> int:
+        """Embed rows added to the source tables since the last sync, and prune deleted ones"""
+        added = 0
+        with self._sync_lock:
+            for source_db, source_table in sources:
+                if not os.path.exists(source_db):
+                    continue
+                self.prune(source_db, source_table)
+                row = self._meta.execute(
+                    'SELECT last_row_id FROM sources WHERE source_db = ? AND source_table = ?',
+                    (source_db, source_table)
+                ).fetchone()
+                last_id = row[0] if row else 0
+
+                with connection(source_db) as conn:
+                    while True:
+                        rows = conn.execute(f'''
+                            SELECT id, content FROM {source_table}
+                            WHERE id > ? AND content IS NOT NULL AND content != ''
+                            ORDER BY id LIMIT ?
+                        ''', (last_id, batch)).fetchall()
+                        if not rows:
+                            break
+
+                        vectors = self.embedder([content for _, content in rows])
+                        self.add(vectors, [
+                            (source_db, source_table, row_id, content_hash(content))
+                            for row_id, content in rows
+                        ])
+                        last_id = rows[-1][0]
+                        added += len(rows)
+
+                        with self._lock:
+                            self._meta.execute('''
+                                INSERT OR REPLACE INTO sources (source_db, source_table, last_row_id)
+                                VALUES (?, ?, ?)
+                            ''', (source_db, source_table, last_id))
+                            self._meta.commit()
+        return added
+
+    def sync_in_background(self, sources: Sequence[Tuple[str, str]] = DEFAULT_SOURCES):
+        """Start a sync on a daemon thread unless one is already running"""
+        if self._sync_lock.locked():
+            return
+
+        def run():
+            try:
+                self.sync(sources)
+            except Exception as e:
+                print(f"Vector index sync error: {e}")
+
+        threading.Thread(target=run, name='vector-sync', daemon=True).start()
+
+
+_query_embeddings = SingleFlight()
+
+
+@lru_cache(maxsize=256)
+def _cached_query_embedding(embedder, text: str) -> "np.ndarray":
+    return embedder([text])[0]
+
+
+def _embed_query(embedder, text: str) -> "np.ndarray":
+    """Query embeddings are cached and coalesced, since the same questions come up repeatedly"""
+    text = ' '.join(text.lower().split())
+    return _query_embeddings.do((embedder, text), lambda: _cached_query_embedding(embedder, text))
+
+
+def hybrid_merge(keyword: List[Dict], semantic: List[Dict], limit: int,
+                 weight: float = HYBRID_WEIGHT) -> List[Dict]:
+    """Combine keyword (BM25) and semantic (cosine) results into one ranking.
+
+    Each list's scores are scaled to [0, 1] by its best score, then mixed with
+    `weight` going to the semantic side. Passages found by both add up.
+    """
+    merged: Dict[str, Dict] = {}
+    for results, share in ((keyword, 1 - weight), (semantic, weight)):
+        best = max((item.get('score') or 0 for item in results), default=0)
+        for item in results:
+            scaled = (item.get('score') or 0) / best if best > 0 else 0
+            key = content_hash(item['content'] or '')
+            if key in merged:
+                merged[key]['score'] += share * scaled
+            else:
+                merged[key] = dict(item, score=share * scaled)
+
+    return sorted(merged.values(), key=lambda item: -item['score'])[:limit]
+
+
+def parse_source(arg: str) -> Tuple[str, str]:
+    db, _, table = arg.partition(':')
+    return db, table or 'knowledge_base'
+
+
+if __name__ == "__main__":
+    if not (NUMPY_AVAILABLE and OLLAMA_AVAILABLE):
+        print("Vector index needs numpy and ollama: pip install numpy ollama")
+        sys.exit(1)
+
+    sources = [parse_source(arg) for arg in sys.argv[1:]] or list(DEFAULT_SOURCES)
+    index = VectorIndex()
+    added = index.sync(sources)
+    print(f"Embedded {added} new chunks; index holds {len(index)} vectors")
+    print(json.dumps({"dim": index.dim, "model": index._info('model'), "trained_size": index.trained_size}))
@@ -1,43 +1,165 @@
 import os
 import sys
+import json
 import time
-import sqlite3
-import requests
-import speech_recognition as sr
-import pyttsx3
-from typing import Optional, Tuple, List, Dict
-from bs4 import BeautifulSoup
+
+_STARTED = time.perf_counter()
+
+import queue
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Optional, Tuple, List, Dict, Iterator
+from lazy_imports import lazy_import, load_now, module_available, LOAD_TIMES
+from search_index import ensure_search_index, search as search_knowledge, rank_passages
+from web_fetch import get_fetcher
+from page_cache import get_page_cache, PageCache
+from knowledge_store import upsert_knowledge, replace_source_chunks
+from knowledge_ingest import migrate, ingest_sources, changed_sources
+from chunker import iter_blocks, chunk_blocks
+from context_packer import pack_context, estimate_tokens, merge_sources
+from speech_output import SentenceSplitter, SpeechWorker
+from tts_cache import CachedSpeech, ClipCache, PLAYBACK_AVAILABLE
+from answer_cache import AnswerCache, normalize_query
+from vector_index import VectorIndex, hybrid_merge, NUMPY_AVAILABLE
+from knowledge_refresher import KnowledgeRefresher
+from sqlite_pool import connection
+from single_flight import SingleFlight, SharedStream
+from shared import shared
+from audio_capture import AudioCapture, MicrophoneSource, WavSource
+from telemetry import trace, span, record, observe, stage_summary, RATE_BUCKETS
+from speech_to_text import get_recognizer, RecognitionError
+
+# Heavy modules load on first use; nothing here is needed for the first prompt
+pyttsx3 = lazy_import('pyttsx3')
+bs4 = lazy_import('bs4')
+ollama = lazy_import('ollama')
+OLLAMA_AVAILABLE = module_available('ollama')
+if not OLLAMA_AVAILABLE:
+    print("Warning: Ollama Python package not installed. Install with: pip install ollama")
+
+_IMPORTED = time.perf_counter()
 
 # ===== CONFIGURATION ===== #
-DB_NAME = "ai_assistant.db"
+DATA_DIR = os.environ.get('ASSISTANT_DATA_DIR', '')  # where the databases live; default is the cwd
+DB_NAME = os.path.join(DATA_DIR, "ai_assistant.db")
 SCRAPE_INTERVAL = 86400  # 24 hours in seconds
 DEFAULT_VOICE_RATE = 150
 DEFAULT_VOICE_VOLUME = 0.9
+WIKIPEDIA_URL = os.environ.get('WIKIPEDIA_URL', 'https://en.wikipedia.org')
+SCRAPE_PAGES = 3
+WEB_POLICY = os.environ.get('WEB_POLICY', 'auto')  # always | never | auto: only when local matches are weak
+WEB_MATCH_THRESHOLD = float(os.environ.get('WEB_MATCH_THRESHOLD', 0.5))  # normalized BM25 of a good local match
+SCRAPE_DEADLINE = 15  # seconds for the whole search + page downloads
+WEB_GRACE = 2  # seconds the answer waits for web results once the local ones are good enough
+WEB_CONTEXT_CHUNKS = 3  # best scraped chunks passed to the LLM
+LOCAL_CONTEXT_CHUNKS = 3
+VECTOR_SEARCH = os.environ.get('VECTOR_SEARCH', '1') != '0'  # needs numpy + an Ollama embedding model
+HYBRID_CANDIDATES = 10  # candidates taken from each retriever before merging
+AUTO_REFRESH = os.environ.get('AUTO_REFRESH', '1') != '0'  # re-scrape stale sources in the background
+LLM_MODEL = 'llama3'
+LLM_NUM_CTX = 4096
+ANSWER_TOKEN_RESERVE = 1024  # context window kept free for the answer
+LLM_OPTIONS = {
+    'temperature': 0.7,
+    'num_ctx': LLM_NUM_CTX
+}
+LISTEN_TIMEOUT = 5  # seconds to wait for speech before offering text input
+AUDIO_REPLAY = os.environ.get('ASSISTANT_AUDIO_REPLAY')  # WAV file to use instead of the microphone
+TTS_CACHE = os.environ.get('TTS_CACHE', '1') != '0'  # render speech to cached clips (needs PyAudio)
+TTS_CACHE_DIR = os.path.join(DATA_DIR, 'tts_cache')
+FIXED_PHRASES = (  # pre-rendered so they play without synthesis delay
+    "Processing your request...",
+    "Goodbye!",
+    "Voice settings have been updated",
+    "Switched to text mode",
+    "Switched to voice mode",
+    "Sorry, I encountered an error processing your request.",
+)
+STREAM_RESPONSES = True  # print/speak the answer while it is being generated
+SYSTEM_PROMPT = '''You are an AI assistant. Provide helpful, accurate responses 
+                based on the context provided. Cite sources when available.'''
 
-# Try to import Ollama with better error handling
-try:
-    import ollama
 
-    OLLAMA_AVAILABLE = True
-except ImportError:
-    OLLAMA_AVAILABLE = False
-    print("Warning: Ollama Python package not installed. Install with: pip install ollama")
+# ===== INITIALIZATION ===== #
+STARTUP_TIMES: Dict[str, float] = {}  # step -> seconds, for --profile-startup
+_background_startup: List[Future] = []
 
 
-# ===== INITIALIZATION ===== #
-def initialize_systems():
-    """Initialize all required systems with better error handling"""
-    init_db()
-    voice_engine = init_voice_engine()
+def _timed(step: str, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        STARTUP_TIMES[step] = time.perf_counter() - start
+
+
+def _in_background(step: str, fn) -> Future:
+    """Run a start-up step on a daemon thread, so it never delays exit"""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(_timed(step, fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f'startup-{step}', daemon=True).start()
+    _background_startup.append(future)
+    return future
+
+
+def initialize_systems() -> Future:
+    """Prepare the database, then start the slow checks in the background.
+
+    Returns a future of the voice engine (None in text-only mode); text
+    input works before it resolves.
+    """
+    _timed('init_db', init_db)
+    voice_engine = _in_background('voice engine', init_voice_engine)
 
     # Check Ollama connection if available
     if OLLAMA_AVAILABLE:
-        if not check_ollama_connection():
-            print("Falling back to simpler responses without Ollama")
+        _in_background('ollama check', check_ollama_in_background)
+    _in_background('module warm-up', warm_up_modules)
+    if VECTOR_SEARCH:
+        _in_background('vector index', sync_vector_index)
 
     return voice_engine
 
 
+def check_ollama_in_background():
+    if not check_ollama_connection():
+        print("Falling back to simpler responses without Ollama")
+
+
+def warm_up_modules():
+    """Import what the first question needs while the user is still typing"""
+    get_fetcher()  # loads requests
+    for module in (bs4, ollama):
+        try:
+            load_now(module)
+        except ImportError:
+            pass
+
+
+def print_startup_profile(title: str = 'time to first prompt'):
+    """Timing breakdown of start-up, for --profile-startup"""
+    print("\n[Startup profile]")
+    print(f"  {'module imports':<28}{(_IMPORTED - _STARTED) * 1000:8.1f} ms")
+    for step, seconds in STARTUP_TIMES.items():
+        print(f"  {step:<28}{seconds * 1000:8.1f} ms")
+    for module, seconds in sorted(LOAD_TIMES.items(), key=lambda item: -item[1]):
+        print(f"  {'lazy import ' + module:<28}{seconds * 1000:8.1f} ms")
+    print(f"  {title:<28}{(time.perf_counter() - _STARTED) * 1000:8.1f} ms")
+
+
+def profile_background_startup():
+    """Print the profile again once the background start-up steps are done"""
+    wait(_background_startup)
+    print_startup_profile('background steps done')
+
+
 def check_ollama_connection(retries=3, delay=2):
     """Check if Ollama is running with retries"""
     for attempt in range(retries):
@@ -59,7 +181,8 @@ def check_ollama_connection(retries=3, delay=2):
 def init_db():
     """Initialize the SQLite database"""
     try:
-        with sqlite3.connect(DB_NAME) as conn:
+        answer_cache = get_answer_cache()  # creates its tables; must not wait on the transaction below
+        with connection(DB_NAME) as conn:
             cursor = conn.cursor()
 
             cursor.execute('''
@@ -85,11 +208,18 @@ def init_db():
                                timestamp
                                DATETIME
                                DEFAULT
-                               CURRENT_TIMESTAMP
+                               CURRENT_TIMESTAMP,
+                               content_hash
+                               TEXT,
+                               section
+                               TEXT,
+                               chunk_index
+                               INTEGER
                            )
                            ''')
 
-            cursor.execute('''
+            # DDL can't take bound parameters, so the defaults are formatted in
+            cursor.execute(f'''
                            CREATE TABLE IF NOT EXISTS voice_settings
                            (
                                voice_id
@@ -99,23 +229,36 @@ def init_db():
                                rate
                                INTEGER
                                DEFAULT
-                               ?,
+                               {int(DEFAULT_VOICE_RATE)},
                                volume
                                REAL
                                DEFAULT
-                               ?,
+                               {float(DEFAULT_VOICE_VOLUME)},
                                last_updated
                                DATETIME
                                DEFAULT
                                CURRENT_TIMESTAMP
                            )
-                           ''', (DEFAULT_VOICE_RATE, DEFAULT_VOICE_VOLUME))
-
-            cursor.execute('''
-                           CREATE INDEX IF NOT EXISTS idx_content_search
-                               ON knowledge_base(content)
                            ''')
 
+            # Chunk columns, unique (source_url, content_hash) key, ingest log
+            migrate(conn)
+
+            # The legacy databases and JSON dumps all feed this one store;
+            # files whose checksum hasn't changed are skipped
+            ingested = ingest_sources(conn)
+            if ingested:
+                answer_cache.invalidate_sources(conn, changed_sources(ingested))
+                print(f"Ingested {sum(r['inserted'] for r in ingested.values())} new rows "
+                      f"({sum(r['skipped'] for r in ingested.values())} already stored) "
+                      f"from {len(ingested)} knowledge files")
+
+            # Full-text index replaces the old B-tree index on content,
+            # which could never serve a '%query%' lookup
+            cursor.execute('DROP INDEX IF EXISTS idx_content_search')
+            if not ensure_search_index(conn, 'knowledge_base'):
+                print("Warning: SQLite lacks FTS5, falling back to slow substring search")
+
             conn.commit()
     except Exception as e:
         print(f"Database initialization error: {e}")
@@ -127,6 +270,7 @@ def init_voice_engine():
         engine = pyttsx3.init()
         engine.setProperty('rate', DEFAULT_VOICE_RATE)
         engine.setProperty('volume', DEFAULT_VOICE_VOLUME)
+        load_voice_settings(engine)
 
         # Try a silent test to verify initialization
         engine.say(" ")
@@ -138,33 +282,119 @@ def init_voice_engine():
         return None
 
 
+def load_voice_settings(engine):
+    """Apply the voice settings saved last by configure_voice"""
+    try:
+        with connection(DB_NAME) as conn:
+            row = conn.execute(
+                'SELECT voice_id, rate, volume FROM voice_settings ORDER BY last_updated DESC LIMIT 1'
+            ).fetchone()
+        if row:
+            voice_id, rate, volume = row
+            engine.setProperty('voice', voice_id)
+            engine.setProperty('rate', rate)
+            engine.setProperty('volume', volume)
+    except Exception as e:
+        print(f"Voice settings error: {e}")
+
+
+def create_speech(voice_engine):
+    """Background speech output, playing cached clips when audio playback is available"""
+    if TTS_CACHE and PLAYBACK_AVAILABLE:
+        try:
+            speech = CachedSpeech(voice_engine, ClipCache(TTS_CACHE_DIR))
+            speech.prerender(FIXED_PHRASES)
+            return speech
+        except OSError as e:
+            print(f"Speech cache unavailable: {e}")
+    return SpeechWorker(voice_engine)
+
+
 # ===== INPUT HANDLING ===== #
-def get_user_input(voice_engine) -> Tuple[Optional[str], str]:
+class ConsoleInput:
+    """Reads typed lines on a thread of its own, so typing works while the assistant listens or talks"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self.lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='console-input', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for line in iter(self.stream.readline, ''):
+                self.lines.put(line.rstrip('\n'))
+        finally:
+            self.lines.put(None)  # end of input
+
+    @property
+    def pending(self) -> bool:
+        """A typed line is waiting"""
+        return not self.lines.empty()
+
+    def input(self, prompt: str = '') -> str:
+        """Like input(), for the lines read by the thread"""
+        print(prompt, end='', flush=True)
+        line = self.lines.get()
+        if line is None:
+            self.lines.put(None)  # stays at end of input
+            raise EOFError
+        return line
+
+
+def start_audio_capture(speech=None) -> Optional[AudioCapture]:
+    """Open the microphone (or the replay file) once for the whole session"""
+    try:
+        source = WavSource(AUDIO_REPLAY, realtime=True) if AUDIO_REPLAY else MicrophoneSource()
+        # Don't take the assistant's own voice for a question, but let the user talk over it
+        paused = (lambda: speech.speaking) if speech is not None else None
+        on_barge_in = speech.interrupt if speech is not None else None
+        capture = AudioCapture(source, paused=paused, on_barge_in=on_barge_in).start()
+    except Exception as e:
+        print(f"Voice input unavailable: {e}")
+        return None
+    # Load the speech model while the user is still deciding what to say
+    _in_background('speech model', lambda: get_recognizer().load())
+    return capture
+
+
+def recognize(utterance) -> Optional[str]:
+    try:
+        recognizer = get_recognizer()
+        with span('recognize', backend=recognizer.name, audio_seconds=round(utterance.duration, 3)):
+            return recognizer.transcribe(utterance.frames, utterance.sample_rate)
+    except (RecognitionError, ValueError) as e:
+        print(f"Speech recognition error: {e}")
+    return None
+
+
+def get_user_input(capture: Optional[AudioCapture] = None,
+                   console: Optional[ConsoleInput] = None) -> Tuple[Optional[str], str]:
     """Get user input with automatic mode detection"""
-    # Try voice input first if engine is available
-    if voice_engine is not None:
+    read = console.input if console is not None else input
+    typed = (lambda: console.pending) if console is not None else None
+    # Try voice input first; the capture thread has been listening all along
+    if capture is not None and capture.running:
         try:
-            recognizer = sr.Recognizer()
-            with sr.Microphone() as source:
-                print("\n[Listening...] (or type text)")
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
-
-                try:
-                    text = recognizer.recognize_google(audio)
+            capture.clear()  # anything said while the last turn was being handled
+            print("\n[Listening...] (or type text)")
+            with span('listen') as listened:
+                # A typed line ends the wait even while an answer is still playing
+                utterance = capture.get(timeout=LISTEN_TIMEOUT, interrupted=typed)
+                listened['heard'] = utterance is not None
+            if utterance is not None:
+                text = recognize(utterance)
+                if text:
                     print(f"[Voice Input]: {text}")
                     return text, 'voice'
-                except sr.UnknownValueError:
-                    pass
-                except sr.RequestError as e:
-                    print(f"Speech recognition error: {e}")
         except Exception as e:
             print(f"Voice input error: {e}")
 
     # Fall back to text input
     try:
-        print("\n[Ready for text input] (or speak)")
-        text = input("> ").strip()
+        if typed is None or not typed():
+            print("\n[Ready for text input] (or speak)")
+        text = read("> ").strip()
         if text:
             print(f"[Text Input]: {text}")
             return text, 'text'
@@ -175,10 +405,51 @@ def get_user_input(voice_engine) -> Tuple[Optional[str], str]:
 
 
 # ===== KNOWLEDGE MANAGEMENT ===== #
-def query_local_knowledge(query: str) -> List[Dict]:
-    """Search local database for relevant information"""
+_vector_index: Optional[VectorIndex] = None
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """Embedding index over the knowledge tables, or None if it can't be used"""
+    global _vector_index, VECTOR_SEARCH
+    if _vector_index is None and VECTOR_SEARCH:
+        if not (NUMPY_AVAILABLE and OLLAMA_AVAILABLE):
+            VECTOR_SEARCH = False
+            return None
+        try:
+            _vector_index = VectorIndex()
+        except Exception as e:
+            print(f"Vector index unavailable, using keyword search only: {e}")
+            VECTOR_SEARCH = False
+    return _vector_index
+
+
+def sync_vector_index():
+    """Embed knowledge_base rows the index hasn't seen yet (all of them on first run) and drop deleted ones"""
+    index = get_vector_index()
+    if index is not None:
+        index.sync_in_background([(DB_NAME, 'knowledge_base')])
+
+
+def semantic_search(query: str, limit: int) -> List[Dict]:
+    """Nearest chunks by embedding similarity; empty if the index isn't usable"""
+    index = get_vector_index()
+    if index is None or len(index) == 0:
+        return []
+    try:
+        with span('retrieve', kind='semantic'):
+            return index.search(query, limit)
+    except Exception as e:
+        print(f"Vector search error: {e}")
+        return []
+
+
+def keyword_search(query: str) -> List[Dict]:
+    """BM25 matches from the local database (unscored substring matches without FTS5)"""
     try:
-        with sqlite3.connect(DB_NAME) as conn:
+        with span('retrieve', kind='keyword'), connection(DB_NAME) as conn:
+            if ensure_search_index(conn, 'knowledge_base'):
+                return search_knowledge(conn, query, 'knowledge_base', HYBRID_CANDIDATES)
+
             cursor = conn.cursor()
             cursor.execute('''
                            SELECT source_url, content
@@ -197,109 +468,383 @@ def query_local_knowledge(query: str) -> List[Dict]:
         return []
 
 
-def scrape_web(query: str) -> List[Dict]:
-    """Scrape web for information related to query"""
-    if input("Search web for additional info? (y/n): ").lower() != 'y':
-        return []
+def merge_local(keyword: List[Dict], semantic: List[Dict]) -> List[Dict]:
+    if not semantic:
+        return keyword[:LOCAL_CONTEXT_CHUNKS]
+    return hybrid_merge(keyword, semantic, LOCAL_CONTEXT_CHUNKS)
+
+
+def query_local_knowledge(query: str) -> List[Dict]:
+    """Search local database for relevant information, best match first.
+
+    Combines BM25 keyword matches with embedding neighbours when the vector
+    index is available, so paraphrases are found too.
+    """
+    return merge_local(keyword_search(query), semantic_search(query, HYBRID_CANDIDATES))
+
+
+def wants_web(local_match: float, policy: Optional[str] = None) -> bool:
+    """Whether to search the web, given the best local match (normalized BM25, see search_index)"""
+    policy = policy or WEB_POLICY
+    if policy == 'always':
+        return True
+    if policy == 'never':
+        return False
+    return local_match < WEB_MATCH_THRESHOLD
+
+
+def best_match(items: List[Dict]) -> float:
+    return max((item.get('match') or 0.0 for item in items), default=0.0)
+
+
+def _store_late_web(web: Future):
+    """Web results that arrived after the answer started are kept for next time"""
+    if not web.cancelled() and web.exception() is None and web.result():
+        store_knowledge_later(web.result())
+
+
+_turn_executor: Optional[ThreadPoolExecutor] = None
+
+
+def gather_context(query: str, policy: Optional[str] = None,
+                   executor: Optional[ThreadPoolExecutor] = None) -> List[Dict]:
+    """Context for one answer, with local retrieval and the web search overlapping.
+
+    With the `always` policy (default: WEB_POLICY) the web search starts right
+    away; with `auto` it starts once the keyword search shows the local matches
+    are weak, while the semantic search is still running. When the local
+    matches are good enough the answer waits at most WEB_GRACE for the web;
+    later pages are stored for next time instead. Scraped chunks go to the
+    background writer instead of being stored before the answer. Servers
+    answering many questions at once pass an `executor` of their own.
+    """
+    global _turn_executor
+    if executor is None:
+        if _turn_executor is None:
+            _turn_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='turn')
+        executor = _turn_executor
+    policy = policy or WEB_POLICY
+
+    def submit(fn, *args) -> Future:
+        # In a copy of this context, so the spans land in the turn's trace
+        return executor.submit(contextvars.copy_context().run, fn, *args)
+
+    semantic = submit(semantic_search, query, HYBRID_CANDIDATES)
+    web = submit(search_web, query) if policy == 'always' else None
+    keyword = keyword_search(query)
+    local_enough = not wants_web(best_match(keyword), 'auto')
+    if web is None and wants_web(best_match(keyword), policy):
+        web = submit(search_web, query)
+
+    context = merge_local(keyword, semantic.result())
+    web_knowledge = []
+    if web is not None:
+        try:
+            web_knowledge = web.result(timeout=WEB_GRACE if local_enough else None)
+        except FutureTimeout:
+            web.add_done_callback(_store_late_web)
+    if web_knowledge:
+        store_knowledge_later(web_knowledge)
+        context = merge_sources(context, rank_passages(query, web_knowledge, WEB_CONTEXT_CHUNKS))
+    return context
+
+
+# Identical searches/fetches running at the same time share one request
+_web_searches = SingleFlight()
+_page_fetches = SingleFlight()
+
 
+def search_web(query: str) -> List[Dict]:
+    """Search Wikipedia and chunk the top pages"""
+    return _web_searches.do(normalize_query(query), lambda: _search_web(query))
+
+
+def _search_web(query: str) -> List[Dict]:
     try:
+        fetcher = get_fetcher()
+        deadline = time.monotonic() + SCRAPE_DEADLINE
+
         # Example: Search Wikipedia
-        search_url = f"https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch={query}&format=json"
-        response = requests.get(search_url, timeout=10)
+        with span('fetch', kind='search') as fetched:
+            response = fetcher.get(f"{WIKIPEDIA_URL}/w/api.php", deadline=deadline, params={
+                'action': 'query',
+                'list': 'search',
+                'srsearch': query,
+                'format': 'json'
+            })
+            fetched['status'] = response.status_code
         response.raise_for_status()
 
-        results = []
-        for item in response.json().get('query', {}).get('search', [])[:3]:
-            page_url = f"https://en.wikipedia.org/wiki/{item['title'].replace(' ', '_')}"
-            page_content = get_page_content(page_url)
-            if page_content:
-                results.append({
-                    "source": page_url,
-                    "content": page_content
-                })
-
-        return results
+        page_urls = [
+            f"{WIKIPEDIA_URL}/wiki/{item['title'].replace(' ', '_')}"
+            for item in response.json().get('query', {}).get('search', [])[:SCRAPE_PAGES]
+        ]
+
+        # Download the pages concurrently; keep search order for whatever finished
+        pages = fetcher.map(lambda url: get_page_content(url, deadline), page_urls, deadline)
+        return [
+            dict(chunk, source=url)
+            for url in page_urls
+            for chunk in pages.get(url) or []
+        ]
     except Exception as e:
         print(f"Web scraping error: {e}")
         return []
 
 
-def get_page_content(url: str) -> Optional[str]:
-    """Get cleaned content from a web page"""
+def get_page_content(url: str, deadline: Optional[float] = None) -> Optional[List[Dict]]:
+    """Get the chunked content of a web page, served from the page cache when fresh"""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, 'html.parser')
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return _page_fetches.do(url, lambda: _fetch_page_content(url, deadline), timeout=timeout)
+    except TimeoutError:
+        print(f"Page content extraction error: timed out waiting for {url}")
+        return None
 
-        # Remove unwanted elements
-        for element in soup(['script', 'style', 'nav', 'footer', 'iframe', 'aside']):
-            element.decompose()
 
-        # Extract main content
-        content = []
-        for paragraph in soup.find_all('p'):
-            text = ' '.join(paragraph.get_text().split())
-            if text and len(text) > 50:  # Filter out short paragraphs
-                content.append(text)
+def _fetch_page_content(url: str, deadline: Optional[float]) -> Optional[List[Dict]]:
+    try:
+        cache = get_page_cache()
+        cached, fresh = cache.get(url, SCRAPE_INTERVAL)
+        if fresh:
+            return cached_chunks(cached)
+
+        # Stale or missing: conditional GET so unchanged pages cost a 304 only
+        with span('fetch', kind='page', url=url) as fetched:
+            response = get_fetcher().get(url, deadline=deadline, headers=PageCache.conditional_headers(cached))
+            fetched.update(status=response.status_code, bytes=len(response.content))
+        if response.status_code == 304 and cached:
+            cache.mark_revalidated(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return cached_chunks(cached)
+        response.raise_for_status()
 
-        return ' '.join(content)[:2000]  # Limit content length
+        with span('parse', url=url) as parsed:
+            chunks = extract_page_content(response.text)
+            parsed['chunks'] = len(chunks)
+        cache.put(url, response.text, json.dumps(chunks),
+                  response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return chunks
     except Exception as e:
         print(f"Page content extraction error: {e}")
         return None
 
 
+def cached_chunks(entry: Dict) -> List[Dict]:
+    """Chunks stored with a cache entry, re-parsed from the raw page if missing"""
+    try:
+        chunks = json.loads(entry['content'] or 'null')
+        if isinstance(chunks, list):
+            return chunks
+    except ValueError:
+        pass
+    # Entry written before pages were chunked
+    return extract_page_content(entry['body'])
+
+
+def extract_page_content(html: str) -> List[Dict]:
+    """Split a page's readable text into overlapping, section-labelled chunks"""
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    # Remove unwanted elements
+    for element in soup(['script', 'style', 'nav', 'footer', 'iframe', 'aside']):
+        element.decompose()
+
+    heading = soup.find('h1')
+    title = ' '.join(heading.get_text().split()) if heading else None
+
+    return list(chunk_blocks(iter_blocks(soup), title))
+
+
 def store_knowledge(data: List[Dict]):
-    """Store scraped knowledge in database"""
+    """Store scraped knowledge in database, refreshing entries we already have"""
     try:
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.executemany('''
-                               INSERT INTO knowledge_base (source_url, category, content)
-                               VALUES (?, ?, ?)
-                               ''', [
-                                   (item['source'], 'web_scrape', item['content'])
-                                   for item in data
-                               ])
+        with span('store', rows=len(data)), connection(DB_NAME) as conn:
+            changed_sources = upsert_knowledge(conn, data)
+            # Answers built from pages that just changed are no longer trustworthy
+            get_answer_cache().invalidate_sources(conn, changed_sources)
+            conn.commit()
+
+        # Embed the new chunks without holding up the answer
+        if changed_sources:
+            sync_vector_index()
+    except Exception as e:
+        print(f"Knowledge storage error: {e}")
+
+
+_knowledge_writes: Optional[queue.Queue] = None
+_writer_lock = threading.Lock()
+
+
+def store_knowledge_later(data: List[Dict]):
+    """Queue scraped knowledge for the background writer, off the answer's critical path"""
+    global _knowledge_writes
+    with _writer_lock:
+        if _knowledge_writes is None:
+            _knowledge_writes = queue.Queue()
+            threading.Thread(target=_write_knowledge, name='knowledge-writer', daemon=True).start()
+    _knowledge_writes.put(data)
+
+
+def _write_knowledge():
+    while True:
+        data = _knowledge_writes.get()
+        try:
+            store_knowledge(data)
+        finally:
+            _knowledge_writes.task_done()
+
+
+def flush_knowledge_writes():
+    """Wait until queued knowledge has been stored"""
+    if _knowledge_writes is not None:
+        _knowledge_writes.join()
+
+
+def store_source_chunks(source_url: str, chunks: List[Dict], category: str = 'web_scrape') -> bool:
+    """Replace the stored chunks of one page with a fresh scrape; True if it changed"""
+    try:
+        with connection(DB_NAME) as conn:
+            changed = replace_source_chunks(conn, source_url, chunks, category)
+            if changed:
+                get_answer_cache().invalidate_sources(conn, [source_url])
             conn.commit()
+
+        if changed:
+            sync_vector_index()
+        return changed
     except Exception as e:
         print(f"Knowledge storage error: {e}")
+        return False
+
+
+def create_refresher() -> KnowledgeRefresher:
+    """Background refresher that keeps scraped sources younger than SCRAPE_INTERVAL"""
+    return KnowledgeRefresher(
+        fetch_chunks=get_page_content,
+        store_chunks=store_source_chunks,
+        db_path=DB_NAME,
+        max_age=SCRAPE_INTERVAL
+    )
 
 
 # ===== AI PROCESSING ===== #
+get_answer_cache = shared(lambda: AnswerCache(DB_NAME))  # stored alongside the knowledge base
+_answer_streams = SharedStream()  # identical concurrent questions share one generation
+
+
+def build_messages(query: str, context: List[Dict]) -> Tuple[List[Dict], Dict]:
+    """Pack the context into the token budget and build the chat messages"""
+    budget = LLM_NUM_CTX - ANSWER_TOKEN_RESERVE - estimate_tokens(SYSTEM_PROMPT + query)
+    packed = pack_context(context, max(budget, 0))
+    if packed['dropped_items'] or packed['dropped_tokens']:
+        print(f"[Context]: packed ~{packed['packed_tokens']} tokens from {len(packed['items'])} sources, "
+              f"dropped ~{packed['dropped_tokens']} tokens ({packed['dropped_items']} sources)")
+
+    context_str = "\n".join(
+        f"Source {i + 1} ({item['source']}):\n{item['content']}\n"
+        for i, item in enumerate(packed['items'])
+    ) if packed['items'] else "No additional context available."
+
+    messages = [{
+        'role': 'system',
+        'content': SYSTEM_PROMPT
+    }, {
+        'role': 'user',
+        'content': f"Question: {query}\n\nContext:\n{context_str}"
+    }]
+    return messages, packed
+
+
 def generate_response(query: str, context: List[Dict]) -> str:
     """Generate response with fallback if Ollama isn't available"""
     if not OLLAMA_AVAILABLE:
         return simple_response(query, context)
 
     try:
-        # Prepare context for the LLM
-        context_str = "\n".join(
-            f"Source {i + 1} ({item['source']}):\n{item['content']}\n"
-            for i, item in enumerate(context)
-        ) if context else "No additional context available."
-
-        response = ollama.chat(
-            model='llama3',
-            messages=[{
-                'role': 'system',
-                'content': '''You are an AI assistant. Provide helpful, accurate responses 
-                based on the context provided. Cite sources when available.'''
-            }, {
-                'role': 'user',
-                'content': f"Question: {query}\n\nContext:\n{context_str}"
-            }],
-            options={
-                'temperature': 0.7,
-                'num_ctx': 4096
-            }
-        )
-        return response['message']['content']
+        messages, packed = build_messages(query, context)
+        cache = get_answer_cache()
+        cache_key = cache.make_key(query, LLM_MODEL, LLM_OPTIONS, packed['items'])
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        return ''.join(_stream_answer(cache, cache_key, messages))
     except Exception as e:
         print(f"LLM generation error: {e}")
         return simple_response(query, context)
 
 
+def generate_response_stream(query: str, context: List[Dict]) -> Iterator[str]:
+    """Stream the response token by token, falling back like generate_response.
+
+    The Ollama server address comes from the OLLAMA_HOST environment variable,
+    so this can be pointed at a local fake server.
+    """
+    if not OLLAMA_AVAILABLE:
+        yield simple_response(query, context)
+        return
+
+    produced = False
+    try:
+        messages, packed = build_messages(query, context)
+        cache = get_answer_cache()
+        cache_key = cache.make_key(query, LLM_MODEL, LLM_OPTIONS, packed['items'])
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        for token in _stream_answer(cache, cache_key, messages):
+            produced = True
+            yield token
+    except Exception as e:
+        print(f"LLM generation error: {e}")
+        if not produced:
+            yield simple_response(query, context)
+
+
+def _stream_answer(cache: AnswerCache, cache_key: Dict, messages: List[Dict]) -> Iterator[str]:
+    """Tokens of the LLM answer, shared with any identical generation in flight"""
+    def produce():
+        parts = []
+        start = time.perf_counter()
+        first_token = None
+        final = {}
+        for chunk in ollama.chat(
+                model=LLM_MODEL,
+                messages=messages,
+                options=LLM_OPTIONS,
+                stream=True
+        ):
+            token = chunk['message']['content']
+            if token:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    record('llm_first_token', first_token, start)
+                parts.append(token)
+                yield token
+            if chunk.get('done'):
+                final = chunk
+        cache.put(cache_key, ''.join(parts))
+        record_generation(start, first_token, len(parts), final)
+
+    return _answer_streams.subscribe(cache_key['key'], produce)
+
+
+def record_generation(start: float, first_token: Optional[float], chunks: int, final):
+    """LLM span with prefill and decode rates, from Ollama's own counters when it sends them"""
+    seconds = time.perf_counter() - start
+    tokens = final.get('eval_count') or chunks
+    eval_seconds = (final.get('eval_duration') or 0) / 1e9 or seconds - (first_token or 0)
+    rate = tokens / eval_seconds if eval_seconds > 0 else 0.0
+    prefill = (final.get('prompt_eval_duration') or 0) / 1e9
+    if prefill:
+        record('llm_prefill', prefill, start, prompt_tokens=final.get('prompt_eval_count'))
+    observe('assistant_llm_tokens_per_second', rate, RATE_BUCKETS)
+    record('llm', seconds, start, tokens=tokens, tokens_per_second=round(rate, 1),
+           first_token=None if first_token is None else round(first_token, 3))
+
+
 def simple_response(query: str, context: List[Dict]) -> str:
     """Fallback response generator when Ollama isn't available"""
     if context:
@@ -309,11 +854,13 @@ def simple_response(query: str, context: List[Dict]) -> str:
 
 
 # ===== OUTPUT HANDLING ===== #
-def respond(response: str, mode: str, voice_engine):
+def respond(response: str, mode: str, voice_engine, speech: Optional[SpeechWorker] = None):
     """Deliver response in the appropriate mode"""
     try:
         print(f"\n[Assistant]: {response}")
-        if mode == 'voice' and voice_engine is not None:
+        if mode == 'voice' and speech is not None:
+            speech.say(response)
+        elif mode == 'voice' and voice_engine is not None:
             try:
                 voice_engine.say(response)
                 voice_engine.runAndWait()
@@ -323,8 +870,35 @@ def respond(response: str, mode: str, voice_engine):
         print(f"Response delivery error: {e}")
 
 
-def configure_voice(voice_engine):
+def respond_stream(tokens: Iterator[str], mode: str, speech: Optional[SpeechWorker] = None) -> str:
+    """Print tokens as they arrive and queue each finished sentence for speech"""
+    speak = mode == 'voice' and speech is not None
+    splitter = SentenceSplitter()
+    parts = []
+
+    print("\n[Assistant]: ", end='', flush=True)
+    try:
+        for token in tokens:
+            parts.append(token)
+            print(token, end='', flush=True)
+            if speak:
+                for sentence in splitter.feed(token):
+                    speech.say(sentence)
+    except Exception as e:
+        print(f"\nResponse delivery error: {e}")
+    finally:
+        print()
+        rest = splitter.flush()
+        if speak and rest:
+            speech.say(rest)
+
+    return ''.join(parts)
+
+
+def configure_voice(voice_engine, speech: Optional[SpeechWorker] = None,
+                    console: Optional[ConsoleInput] = None):
     """Configure voice settings interactively"""
+    read = console.input if console is not None else input
     if voice_engine is None:
         print("Voice output not available")
         return
@@ -339,24 +913,26 @@ def configure_voice(voice_engine):
         print(f"{i + 1}. {voice.name} ({voice.id})")
 
     try:
-        choice = int(input("Select voice (number): ")) - 1
+        choice = int(read("Select voice (number): ")) - 1
         if 0 <= choice < len(voices):
-            rate = int(input(f"Speech rate (50-300, default {DEFAULT_VOICE_RATE}): ") or DEFAULT_VOICE_RATE)
-            volume = float(input(f"Volume (0.1-1.0, default {DEFAULT_VOICE_VOLUME}): ") or DEFAULT_VOICE_VOLUME)
+            rate = int(read(f"Speech rate (50-300, default {DEFAULT_VOICE_RATE}): ") or DEFAULT_VOICE_RATE)
+            volume = float(read(f"Volume (0.1-1.0, default {DEFAULT_VOICE_VOLUME}): ") or DEFAULT_VOICE_VOLUME)
 
             voice_engine.setProperty('voice', voices[choice].id)
             voice_engine.setProperty('rate', rate)
             voice_engine.setProperty('volume', volume)
 
             # Save settings
-            with sqlite3.connect(DB_NAME) as conn:
+            with connection(DB_NAME) as conn:
                 conn.execute('''
                     INSERT OR REPLACE INTO voice_settings (voice_id, rate, volume)
                     VALUES (?, ?, ?)
                 ''', (voices[choice].id, rate, volume))
 
             print("Voice settings updated!")
-            respond("Voice settings have been updated", 'voice', voice_engine)
+            if isinstance(speech, CachedSpeech):
+                speech.prerender(FIXED_PHRASES)  # the new voice has no clips yet
+            respond("Voice settings have been updated", 'voice', voice_engine, speech)
         else:
             print("Invalid selection")
     except ValueError:
@@ -364,68 +940,132 @@ def configure_voice(voice_engine):
 
 
 # ===== MAIN LOOP ===== #
-def main_loop(voice_engine):
+def show_stats(speech=None):
+    """Print cache counters, to help size the caches"""
+    print(f"\n[Page cache]: {get_page_cache().usage()}")
+    print(f"[Answer cache]: {get_answer_cache().usage()}")
+    print(f"[Coalesced]: searches {_web_searches.stats}, pages {_page_fetches.stats}, "
+          f"generations {_answer_streams.stats}")
+    if isinstance(speech, CachedSpeech):
+        print(f"[Speech cache]: {speech.usage()}")
+    stages = stage_summary()
+    if stages:
+        print("[Latency]: stage  count  mean  p50  p95 (bucket bounds)")
+        for stage, stats in stages.items():
+            print(f"  {stage:<16}{stats['count']:6d}  {stats['mean'] * 1000:8.1f} ms  "
+                  f"<={stats['p50']:g} s  <={stats['p95']:g} s")
+
+
+def main_loop(voice_engine_future: Optional[Future]):
     """Main interaction loop with better error handling"""
     print("\n=== AI Assistant ===")
     print("You can speak or type your queries.")
-    print("Special commands: 'settings', 'mode', 'exit'")
+    print("Special commands: 'settings', 'mode', 'stats', 'exit'")
+
+    voice_engine = None
+    speech = None
+    capture = None
+    console = ConsoleInput()  # typed lines are read even while an answer plays
+    mode = 'text'
 
     while True:
-        try:
-            # Get user input
-            query, mode = get_user_input(voice_engine)
-            if not query:
-                continue
-
-            # Handle special commands
-            if query.lower() == 'exit':
-                respond("Goodbye!", mode, voice_engine)
+        # Text works straight away; voice joins in once the engine is up
+        if voice_engine_future is not None and voice_engine_future.done():
+            voice_engine = voice_engine_future.result()
+            voice_engine_future = None
+            if voice_engine is not None:
+                # Speech plays in the background so the next turn can interrupt it
+                speech = create_speech(voice_engine)
+                capture = start_audio_capture(speech)
+
+        # One trace per question: listen, recognize, retrieve, fetch, llm, tts
+        with trace('turn') as turn:
+            try:
+                # Get user input
+                query, mode = get_user_input(capture, console)
+                if not query:
+                    turn.discard()
+                    continue
+
+                # New input cuts off whatever is still being said
+                if speech is not None:
+                    speech.interrupt()
+
+                # Handle special commands
+                if query.lower() in ('exit', 'settings', 'stats', 'mode'):
+                    turn.discard()  # only questions are traced
+                if query.lower() == 'exit':
+                    respond("Goodbye!", mode, voice_engine, speech)
+                    break
+
+                if query.lower() == 'settings':
+                    configure_voice(voice_engine, speech, console)
+                    continue
+
+                if query.lower() == 'stats':
+                    show_stats(speech)
+                    continue
+
+                if query.lower() == 'mode':
+                    new_mode = 'text' if mode == 'voice' else 'voice'
+                    respond(f"Switched to {new_mode} mode", mode, voice_engine, speech)
+                    mode = new_mode
+                    continue
+
+                # Process query; the acknowledgement plays while retrieval runs
+                turn.set(mode=mode, query_chars=len(query))
+                respond("Processing your request...", mode, voice_engine, speech)
+
+                # Local and web knowledge are gathered side by side
+                context = gather_context(query)
+
+                # Generate and deliver response
+                if STREAM_RESPONSES:
+                    respond_stream(generate_response_stream(query, context), mode, speech)
+                else:
+                    response = generate_response(query, context)
+                    respond(response, mode, voice_engine, speech)
+
+            except KeyboardInterrupt:
+                print("\nShutting down...")
                 break
+            except Exception as e:
+                print(f"\nUnexpected error: {e}")
+                respond("Sorry, I encountered an error processing your request.", mode, voice_engine, speech)
+
+    if capture is not None:
+        capture.close()
+    if speech is not None:
+        speech.wait()  # let the goodbye finish
+        speech.close()
+    return voice_engine
 
-            if query.lower() == 'settings':
-                configure_voice(voice_engine)
-                continue
-
-            if query.lower() == 'mode':
-                new_mode = 'text' if mode == 'voice' else 'voice'
-                respond(f"Switched to {new_mode} mode", mode, voice_engine)
-                mode = new_mode
-                continue
-
-            # Process query
-            respond("Processing your request...", mode, voice_engine)
-
-            # Get knowledge from local and web sources
-            local_knowledge = query_local_knowledge(query)
-            web_knowledge = scrape_web(query)
-
-            # Store new knowledge
-            if web_knowledge:
-                store_knowledge(web_knowledge)
 
-            # Generate and deliver response
-            context = local_knowledge + web_knowledge
-            response = generate_response(query, context)
-            respond(response, mode, voice_engine)
+# ===== ENTRY POINT ===== #
+if __name__ == "__main__":
+    profile_startup = '--profile-startup' in sys.argv[1:]
 
-        except KeyboardInterrupt:
-            print("\nShutting down...")
-            break
-        except Exception as e:
-            print(f"\nUnexpected error: {e}")
-            respond("Sorry, I encountered an error processing your request.", mode, voice_engine)
+    # Database now, voice engine and Ollama check in the background
+    voice_engine_future = initialize_systems()
 
+    # Keep the local knowledge warm so answers don't wait on the network
+    refresher = create_refresher() if AUTO_REFRESH else None
+    if refresher is not None:
+        refresher.start()
 
-# ===== ENTRY POINT ===== #
-if __name__ == "__main__":
-    # Initialize systemshh
-    voice_engine = initialize_systems()
+    if profile_startup:
+        print_startup_profile()
+        threading.Thread(target=profile_background_startup, daemon=True).start()
 
     # Run main loop
+    voice_engine = None
     try:
-        main_loop(voice_engine)
+        voice_engine = main_loop(voice_engine_future)
     finally:
         # Cleanup
+        if refresher is not None:
+            refresher.stop()
+        flush_knowledge_writes()
         if voice_engine is not None:
             voice_engine.stop()
-        print("Assistant shutdown complete")
\ No newline at end of file
+        print("Assistant shutdown complete")
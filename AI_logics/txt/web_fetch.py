@@ -0,0 +1,121 @@
+"""
+Shared HTTP fetch layer for the web scraper.
+
+One keep-alive `requests.Session` (so repeated Wikipedia calls reuse their TCP/TLS
+connections), a thread pool for downloading pages concurrently, a per-host cap
+on in-flight requests and a global deadline after which whatever has finished
+is returned.
+"""
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+from urllib.parse import urlsplit
+
+from lazy_imports import lazy_import
+from shared import shared
+
+requests = lazy_import('requests')  # loaded by the first Fetcher
+
+# ===== CONFIGURATION ===== #
+FETCH_WORKERS = int(os.environ.get('FETCH_WORKERS', 6))
+PER_HOST_CONCURRENCY = int(os.environ.get('FETCH_PER_HOST', 3))
+REQUEST_TIMEOUT = 10  # seconds, per request
+USER_AGENT = "RobixsAssistant/1.0 (+https://github.com/SOH-BRYKLINE/Robixs)"
+
+T = TypeVar('T')
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request can't start before the global deadline"""
+
+
+class Fetcher:
+    """Pooled, concurrent HTTP client with per-host limits"""
+
+    def __init__(self, max_workers: int = FETCH_WORKERS,
+                 per_host: int = PER_HOST_CONCURRENCY,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.per_host = per_host
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def get(self, url: str, deadline: Optional[float] = None, **kwargs) -> "requests.Response":
+        """GET a URL, waiting for a free per-host slot and honouring the deadline.
+
+        `deadline` is an absolute `time.monotonic()` value; the request timeout is
+        clipped so it never runs past it.
+        """
+        slot = self._slot(url)
+        wait_for = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not slot.acquire(timeout=wait_for):
+            raise DeadlineExceeded(url)
+
+        try:
+            timeout = self.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(url)
+                timeout = min(timeout, remaining)
+            return self.session.get(url, timeout=timeout, **kwargs)
+        finally:
+            slot.release()
+
+    def map(self, func: Callable[[str], T], urls: Iterable[str],
+            deadline: Optional[float] = None) -> Dict[str, T]:
+        """Run `func(url)` for every URL concurrently.
+
+        Returns a dict of url -> result for the calls that finished before the
+        deadline; anything still running is left out (partial results).
+        Exceptions are reported and the URL is skipped.
+        """
+        # Each call runs in a copy of the caller's context (so it lands in its trace)
+        futures = {self._executor.submit(contextvars.copy_context().run, func, url): url
+                   for url in dict.fromkeys(urls)}
+        results: Dict[str, T] = {}
+        pending = set(futures)
+
+        while pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    print(f"Fetch error for {url}: {e}")
+
+        for future in pending:
+            future.cancel()
+        if pending:
+            print(f"Fetch deadline reached, {len(pending)} page(s) skipped")
+
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+get_fetcher = shared(Fetcher)
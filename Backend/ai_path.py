@@ -0,0 +1,16 @@
+"""
+Makes the assistant code in AI_logics/txt importable from the backend.
+
+The backend's entry points (api.py, db.py, bulk_users.py) import this before
+anything else; the modules they load can then import `sqlite_pool`,
+`telemetry`, `assistant_pipeline`, ... as if they were siblings.
+"""
+import os
+import sys
+
+AI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AI_logics', 'txt'))
+
+# The assistant keeps its databases and caches next to its code
+os.environ.setdefault('ASSISTANT_DATA_DIR', AI_DIR)
+if AI_DIR not in sys.path:
+    sys.path.insert(0, AI_DIR)
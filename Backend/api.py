@@ -1,32 +1,48 @@
-from flask import Flask, jsonify, send_from_directory, session, redirect, url_for
+import os
+from flask import Flask, jsonify, session, redirect, url_for, abort
+import ai_path  # noqa: F401  (puts the assistant code on sys.path for the blueprints)
 from auth import auth_bp, init_db
+from ask import ask_bp
+from bulk_users import bulk_bp
+from metrics import metrics_bp, init_app as init_metrics
+from static_assets import AssetStore
 
-app = Flask(
-    __name__,
-    static_folder='../Frontends',
-    static_url_path=''
-)
+# No built-in static route: it would shadow static_files and skip the /bot/* login check
+app = Flask(__name__, static_folder=None)
+FRONTEND_DIR = os.path.join(app.root_path, '..', 'Frontends')
 
 # Needed for sessions
 app.secret_key = "super-secret-key"  # ⚠️ change this to a secure random value
 
-# Register auth blueprint
+# Register auth, assistant, bulk user and metrics blueprints
 app.register_blueprint(auth_bp)
+app.register_blueprint(ask_bp)
+app.register_blueprint(bulk_bp)
+app.register_blueprint(metrics_bp)
+
+# Pages and assets are hashed and precompressed once instead of read per request
+assets = AssetStore(FRONTEND_DIR)
+
+# Per-route timings and gauges for /metrics
+init_metrics(app, assets)
 
 
 @app.route('/')
 def home():
-    return send_from_directory(app.static_folder, 'index.html')
+    return static_files('index.html')
 
 
 @app.route('/<path:filename>')
 def static_files(filename):
     # Public pages (index, register, login, features, css, js, etc.)
-    if filename.startswith("bot/"):  
-        # Any attempt to access /bot/* requires login
+    if assets.requires_login(filename):
+        # Any attempt to access /bot/* (or the optimized images only it uses) requires login
         if 'user_id' not in session:
             return redirect(url_for('static_files', filename='login.html'))
-    return send_from_directory(app.static_folder, filename)
+    response = assets.serve(filename)
+    if response is None:
+        abort(404)
+    return response
 
 
 @app.route('/api/features')
@@ -52,4 +68,6 @@ def features():
 
 if __name__ == '__main__':
     init_db()  # Ensure DB initialized
-    app.run(host='0.0.0.0',debug=True)
+    assets.auto_reload = True  # debug server: pick up edited frontend files
+    # Threaded so streaming answers don't hold up other sessions
+    app.run(host='0.0.0.0', debug=True, threaded=True)
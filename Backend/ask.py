@@ -0,0 +1,129 @@
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
+
+from assistant_pipeline import get_pipeline, Overloaded
+
+ask_bp = Blueprint('ask', __name__)
+JOB_TTL = 600  # seconds a finished answer stays available for polling
+RETRY_AFTER = 5  # seconds suggested to clients that were turned away
+MAX_WAIT = 10  # seconds a `wait` request may hold its worker before falling back to polling
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _question(data):
+    question = (data.get('question') or '').strip()
+    use_web = data.get('web')
+    if isinstance(use_web, str):
+        use_web = use_web.lower() in ('1', 'true', 'yes', 'y')
+    return question, use_web
+
+
+def _busy(e):
+    response = jsonify({
+        'success': False,
+        'message': 'The assistant is busy, please try again shortly.',
+        'queue_length': e.queued
+    })
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response, 429
+
+
+def _job_accepted(future, position):
+    _prune_jobs()
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _jobs[job_id] = {'future': future, 'created': time.time()}
+    return jsonify({'success': True, 'job_id': job_id, 'queue_position': position}), 202
+
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_TTL
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items()
+                       if job['future'].done() and job['created'] < cutoff]:
+            del _jobs[job_id]
+
+
+@ask_bp.route('/api/ask', methods=['POST'])
+def ask():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please log in first'}), 401
+
+    data = request.get_json(silent=True) or request.form
+    question, use_web = _question(data)
+    if not question:
+        return jsonify({'success': False, 'message': 'Missing question'}), 400
+
+    try:
+        future, position = get_pipeline().submit(question, use_web)
+    except Overloaded as e:
+        return _busy(e)
+
+    # Answers take as long as Ollama does, so the worker doesn't wait for them:
+    # clients poll /api/ask/<job_id>. With `wait` it holds on for at most MAX_WAIT.
+    if str(data.get('wait', 'false')).lower() not in ('1', 'true', 'yes'):
+        return _job_accepted(future, position)
+
+    try:
+        result = future.result(timeout=MAX_WAIT)
+    except FutureTimeout:
+        return _job_accepted(future, position)
+    except Exception as e:
+        print(f"Assistant error: {e}")
+        return jsonify({'success': False, 'message': 'The assistant failed to answer.'}), 500
+    return jsonify({'success': True, 'answer': result['answer'], 'sources': result['sources']})
+
+
+@ask_bp.route('/api/ask/<job_id>', methods=['GET'])
+def ask_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please log in first'}), 401
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired job'}), 404
+
+    future = job['future']
+    if not future.done():
+        return jsonify({'success': True, 'status': 'pending', 'queue_length': get_pipeline().queued}), 202
+    if future.exception() is not None:
+        return jsonify({'success': False, 'status': 'failed', 'message': 'The assistant failed to answer.'}), 500
+
+    result = future.result()
+    return jsonify({'success': True, 'status': 'done', 'answer': result['answer'], 'sources': result['sources']})
+
+
+@ask_bp.route('/api/ask/stream', methods=['GET', 'POST'])
+def ask_stream():
+    """Server-sent events: `queued`, `sources`, one `token` event per token, then `done`"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Please log in first'}), 401
+
+    data = request.get_json(silent=True) or request.values
+    question, use_web = _question(data)
+    if not question:
+        return jsonify({'success': False, 'message': 'Missing question'}), 400
+
+    try:
+        events, position = get_pipeline().submit_stream(question, use_web)
+    except Overloaded as e:
+        return _busy(e)
+
+    def generate():
+        yield f"event: queued\ndata: {json.dumps({'position': position})}\n\n"
+        for event in events:
+            name = next(iter(event))
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,27 +1,39 @@
 import sqlite3
 from flask import Blueprint, request, jsonify, session, redirect, url_for
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import get_hasher, HashingBusy
+from sqlite_pool import connection
 
 auth_bp = Blueprint('auth', __name__)
 DB_PATH = 'users.db'
+RETRY_AFTER = 2  # seconds suggested to clients turned away during a sign-in burst
 
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL,
-            country TEXT,
-            interest TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+def _busy():
+    response = jsonify({'success': False, 'message': 'Too many sign-ins right now, please try again.'})
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response, 503
+
+
+def _save_password(user_id):
+    def save(hashed_pw):
+        with connection(DB_PATH) as conn:
+            conn.execute('UPDATE users SET password = ? WHERE id = ?', (hashed_pw, user_id))
+    return save
+
+
+def init_db(db_path: str = DB_PATH):
+    with connection(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE,
+                password TEXT NOT NULL,
+                country TEXT,
+                interest TEXT
+            )
+        ''')
 
 
 @auth_bp.route('/api/register', methods=['POST'])
@@ -32,23 +44,24 @@ def register():
     if not all(k in data and data[k] for k in required):
         return jsonify({'success': False, 'message': 'Missing fields'}), 400
 
-    hashed_pw = generate_password_hash(data['password'])
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO users (first_name, last_name, email, password, country, interest)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            data['first_name'],
-            data['last_name'],
-            data['email'].lower(),
-            hashed_pw,
-            data['country'],
-            data['interest']
-        ))
-        conn.commit()
-        conn.close()
+        hashed_pw = get_hasher().hash(data['password'])
+    except HashingBusy:
+        return _busy()
+
+    try:
+        with connection(DB_PATH) as conn:
+            conn.execute('''
+                INSERT INTO users (first_name, last_name, email, password, country, interest)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                data['first_name'],
+                data['last_name'],
+                data['email'].lower(),
+                hashed_pw,
+                data['country'],
+                data['interest']
+            ))
         return jsonify({'success': True, 'message': 'Registration successful! Please log in.'})
     except sqlite3.IntegrityError:
         return jsonify({'success': False, 'message': 'Email already registered.'}), 409
@@ -64,15 +77,21 @@ def login():
     if not email or not password:
         return jsonify({'success': False, 'message': 'Missing email or password'}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT id, password, first_name FROM users WHERE email = ?', (email,))
-    user = c.fetchone()
-    conn.close()
+    with connection(DB_PATH) as conn:
+        user = conn.execute('SELECT id, password, first_name FROM users WHERE email = ?', (email,)).fetchone()
 
     if user:
         user_id, hashed_pw, first_name = user
-        if check_password_hash(hashed_pw, password):
+        try:
+            ok, outdated = get_hasher().verify(hashed_pw, password)
+        except HashingBusy:
+            return _busy()
+
+        if ok:
+            if outdated:
+                # Upgrade to the current hash parameters without delaying the login
+                get_hasher().rehash_later(password, _save_password(user_id))
+
             # 🔑 store session
             session['user_id'] = user_id
             session['first_name'] = first_name
@@ -80,6 +99,11 @@ def login():
         else:
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
     else:
+        # Answer no faster than a real password check would
+        try:
+            get_hasher().reject_unknown_user(password)
+        except HashingBusy:
+            return _busy()
         return jsonify({'success': False, 'message': 'User not found'}), 404
 
 
@@ -0,0 +1,230 @@
+"""
+Bulk import and export of the users table.
+
+Imports stream CSV or NDJSON records, hash the passwords in parallel on a
+process pool (one per process, shared by every import) and insert them in
+batched transactions. Rows with an email that
+is already registered (or repeated in the file) and rows with missing fields
+are reported individually rather than aborting the import. Exports stream
+every user except the password hash.
+
+    python bulk_users.py import users.csv [--format csv|ndjson] [--db users.db]
+    python bulk_users.py export [--format csv|ndjson] [--db users.db] > users.csv
+
+The same is available to the backend as POST /api/users/import and
+GET /api/users/export, which require a logged-in session and the
+USER_ADMIN_TOKEN bearer token.
+"""
+import io
+import os
+import csv
+import sys
+import json
+import hmac
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Set
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
+from werkzeug.security import generate_password_hash
+
+import ai_path  # noqa: F401  (also run as a script)
+from auth import DB_PATH
+from passwords import HASH_METHOD
+from shared import shared
+from sqlite_pool import connection
+
+bulk_bp = Blueprint('bulk_users', __name__)
+
+# ===== CONFIGURATION ===== #
+IMPORT_BATCH = 1000  # rows hashed and inserted per transaction
+LOOKUP_CHUNK = 500  # emails per IN (...) lookup; SQLite before 3.32 allows only 999 variables
+HASH_PROCESSES = int(os.environ.get('BULK_HASH_PROCESSES', os.cpu_count() or 2))
+ADMIN_TOKEN = os.environ.get('USER_ADMIN_TOKEN')  # bulk endpoints are disabled without it
+REQUIRED_FIELDS = ('first_name', 'last_name', 'email', 'password', 'country', 'interest')
+EXPORT_FIELDS = ('id', 'first_name', 'last_name', 'email', 'country', 'interest')
+EXPORT_BATCH = 500
+
+
+def read_records(stream: IO[str], fmt: str = 'csv') -> Iterator[Optional[Dict]]:
+    """Records from a CSV (with header) or NDJSON text stream, read incrementally"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None  # reported as an invalid row
+
+
+def _hash_password(password: str) -> str:
+    return generate_password_hash(password, HASH_METHOD)
+
+
+def _validate(record) -> Optional[str]:
+    if record is None:
+        return "invalid JSON"
+    if not isinstance(record, dict):
+        return f"expected an object, got {type(record).__name__}"
+    missing = [field for field in REQUIRED_FIELDS if not str(record.get(field) or '').strip()]
+    return f"missing {', '.join(missing)}" if missing else None
+
+
+# Process pool for import hashing, started by the first import
+get_hash_pool = shared(lambda: ProcessPoolExecutor(max_workers=HASH_PROCESSES))
+
+
+def _registered(db_path: str, emails: List[str]) -> Set[str]:
+    """The emails already in the users table, looked up LOOKUP_CHUNK at a time"""
+    found = set()
+    with connection(db_path) as conn:
+        for start in range(0, len(emails), LOOKUP_CHUNK):
+            chunk = emails[start:start + LOOKUP_CHUNK]
+            found.update(email for (email,) in conn.execute(
+                f"SELECT email FROM users WHERE email IN ({','.join('?' * len(chunk))})", chunk
+            ))
+    return found
+
+
+def import_users(records: Iterable[Dict], db_path: str = DB_PATH, batch: int = IMPORT_BATCH,
+                 pool: Optional[ProcessPoolExecutor] = None) -> Dict:
+    """Insert users in batches; returns counts plus per-row duplicates and errors"""
+    report = {'imported': 0, 'duplicates': [], 'errors': []}
+    pool = pool or get_hash_pool()
+
+    def flush(rows: List[Dict]):
+        # Known emails are filtered out first so no hash is spent on them
+        existing = _registered(db_path, [row['email'] for row in rows])
+        fresh = []
+        for row in rows:
+            if row['email'] in existing:
+                report['duplicates'].append({'row': row['row'], 'email': row['email']})
+            else:
+                fresh.append(row)
+        if not fresh:
+            return
+
+        hashes = pool.map(_hash_password, [row['password'] for row in fresh],
+                          chunksize=max(1, len(fresh) // (HASH_PROCESSES * 4)))
+        with connection(db_path) as conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO users (first_name, last_name, email, password, country, interest)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (row['first_name'], row['last_name'], row['email'], hashed, row['country'], row['interest'])
+                for row, hashed in zip(fresh, hashes)
+            ])
+            inserted = conn.total_changes - before
+        report['imported'] += inserted
+        if inserted < len(fresh):
+            # Registered through /api/register while this batch was hashing
+            report['errors'].append({'row': None, 'error': f"{len(fresh) - inserted} rows registered concurrently"})
+
+    pending: List[Dict] = []
+    seen = set()
+    for number, record in enumerate(records, start=1):
+        error = _validate(record)
+        if error:
+            report['errors'].append({'row': number, 'error': error})
+            continue
+
+        row = {field: str(record[field]).strip() for field in REQUIRED_FIELDS}
+        row['password'] = str(record['password'])
+        row['email'] = row['email'].lower()
+        row['row'] = number
+        if row['email'] in seen:
+            report['duplicates'].append({'row': number, 'email': row['email']})
+            continue
+        seen.add(row['email'])
+
+        pending.append(row)
+        if len(pending) >= batch:
+            flush(pending)
+            pending = []
+    if pending:
+        flush(pending)
+    return report
+
+
+def export_users(db_path: str = DB_PATH, fmt: str = 'csv') -> Iterator[str]:
+    """Every user except the password hash, streamed from the cursor"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+
+    with connection(db_path) as conn:
+        cursor = conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM users ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            if fmt == 'csv':
+                writer.writerows(rows)
+            else:
+                buffer.writelines(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# ===== ENDPOINTS ===== #
+def _authorized() -> bool:
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return bool(ADMIN_TOKEN) and 'user_id' in session and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _format() -> str:
+    fmt = request.args.get('format')
+    if fmt in ('csv', 'ndjson'):
+        return fmt
+    return 'ndjson' if 'json' in (request.mimetype or '') else 'csv'
+
+
+@bulk_bp.route('/api/users/import', methods=['POST'])
+def bulk_import():
+    if not _authorized():
+        return jsonify({'success': False, 'message': 'Not authorized'}), 403
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    report = import_users(read_records(stream, _format()))
+    return jsonify(dict(report, success=True))
+
+
+@bulk_bp.route('/api/users/export', methods=['GET'])
+def bulk_export():
+    if not _authorized():
+        return jsonify({'success': False, 'message': 'Not authorized'}), 403
+
+    fmt = _format()
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(export_users(fmt=fmt)), mimetype=mimetype)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import/export of users")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('file', nargs='?', help="input file for import (default: stdin)")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.action == 'export':
+        for part in export_users(args.db, args.format):
+            sys.stdout.write(part)
+    else:
+        from auth import init_db
+        init_db(args.db)
+        with (open(args.file, encoding='utf-8', newline='') if args.file else sys.stdin) as f:
+            result = import_users(read_records(f, args.format), args.db)
+        print(f"Imported {result['imported']} users, "
+              f"{len(result['duplicates'])} duplicates, {len(result['errors'])} errors")
+        for duplicate in result['duplicates']:
+            print(f"  row {duplicate['row']}: {duplicate['email']} already registered")
+        for error in result['errors']:
+            print(f"  row {error['row']}: {error['error']}")
@@ -1,32 +1,37 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string, url_for
+import json
 import sqlite3
 
+import ai_path  # noqa: F401  (shared SQLite access layer lives with the AI code)
+from sqlite_pool import connection
+
 app = Flask(__name__)
 DATABASE = 'database.db'
+USER_COLUMNS = ('id', 'name', 'email', 'message')
+PAGE_SIZE = 50  # default users per page
+MAX_PAGE_SIZE = 500
+STREAM_BATCH = 200  # rows fetched from the cursor at a time when streaming
 
 # ---------------------------
 # Helper function to get DB
 # ---------------------------
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # rows behave like dictionaries
-    return conn
+    # Pooled connection, used as `with get_db_connection() as conn:`
+    return connection(DATABASE, row_factory=sqlite3.Row)  # rows behave like dictionaries
 
 # ---------------------------
 # Initialize Database
 # ---------------------------
 def init_db():
-    conn = get_db_connection()
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            message TEXT
-        );
-    ''')
-    conn.commit()
-    conn.close()
+    with get_db_connection() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                message TEXT
+            );
+        ''')
 
 # ---------------------------
 # HTML Form Template
@@ -60,20 +65,74 @@ HTML_FORM = """
             <li>{{ user['name'] }} ({{ user['email'] }}) - {{ user['message'] }}</li>
         {% endfor %}
     </ul>
+    {% if next_url %}
+        <a href="{{ next_url }}">Next page</a>
+    {% endif %}
 </body>
 </html>
 """
 
+# ---------------------------
+# Keyset pagination helpers
+# ---------------------------
+def page_args(default_limit=PAGE_SIZE):
+    """after_id, limit and projected columns from the query string"""
+    after_id = request.args.get('after_id', 0, type=int)
+    limit = min(max(request.args.get('limit', default_limit, type=int), 1), MAX_PAGE_SIZE)
+    fields = request.args.get('fields')
+    columns = [c for c in USER_COLUMNS if not fields or c == 'id' or c in fields.split(',')]
+    return after_id, limit, columns
+
+
+def fetch_page(after_id, limit, columns=USER_COLUMNS):
+    """One page of users after `after_id`, plus the id to continue from (None on the last page)"""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM users WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit + 1)
+        ).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]['id']
+    return rows, None
+
+
+def stream_users(after_id, columns, limit=None, fmt='ndjson'):
+    """Yield users straight from the cursor as NDJSON lines or one JSON array"""
+    sql = f"SELECT {', '.join(columns)} FROM users WHERE id > ? ORDER BY id"
+    params = [after_id]
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    with get_db_connection() as conn:
+        cursor = conn.execute(sql, params)
+        if fmt == 'array':
+            yield '['
+        first = True
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                line = json.dumps(dict(row))
+                if fmt == 'array':
+                    yield line if first else ',' + line
+                else:
+                    yield line + '\n'
+                first = False
+        if fmt == 'array':
+            yield ']'
+
 # ---------------------------
 # Routes
 # ---------------------------
 
 @app.route('/', methods=['GET'])
 def home():
-    conn = get_db_connection()
-    users = conn.execute("SELECT * FROM users").fetchall()
-    conn.close()
-    return render_template_string(HTML_FORM, users=users)
+    after_id, limit, _ = page_args()
+    users, next_id = fetch_page(after_id, limit)
+    next_url = url_for('home', after_id=next_id, limit=limit) if next_id else None
+    return render_template_string(HTML_FORM, users=users, next_url=next_url)
 
 @app.route('/add_user', methods=['POST'])
 def add_user():
@@ -84,23 +143,38 @@ def add_user():
     if not name or not email:
         return jsonify({"error": "Name and email are required"}), 400
 
-    conn = get_db_connection()
     try:
-        conn.execute("INSERT INTO users (name, email, message) VALUES (?, ?, ?)", (name, email, message))
-        conn.commit()
+        with get_db_connection() as conn:
+            conn.execute("INSERT INTO users (name, email, message) VALUES (?, ?, ?)", (name, email, message))
     except sqlite3.IntegrityError:
         return jsonify({"error": "Email already exists"}), 400
-    finally:
-        conn.close()
 
     return jsonify({"message": "User added successfully"})
 
 @app.route('/users', methods=['GET'])
 def get_users():
-    conn = get_db_connection()
-    users = conn.execute("SELECT * FROM users").fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in users])
+    """Users by id: ?after_id=&limit=&fields=name,email&format=ndjson|array
+
+    Without `format` one page is returned as a JSON list, with the next page in
+    the `Link` and `X-Next-After-Id` headers. `ndjson` and `array` stream every
+    remaining user (or `limit` of them) without loading them all into memory.
+    """
+    fmt = request.args.get('format')
+    if fmt in ('ndjson', 'array'):
+        after_id, _, columns = page_args()
+        limit = request.args.get('limit', type=int)
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        return Response(stream_users(after_id, columns, limit, fmt), mimetype=mimetype)
+
+    after_id, limit, columns = page_args()
+    users, next_id = fetch_page(after_id, limit, columns)
+    response = jsonify([dict(row) for row in users])
+    if next_id:
+        next_url = url_for('get_users', after_id=next_id, limit=limit,
+                           fields=request.args.get('fields'))
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+        response.headers['X-Next-After-Id'] = str(next_id)
+    return response
 
 # ---------------------------
 # Main entry
@@ -0,0 +1,71 @@
+"""
+Request timing and a Prometheus /metrics endpoint for the backend.
+
+`init_app` times every request by route, method and status (for streamed
+responses that is the time to the first byte). /metrics exports those, the
+SQLite statement timings from the connection pool, the assistant's stage
+histograms and gauges for the password hasher, the asset store and the ask
+queue. It is public unless METRICS_TOKEN is set, in which case scrapers must
+send it as a bearer token.
+"""
+import os
+import hmac
+import time
+from flask import Blueprint, Response, abort, g, request
+
+from telemetry import describe, observe, register_collector, render_prometheus
+from passwords import get_hasher
+
+metrics_bp = Blueprint('metrics', __name__)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+describe('http_request_seconds', "Time to produce a response, by route")
+describe('sqlite_statement_seconds', "Time spent in SQLite execute calls, by database and verb")
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe('http_request_seconds', time.perf_counter() - started,
+                method=request.method, route=route, status=response.status_code)
+    return response
+
+
+def _hasher_gauges():
+    usage = get_hasher().usage()
+    for key, value in usage.items():
+        if isinstance(value, (int, float)):
+            yield f'password_hasher_{key}', {}, value
+
+
+def init_app(app, assets=None):
+    """Time the app's requests and export its gauges"""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    register_collector(_hasher_gauges)
+    if assets is not None:
+        register_collector(lambda: (
+            (f'static_assets_{key}', {}, value) for key, value in assets.usage().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ))
+
+    def ask_gauges():
+        import assistant_pipeline  # already loaded by the ask blueprint
+        pipeline = assistant_pipeline.get_pipeline.current()
+        if pipeline is not None:
+            yield 'assistant_ask_queued', {}, pipeline.queued
+    register_collector(ask_gauges)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    if METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(token, METRICS_TOKEN):
+            abort(401)
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
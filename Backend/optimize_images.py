@@ -0,0 +1,218 @@
+"""
+Offline image optimization for the frontend.
+
+Finds every JPEG/PNG under one or more static roots, groups byte-identical
+copies by content hash, and writes resized WebP (and AVIF, when Pillow
+supports it) variants of each distinct image into `<root>/optimized/`, named
+by hash so they can be cached forever. A manifest per root maps each original
+URL path to its variants; `static_assets` uses the Frontends one to add
+`srcset` to <img> tags and to answer image requests with a smaller format the
+browser accepts.
+
+By default both sites are processed: Frontends/ (served by the backend) and
+the img/ and image/ folders of the top-level pages. An image found in both is
+encoded once and its variants are hard-linked (or copied) into the other root.
+
+    python optimize_images.py [--root ../Frontends] [--root ..=img,image] [--quality 75] [--force]
+
+Already generated variants are kept, so re-runs only process new images.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from PIL import Image, ImageOps, features
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# ===== CONFIGURATION ===== #
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+DEFAULT_ROOT = os.path.join(REPO_DIR, 'Frontends')
+# (static root, sub-folders to scan or None for all); the top-level pages keep pictures in img/ and image/
+DEFAULT_ROOTS = ((DEFAULT_ROOT, None), (REPO_DIR, ('img', 'image')))
+OUTPUT_DIR = 'optimized'  # under the root, so the static route serves it
+MANIFEST_NAME = 'manifest.json'
+WIDTHS = (320, 640, 960, 1280, 1920)  # srcset widths; never upscaled
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+QUALITY = {'webp': 75, 'avif': 55}
+SAVE_OPTIONS = {'webp': {'method': 6}, 'avif': {'speed': 4}}  # slower encodes, smaller files
+
+
+def available_formats() -> List[str]:
+    """Variant formats in order of preference for serving (smallest first)"""
+    if not PIL_AVAILABLE:
+        return []
+    formats = []
+    if features.check('avif'):
+        formats.append('avif')
+    if features.check('webp'):
+        formats.append('webp')
+    return formats
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_images(root: str, subdirs: Optional[Sequence[str]] = None) -> Dict[str, List[str]]:
+    """content hash -> URL paths (relative to root) of every copy of that image"""
+    groups: Dict[str, List[str]] = {}
+    for top in [os.path.join(root, d) for d in subdirs] if subdirs else [root]:
+        for folder, dirs, names in os.walk(top):
+            dirs[:] = sorted(d for d in dirs if os.path.join(folder, d) != os.path.join(root, OUTPUT_DIR))
+            for name in sorted(names):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    path = os.path.join(folder, name)
+                    url = os.path.relpath(path, root).replace(os.sep, '/')
+                    groups.setdefault(file_hash(path), []).append(url)
+    return groups
+
+
+def target_widths(width: int) -> List[int]:
+    widths = [w for w in WIDTHS if w < width]
+    if width <= WIDTHS[-1]:
+        widths.append(width)  # full size variant, in the new format
+    return widths or [WIDTHS[-1]]
+
+
+def render_variants(source: str, digest: str, out_dir: str, formats: List[str],
+                    quality: Optional[Dict[str, int]] = None, force: bool = False) -> Dict:
+    """Write the resized variants of one image; returns its manifest entry"""
+    quality = quality or QUALITY
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        width, height = image.size
+
+        variants = []
+        for target in target_widths(width):
+            resized = None
+            for fmt in formats:
+                name = f"{digest[:16]}-{target}.{fmt}"
+                path = os.path.join(out_dir, name)
+                if force or not os.path.exists(path):
+                    if resized is None:
+                        resized = image if target == width else image.resize(
+                            (target, max(1, round(height * target / width))), Image.LANCZOS)
+                    resized.save(path, fmt.upper(), quality=quality[fmt], **SAVE_OPTIONS[fmt])
+                variants.append({
+                    "format": fmt,
+                    "width": target,
+                    "path": f"{OUTPUT_DIR}/{name}",
+                    "bytes": os.path.getsize(path)
+                })
+
+    return {"hash": digest, "width": width, "height": height, "bytes": os.path.getsize(source),
+            "variants": variants}
+
+
+def share_variants(entry: Dict, from_dir: str, to_dir: str):
+    """Link the variants already encoded for another root into this one"""
+    for variant in entry["variants"]:
+        name = variant["path"].split('/', 1)[1]
+        target = os.path.join(to_dir, name)
+        if os.path.exists(target):
+            continue
+        try:
+            os.link(os.path.join(from_dir, name), target)
+        except OSError:
+            shutil.copy2(os.path.join(from_dir, name), target)
+
+
+def optimize(root: str = DEFAULT_ROOT, quality: Optional[Dict[str, int]] = None, force: bool = False,
+             subdirs: Optional[Sequence[str]] = None, rendered: Optional[Dict[str, Tuple[str, Dict]]] = None) -> Dict:
+    """Build all variants under `root` and write the manifest.
+
+    `rendered` (hash -> (output folder, manifest entry)) is shared between
+    roots so an image found in several of them is only encoded once.
+    """
+    formats = available_formats()
+    if not formats:
+        raise RuntimeError("Pillow with WebP or AVIF support is required (pip install pillow)")
+
+    out_dir = os.path.join(root, OUTPUT_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    rendered = {} if rendered is None else rendered
+
+    manifest = {"formats": formats, "widths": list(WIDTHS), "images": {}, "duplicates": {}, "shared": 0}
+    for digest, urls in find_images(root, subdirs).items():
+        canonical = urls[0]
+        try:
+            if digest in rendered:
+                from_dir, entry = rendered[digest]
+                share_variants(entry, from_dir, out_dir)
+                manifest["shared"] += 1
+            else:
+                entry = render_variants(os.path.join(root, canonical), digest, out_dir, formats, quality, force)
+                rendered[digest] = (out_dir, entry)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {canonical}: {e}")
+            continue
+        for url in urls:
+            manifest["images"][url] = entry
+        for url in urls[1:]:
+            manifest["duplicates"][url] = canonical
+
+    # Variants of images that no longer exist are left behind by renames/deletes
+    used = {variant['path'].split('/', 1)[1] for entry in manifest["images"].values() for variant in entry["variants"]}
+    for name in os.listdir(out_dir):
+        if name != MANIFEST_NAME and name not in used:
+            os.remove(os.path.join(out_dir, name))
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(root: str) -> Dict:
+    """The manifest written by `optimize`, or an empty one"""
+    path = os.path.join(root, OUTPUT_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"formats": [], "widths": [], "images": {}, "duplicates": {}, "shared": 0}
+
+
+def parse_root(value: str) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """`path` or `path=sub,sub` from the command line"""
+    path, _, subdirs = value.partition('=')
+    return os.path.abspath(path), tuple(d for d in subdirs.split(',') if d) or None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate responsive WebP/AVIF image variants")
+    parser.add_argument('--root', action='append', type=parse_root,
+                        help="static folder to optimize, optionally limited to sub-folders as PATH=SUB,SUB; "
+                             "repeatable (default: Frontends and the top-level img/ and image/)")
+    parser.add_argument('--quality', type=int, help="override the quality of every format")
+    parser.add_argument('--force', action='store_true', help="re-render existing variants")
+    args = parser.parse_args()
+
+    if not PIL_AVAILABLE:
+        sys.exit("Pillow is required: pip install pillow")
+
+    quality = {fmt: args.quality for fmt in QUALITY} if args.quality else None
+    rendered: Dict[str, Tuple[str, Dict]] = {}
+    for root, subdirs in args.root or DEFAULT_ROOTS:
+        result = optimize(root, quality, args.force, subdirs, rendered)
+        distinct = {entry['hash']: entry for entry in result['images'].values()}
+        original = sum(entry['bytes'] for entry in distinct.values())
+        best = sum(min(v['bytes'] for v in entry['variants'] if v['width'] == entry['variants'][-1]['width'])
+                   for entry in distinct.values())
+        print(f"{root}: {len(result['images'])} images ({len(distinct)} distinct, "
+              f"{len(result['duplicates'])} duplicates, {result['shared']} shared with another root), "
+              f"formats {result['formats']}")
+        print(f"  Full-width originals: {original / 1e6:.1f} MB -> smallest variants {best / 1e6:.1f} MB")
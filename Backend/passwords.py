@@ -0,0 +1,130 @@
+"""
+Password hashing off the request threads.
+
+Hashes are deliberately slow, so running them inline lets a burst of logins
+take over every worker. Here they run on a small dedicated pool with a bounded
+queue: requests beyond the queue are turned away (`HashingBusy`) instead of
+stalling the rest of the site. Stored hashes made with older parameters are
+upgraded after a successful login, and unknown users are checked against a
+dummy hash on the same pool, so they wait in the same queue and take as long
+as a real check.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from shared import shared
+
+# ===== CONFIGURATION ===== #
+HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')  # e.g. 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # hashes computed at once
+HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))  # hashes allowed to wait for a worker
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class PasswordHasher:
+    """Bounded hashing pool with timing statistics"""
+
+    def __init__(self, method: str = HASH_METHOD, workers: int = HASH_WORKERS,
+                 queue_limit: int = HASH_QUEUE_LIMIT):
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {'hashed': 0, 'verified': 0, 'unknown': 0, 'rehashed': 0, 'rejected': 0,
+                      'max_pending': 0, 'wait_ms': 0.0, 'hash_ms': 0.0}
+
+        # One hash up front gives the full parameter string werkzeug expands
+        # the method to, and the stand-in checked for unknown users
+        self._dummy_hash = generate_password_hash('', method)
+        self._params = self._dummy_hash.split('$', 1)[0]
+
+    def _run(self, fn: Callable, *args):
+        """Run `fn` on the pool and wait for it; HashingBusy if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise HashingBusy("Too many sign-ins in progress")
+
+        with self._lock:
+            self._pending += 1
+            self.stats['max_pending'] = max(self.stats['max_pending'], self._pending)
+        queued_at = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    # Moving averages, so the numbers follow the current load
+                    self.stats['wait_ms'] = 0.9 * self.stats['wait_ms'] + 100 * (started - queued_at)
+                    self.stats['hash_ms'] = 0.9 * self.stats['hash_ms'] + 100 * (finished - started)
+
+        try:
+            return self._executor.submit(task).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    @property
+    def pending(self) -> int:
+        """Hashes running or waiting"""
+        with self._lock:
+            return self._pending
+
+    def hash(self, password: str) -> str:
+        hashed = self._run(generate_password_hash, password, self.method)
+        with self._lock:
+            self.stats['hashed'] += 1
+        return hashed
+
+    def verify(self, stored_hash: str, password: str) -> Tuple[bool, bool]:
+        """(password matches, stored hash should be upgraded)"""
+        ok = self._run(check_password_hash, stored_hash, password)
+        with self._lock:
+            self.stats['verified'] += 1
+        return ok, ok and self.needs_rehash(stored_hash)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        return stored_hash.split('$', 1)[0] != self._params
+
+    def rehash_later(self, password: str, save: Callable[[str], None]):
+        """Upgrade a hash in the background; skipped (until next login) when busy"""
+        def run():
+            try:
+                save(self.hash(password))
+                with self._lock:
+                    self.stats['rehashed'] += 1
+            except HashingBusy:
+                pass
+            except Exception as e:
+                print(f"Password rehash error: {e}")
+
+        threading.Thread(target=run, name='password-rehash', daemon=True).start()
+
+    def reject_unknown_user(self, password: str):
+        """Check against a dummy hash on the pool, so an unknown email costs what a known one does.
+
+        A sleep of the average check time would skip the queue and answer fast
+        exactly when the pool is busy. Raises HashingBusy like `verify`.
+        """
+        self._run(check_password_hash, self._dummy_hash, password)
+        with self._lock:
+            self.stats['unknown'] += 1
+
+    def usage(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, pending=self._pending, method=self._params)
+
+
+get_hasher = shared(PasswordHasher)
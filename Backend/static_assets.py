@@ -0,0 +1,288 @@
+"""
+Precompressed, fingerprinted static assets for the Flask app.
+
+At startup every file under the static folder is hashed and text assets are
+gzip (and brotli, when installed) compressed once. HTML and CSS references to
+other assets are rewritten to content-hashed names (`css/styles.3f2a9c1b.css`)
+that can be cached forever (`Cache-Control: immutable`); the pages themselves
+and unhashed URLs are revalidated with strong ETags and answered with 304 when
+unchanged. Each representation (identity, gzip, br, and the AVIF/WebP
+variants) has its own ETag. Files under PRIVATE_PREFIXES, and the optimized
+variants of their images, are only cacheable by the browser (`private`); the
+app checks `requires_login` before serving them.
+
+When `optimize_images.py` has been run, <img> tags also get a WebP `srcset`
+and requests for an original JPEG/PNG are answered with its AVIF/WebP variant
+when the browser accepts one.
+
+Run directly to print what was built:
+    python static_assets.py [static folder]
+"""
+import os
+import re
+import sys
+import gzip
+import hashlib
+import mimetypes
+import threading
+from typing import Dict, Optional, Tuple
+from flask import Response, request, send_file
+
+from optimize_images import OUTPUT_DIR, load_manifest
+
+try:
+    import brotli
+
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# ===== CONFIGURATION ===== #
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_BYTES = 512  # smaller files aren't worth a compressed variant
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+PRIVATE_IMMUTABLE_CACHE = 'private, max-age=31536000, immutable'
+PRIVATE_REVALIDATE_CACHE = 'private, no-cache'
+PRIVATE_PREFIXES = ('bot/',)  # pages behind the login
+FINGERPRINT_LENGTH = 8
+
+HTML_REF = re.compile(r'''(\b(?:src|href)\s*=\s*["'])([^"'#?:]+)(["'])''', re.IGNORECASE)
+CSS_REF = re.compile(r'''(url\(\s*["']?)([^"')#?:]+)(["']?\s*\))''', re.IGNORECASE)
+IMG_TAG = re.compile(r'''<img\b[^>]*>''', re.IGNORECASE)
+IMG_SRC = re.compile(r'''\bsrc\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+SRCSET_FORMAT = 'webp'  # <img srcset> can't negotiate, so use the format every browser takes
+
+
+class Asset:
+    def __init__(self, path: str, mimetype: str, body: Optional[bytes], digest: str, mtime: float):
+        self.path = path  # file on disk
+        self.mimetype = mimetype
+        self.body = body  # in memory when rewritten or compressible, else streamed from disk
+        self.etag = digest[:32]
+        self.fingerprint = digest[:FINGERPRINT_LENGTH]
+        self.mtime = mtime
+        self.encodings: Dict[str, bytes] = {}
+        self.size = len(body) if body is not None else os.path.getsize(path)
+
+
+def _fingerprinted(name: str, fingerprint: str) -> str:
+    base, ext = os.path.splitext(name)
+    return f"{base}.{fingerprint}{ext}"
+
+
+class AssetStore:
+    """Built assets by URL path, plus the fingerprinted aliases"""
+
+    def __init__(self, root: str, auto_reload: bool = False, private_prefixes: Tuple[str, ...] = PRIVATE_PREFIXES):
+        self.root = os.path.abspath(root)
+        self.auto_reload = auto_reload
+        self.private_prefixes = private_prefixes
+        self._lock = threading.Lock()
+        self.build()
+
+    # ----- build ----- #
+    def _tree_signature(self) -> Tuple:
+        """Folder mtimes, which change when files are added, removed or renamed"""
+        return tuple(sorted((folder, os.stat(folder).st_mtime_ns) for folder, _, _ in os.walk(self.root)))
+
+    def build(self):
+        self._manifest = load_manifest(self.root)
+        signature = self._tree_signature()
+        files = []
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                full = os.path.join(folder, name)
+                files.append(os.path.relpath(full, self.root).replace(os.sep, '/'))
+
+        assets: Dict[str, Asset] = {}
+        # Plain files first, then CSS (may point at images), then HTML (points at both)
+        order = {'.css': 1, '.html': 2, '.htm': 2}
+        for url in sorted(files, key=lambda f: order.get(os.path.splitext(f)[1].lower(), 0)):
+            try:
+                assets[url] = self._build_asset(url, assets)
+            except OSError as e:
+                print(f"Static asset error for {url}: {e}")
+
+        aliases = {_fingerprinted(url, asset.fingerprint): url for url, asset in assets.items()}
+        # A variant is private unless some public page also uses the same image
+        used_by: Dict[str, set] = {}
+        for url, entry in self._manifest['images'].items():
+            for variant in entry['variants']:
+                used_by.setdefault(variant['path'], set()).add(url.startswith(self.private_prefixes))
+        private_variants = {path for path, private in used_by.items() if private == {True}}
+        with self._lock:
+            self._assets, self._aliases = assets, aliases
+            self._private_variants, self._signature = private_variants, signature
+
+    def _build_asset(self, url: str, built: Dict[str, Asset]) -> Asset:
+        path = os.path.join(self.root, url)
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        ext = os.path.splitext(url)[1].lower()
+        if ext in ('.html', '.htm'):
+            data = self._rewrite(url, self._add_srcset(url, data), HTML_REF, built)
+        elif ext == '.css':
+            data = self._rewrite(url, data, CSS_REF, built)
+
+        compressible = mimetype.startswith(COMPRESSIBLE_TYPES)
+        asset = Asset(path, mimetype, data if compressible or ext in ('.html', '.htm', '.css') else None,
+                      hashlib.sha256(data).hexdigest(), os.path.getmtime(path))
+        if compressible and len(data) >= MIN_COMPRESS_BYTES:
+            asset.encodings['gzip'] = gzip.compress(data, 9)
+            if BROTLI_AVAILABLE:
+                asset.encodings['br'] = brotli.compress(data, quality=11)
+        return asset
+
+    def _rewrite(self, url: str, data: bytes, pattern, built: Dict[str, Asset]) -> bytes:
+        """Point references at the fingerprinted names of assets already built"""
+        base = os.path.dirname(url)
+        text = data.decode('utf-8', errors='surrogateescape')
+
+        def replace(match):
+            ref = match.group(2).strip().replace('\\', '/')
+            if ref.startswith('/'):
+                target = ref.lstrip('/')
+            else:
+                target = os.path.normpath(os.path.join(base, ref)).replace(os.sep, '/')
+            asset = built.get(target)
+            # Pages keep their names; they are what the browser revalidates
+            if asset is None or asset.mimetype == 'text/html':
+                return match.group(0)
+            return match.group(1) + _fingerprinted(ref, asset.fingerprint) + match.group(3)
+
+        return pattern.sub(replace, text).encode('utf-8', errors='surrogateescape')
+
+    def _image_entry(self, base: str, ref: str) -> Optional[Dict]:
+        ref = ref.strip().replace('\\', '/')
+        target = ref.lstrip('/') if ref.startswith('/') else \
+            os.path.normpath(os.path.join(base, ref)).replace(os.sep, '/')
+        return self._manifest['images'].get(target)
+
+    def _add_srcset(self, url: str, data: bytes) -> bytes:
+        """Give <img> tags of optimized images a responsive srcset"""
+        if not self._manifest['images']:
+            return data
+        base = os.path.dirname(url)
+
+        def replace(match):
+            tag = match.group(0)
+            src = IMG_SRC.search(tag)
+            if src is None or 'srcset' in tag.lower():
+                return tag
+            entry = self._image_entry(base, src.group(1))
+            if entry is None:
+                return tag
+            candidates = ', '.join(f"/{v['path']} {v['width']}w" for v in entry['variants']
+                                   if v['format'] == SRCSET_FORMAT)
+            if not candidates:
+                return tag
+            extra = f' srcset="{candidates}"' + ('' if 'sizes' in tag.lower() else ' sizes="100vw"')
+            return tag[:src.end()] + extra + tag[src.end():]
+
+        text = data.decode('utf-8', errors='surrogateescape')
+        return IMG_TAG.sub(replace, text).encode('utf-8', errors='surrogateescape')
+
+    # ----- lookup ----- #
+    def _find(self, url: str) -> Tuple[str, Optional[Asset], bool]:
+        with self._lock:
+            if url in self._assets:
+                # Optimized variants are named by content hash already
+                return url, self._assets[url], url.startswith(OUTPUT_DIR + '/') and url.endswith(('.webp', '.avif'))
+            if url in self._aliases:
+                return self._aliases[url], self._assets[self._aliases[url]], True
+        return url, None, False
+
+    def lookup(self, url: str) -> Tuple[str, Optional[Asset], bool]:
+        """(original URL path, asset, requested by content-hashed name) for a URL path"""
+        original, asset, immutable = self._find(url)
+        if self.auto_reload:
+            # Development: pick up edited, added and removed files; a plain 404 only costs a walk of stats
+            if asset is None:
+                changed = self._tree_signature() != self._signature
+            else:
+                changed = not os.path.exists(asset.path) or os.path.getmtime(asset.path) != asset.mtime
+            if changed:
+                self.build()
+                original, asset, immutable = self._find(url)
+        return original, asset, immutable
+
+    def requires_login(self, url: str) -> bool:
+        """Session-gated: under a private prefix, or an optimized variant only private pages use"""
+        if url.startswith(self.private_prefixes):
+            return True
+        with self._lock:
+            return self._aliases.get(url, url) in self._private_variants
+
+    def _variant(self, url: str) -> Optional[Asset]:
+        """Full-width AVIF/WebP version of an image, if the browser accepts one"""
+        entry = self._manifest['images'].get(url)
+        if entry is None:
+            return None
+        # Only explicit mentions count; `*/*` would match formats the browser can't show
+        accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+        for fmt in self._manifest['formats']:
+            if f'image/{fmt}' in accepted:
+                variants = [v for v in entry['variants'] if v['format'] == fmt]
+                with self._lock:
+                    asset = self._assets.get(variants[-1]['path']) if variants else None
+                if asset is not None:
+                    return asset
+        return None
+
+    def usage(self) -> Dict:
+        with self._lock:
+            assets = list(self._assets.values())
+        return {
+            'files': len(assets),
+            'bytes': sum(asset.size for asset in assets),
+            'compressed_files': sum(1 for asset in assets if asset.encodings),
+            'gzip_bytes': sum(len(asset.encodings.get('gzip', b'')) for asset in assets),
+            'brotli': BROTLI_AVAILABLE
+        }
+
+    # ----- serving ----- #
+    def serve(self, url: str) -> Optional[Response]:
+        """Response for a static URL path, or None if there is no such asset"""
+        original, asset, immutable = self.lookup(url)
+        if asset is None:
+            return None
+
+        vary = []
+        if original in self._manifest['images']:
+            vary.append('Accept')
+            asset = self._variant(original) or asset  # a variant has its own content hash, so its own ETag
+        if asset.encodings:
+            vary.append('Accept-Encoding')
+        encoding = next((name for name in ('br', 'gzip')
+                         if name in asset.encodings and name in request.accept_encodings), None)
+        etag = asset.etag if encoding is None else f"{asset.etag}-{encoding}"
+
+        if self.requires_login(url):
+            cache = PRIVATE_IMMUTABLE_CACHE if immutable else PRIVATE_REVALIDATE_CACHE
+        else:
+            cache = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': cache}
+        if vary:
+            headers['Vary'] = ', '.join(vary)
+
+        if etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        if asset.body is None:
+            response = send_file(asset.path, mimetype=asset.mimetype, etag=False, conditional=False)
+            response.headers.update(headers)
+            return response
+
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+            return Response(asset.encodings[encoding], mimetype=asset.mimetype, headers=headers)
+        return Response(asset.body, mimetype=asset.mimetype, headers=headers)
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), '..', 'Frontends')
+    store = AssetStore(root)
+    print(store.usage())
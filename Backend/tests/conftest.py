@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The backend modules import each other as siblings
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import ai_path  # noqa: E402,F401  (as api.py does)
+
+# Cheap hashes: the tests check the plumbing, not the hash strength
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
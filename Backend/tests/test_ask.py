@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+from flask import Flask
+
+import ask
+
+
+class FakePipeline:
+    queued = 0
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, question, use_web=None):
+        future = Future()
+        self.futures.append((question, use_web, future))
+        return future, 0
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(ask, 'get_pipeline', lambda: pipeline)
+    ask._jobs.clear()
+    return pipeline
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(ask.ask_bp)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+def test_ask_returns_a_job_without_waiting_for_the_model(client, pipeline):
+    response = client.post('/api/ask', json={'question': 'Who are the Bamileke?'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert client.get(f'/api/ask/{job_id}').get_json()['status'] == 'pending'
+
+    pipeline.futures[0][2].set_result({'answer': 'A people of the West Region.', 'sources': ['kb']})
+    result = client.get(f'/api/ask/{job_id}').get_json()
+    assert result['status'] == 'done' and result['answer'] == 'A people of the West Region.'
+
+
+def test_wait_is_time_boxed(client, pipeline, monkeypatch):
+    monkeypatch.setattr(ask, 'MAX_WAIT', 0.2)
+    response = client.post('/api/ask', json={'question': 'Slow one', 'wait': True})
+    assert response.status_code == 202  # the model is still going: poll for it
+    assert response.get_json()['job_id'] in ask._jobs
+
+    threading.Timer(0.05, lambda: pipeline.futures[1][2].set_result({'answer': 'Quick.', 'sources': []})).start()
+    response = client.post('/api/ask', json={'question': 'Quick one', 'wait': 'true'})
+    assert response.status_code == 200
+    assert response.get_json()['answer'] == 'Quick.'
+
+
+def test_ask_needs_a_session_and_a_question(client, pipeline):
+    assert client.post('/api/ask', json={}).status_code == 400
+    with client.session_transaction() as session:
+        session.clear()
+    assert client.post('/api/ask', json={'question': 'Hi'}).status_code == 401
@@ -0,0 +1,83 @@
+import io
+import csv
+import json
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from werkzeug.security import check_password_hash
+
+import bulk_users
+from auth import init_db
+from sqlite_pool import connection
+
+
+def user(i, **changes):
+    return dict({'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'user{i}@example.cm',
+                 'password': f'secret{i}', 'country': 'Cameroon', 'interest': 'music'}, **changes)
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'users.db')
+    init_db(path)
+    return path
+
+
+def emails(db):
+    with connection(db) as conn:
+        return [email for (email,) in conn.execute('SELECT email FROM users ORDER BY id')]
+
+
+def test_duplicates_in_the_file_and_the_database(db, pool):
+    bulk_users.import_users([user(1)], db, pool=pool)
+    report = bulk_users.import_users(
+        [user(1), user(2), user(2, first_name='Again'), user(3, email='USER3@example.cm')], db, pool=pool)
+    assert report['imported'] == 2
+    assert report['duplicates'] == [{'row': 3, 'email': 'user2@example.cm'},
+                                    {'row': 1, 'email': 'user1@example.cm'}]
+    assert emails(db) == ['user1@example.cm', 'user2@example.cm', 'user3@example.cm']
+    with connection(db) as conn:
+        stored = conn.execute("SELECT password FROM users WHERE email = 'user2@example.cm'").fetchone()[0]
+    assert check_password_hash(stored, 'secret2')
+
+
+def test_invalid_rows_are_reported_not_fatal(db, pool):
+    lines = [json.dumps(user(1)), '{not json', '[1, 2]', json.dumps(user(2, email='')), json.dumps(user(3))]
+    records = bulk_users.read_records(io.StringIO('\n'.join(lines) + '\n'), 'ndjson')
+    report = bulk_users.import_users(records, db, pool=pool)
+    assert report['imported'] == 2
+    assert report['errors'] == [{'row': 2, 'error': 'invalid JSON'},
+                                {'row': 3, 'error': 'expected an object, got list'},
+                                {'row': 4, 'error': 'missing email'}]
+
+
+def test_lookup_stays_under_old_sqlite_variable_limit(db, pool):
+    bulk_users.import_users([user(i) for i in range(0, 1200, 2)], db, pool=pool)
+    # An SQLite build older than 3.32 allows at most 999 bound variables
+    with connection(db) as conn:
+        conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    report = bulk_users.import_users([user(i) for i in range(1200)], db, batch=1000, pool=pool)
+    assert report['errors'] == []
+    assert report['imported'] == 600 and len(report['duplicates']) == 600
+
+
+def test_export_streams_every_user_without_passwords(db, pool, monkeypatch):
+    monkeypatch.setattr(bulk_users, 'EXPORT_BATCH', 2)
+    bulk_users.import_users([user(i) for i in range(5)], db, pool=pool)
+
+    parts = list(bulk_users.export_users(db, 'csv'))
+    assert len(parts) >= 3  # streamed in batches
+    rows = list(csv.DictReader(io.StringIO(''.join(parts))))
+    assert [row['email'] for row in rows] == [f'user{i}@example.cm' for i in range(5)]
+    assert 'password' not in rows[0]
+
+    records = [json.loads(line) for line in ''.join(bulk_users.export_users(db, 'ndjson')).splitlines()]
+    assert set(records[0]) == set(bulk_users.EXPORT_FIELDS)
+    assert len(records) == 5
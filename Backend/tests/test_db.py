@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'DATABASE', str(tmp_path / 'database.db'))
+    db.init_db()
+    return db.app.test_client()
+
+
+def add_users(count, delete=()):
+    with db.get_db_connection() as conn:
+        conn.executemany('INSERT INTO users (name, email, message) VALUES (?, ?, ?)',
+                         [(f'User {i}', f'user{i}@example.cm', f'Hello {i}') for i in range(1, count + 1)])
+        conn.executemany('DELETE FROM users WHERE id = ?', [(i,) for i in delete])
+
+
+def walk(client, limit, **params):
+    """Follow X-Next-After-Id to the end; the ids of every page"""
+    pages, after_id = [], 0
+    while after_id is not None:
+        response = client.get('/users', query_string=dict(params, after_id=after_id, limit=limit))
+        pages.append([user['id'] for user in response.get_json()])
+        next_id = response.headers.get('X-Next-After-Id')
+        after_id = int(next_id) if next_id else None
+    return pages
+
+
+def test_pages_cover_every_user_once_across_gaps(client):
+    add_users(12, delete=(3, 4, 9))
+    assert walk(client, 4) == [[1, 2, 5, 6], [7, 8, 10, 11], [12]]
+
+
+def test_last_full_page_has_no_next_link(client):
+    add_users(8)
+    assert walk(client, 4) == [[1, 2, 3, 4], [5, 6, 7, 8]]  # no empty third page
+    response = client.get('/users', query_string={'after_id': 4, 'limit': 4})
+    assert 'Link' not in response.headers and 'X-Next-After-Id' not in response.headers
+
+    response = client.get('/users', query_string={'limit': 7})
+    assert response.headers['X-Next-After-Id'] == '7'
+    assert 'after_id=7' in response.headers['Link'] and 'limit=7' in response.headers['Link']
+    assert client.get('/users', query_string={'after_id': 8}).get_json() == []
+
+
+def test_limit_is_clamped_and_fields_are_projected(client, monkeypatch):
+    monkeypatch.setattr(db, 'MAX_PAGE_SIZE', 5)
+    add_users(6)
+    assert len(client.get('/users', query_string={'limit': 0}).get_json()) == 1
+    assert len(client.get('/users', query_string={'limit': 1000}).get_json()) == 5
+
+    users = client.get('/users', query_string={'fields': 'email,password,id) FROM users --'}).get_json()
+    assert users[0] == {'id': 1, 'email': 'user1@example.cm'}  # unknown names are dropped, id is always kept
+    link = client.get('/users', query_string={'fields': 'name', 'limit': 2}).headers['Link']
+    assert 'fields=name' in link
+
+
+def test_streamed_formats(client):
+    add_users(5, delete=(2,))
+    response = client.get('/users', query_string={'format': 'ndjson', 'after_id': 1, 'fields': 'name', 'limit': 2})
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == [
+        {'id': 3, 'name': 'User 3'}, {'id': 4, 'name': 'User 4'}]
+
+    response = client.get('/users', query_string={'format': 'array'})
+    assert [user['id'] for user in json.loads(response.get_data(as_text=True))] == [1, 3, 4, 5]
+    assert client.get('/users', query_string={'format': 'array', 'after_id': 5}).get_data(as_text=True) == '[]'
+
+
+def test_home_page_links_to_the_next_page(client):
+    add_users(3)
+    page = client.get('/', query_string={'limit': 2}).get_data(as_text=True)
+    assert 'User 2' in page and 'User 3' not in page and 'after_id=2' in page
+    assert 'Next page' not in client.get('/', query_string={'after_id': 2, 'limit': 2}).get_data(as_text=True)
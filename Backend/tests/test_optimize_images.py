@@ -0,0 +1,85 @@
+import pytest
+from flask import Flask, abort
+
+import optimize_images
+from optimize_images import OUTPUT_DIR, load_manifest, optimize, target_widths
+from static_assets import AssetStore
+
+Image = pytest.importorskip('PIL.Image')
+if not optimize_images.available_formats():
+    pytest.skip("Pillow without WebP/AVIF support", allow_module_level=True)
+
+
+def picture(path, width, height, color=(200, 80, 40)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new('RGB', (width, height), color).save(path, 'JPEG', quality=95)
+    return path
+
+
+@pytest.fixture
+def site(tmp_path):
+    picture(tmp_path / 'img' / 'mask.jpg', 1000, 500)
+    picture(tmp_path / 'bot' / 'mask-copy.jpg', 1000, 500)  # byte-identical to img/mask.jpg
+    picture(tmp_path / 'img' / 'icon.jpg', 200, 200, color=(0, 90, 0))
+    (tmp_path / 'index.html').write_text('<img src="img/mask.jpg" alt="Mask">')
+    return tmp_path
+
+
+def test_target_widths_never_upscale():
+    assert target_widths(1000) == [320, 640, 960, 1000]
+    assert target_widths(200) == [200]
+    assert target_widths(4000) == list(optimize_images.WIDTHS)
+
+
+def test_variants_and_manifest(site):
+    manifest = optimize(str(site))
+    entry = manifest['images']['img/mask.jpg']
+    assert (entry['width'], entry['height']) == (1000, 500)
+    for variant in entry['variants']:
+        with Image.open(site / variant['path']) as image:
+            assert image.width == variant['width'] and image.format.lower() == variant['format']
+            assert image.height == round(500 * variant['width'] / 1000)
+
+    # The copy is encoded once and listed as a duplicate of the first one found
+    assert manifest['images']['bot/mask-copy.jpg'] == entry
+    assert manifest['duplicates'] == {'img/mask.jpg': 'bot/mask-copy.jpg'}
+    assert load_manifest(str(site)) == manifest
+
+
+def test_reruns_keep_existing_variants_and_drop_orphans(site):
+    optimize(str(site))
+    out = site / OUTPUT_DIR
+    first = {path.name: path.stat().st_mtime_ns for path in out.iterdir()}
+
+    (site / 'img' / 'icon.jpg').unlink()
+    manifest = optimize(str(site))
+    second = {path.name: path.stat().st_mtime_ns for path in out.iterdir()}
+    assert 'img/icon.jpg' not in manifest['images']
+    kept = {name for name in second if name != optimize_images.MANIFEST_NAME}
+    assert kept < set(first)  # the icon's variants were removed
+    assert all(second[name] == first[name] for name in kept)  # nothing re-encoded
+
+
+def test_pages_get_a_srcset_and_images_their_variants(site):
+    optimize(str(site))
+    store = AssetStore(str(site))
+    app = Flask(__name__, static_folder=None)
+
+    @app.route('/<path:filename>')
+    def static_files(filename):
+        return store.serve(filename) or abort(404)
+
+    client = app.test_client()
+    page = client.get('/index.html').get_data(as_text=True)
+    assert 'srcset="/optimized/' in page and '640w' in page and 'sizes="100vw"' in page
+
+    original = client.get('/img/mask.jpg')
+    assert original.mimetype == 'image/jpeg' and 'Accept' in original.headers['Vary']
+    fmt = optimize_images.available_formats()[0]
+    variant = client.get('/img/mask.jpg', headers={'Accept': f'image/{fmt},image/*;q=0.8'})
+    assert variant.mimetype == f'image/{fmt}' and variant.headers['ETag'] != original.headers['ETag']
+    assert len(variant.get_data()) < len(original.get_data())
+
+    # The mask is also under bot/, but img/mask.jpg is public, so its variants are too
+    variants = load_manifest(str(site))['images']['img/mask.jpg']['variants']
+    assert not any(store.requires_login(v['path']) for v in variants)
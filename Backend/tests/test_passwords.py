@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+import auth
+from passwords import HashingBusy, PasswordHasher
+
+
+def occupy(hasher):
+    """Hold the only hashing worker until the returned event is set"""
+    release = threading.Event()
+    threading.Thread(target=hasher._run, args=(release.wait, 5), daemon=True).start()
+    while hasher.pending == 0:
+        threading.Event().wait(0.01)
+    return release
+
+
+def test_unknown_user_waits_in_the_same_queue():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+    release = occupy(hasher)
+    done = threading.Event()
+    threading.Thread(target=lambda: (hasher.reject_unknown_user('guess'), done.set()), daemon=True).start()
+
+    assert not done.wait(0.3)  # queued behind the busy worker, like a real check
+    release.set()
+    assert done.wait(5)
+    assert hasher.stats['unknown'] == 1 and hasher.pending == 0
+
+
+def test_unknown_user_is_turned_away_when_the_queue_is_full():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    release = occupy(hasher)
+    try:
+        with pytest.raises(HashingBusy):
+            hasher.reject_unknown_user('guess')
+        with pytest.raises(HashingBusy):
+            hasher.verify(generate_password_hash('x', hasher.method), 'x')
+        assert hasher.stats['rejected'] == 2
+    finally:
+        release.set()
+
+
+def test_verify_flags_hashes_made_with_old_parameters():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000')
+    assert hasher.verify(hasher.hash('secret'), 'secret') == (True, False)
+    assert hasher.verify(generate_password_hash('secret', 'pbkdf2:sha256:500'), 'secret') == (True, True)
+    assert hasher.verify(hasher.hash('secret'), 'wrong') == (False, False)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = str(tmp_path / 'users.db')
+    auth.init_db(path)
+    monkeypatch.setattr(auth, 'DB_PATH', path)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(auth.auth_bp)
+    return app.test_client()
+
+
+def test_login_for_an_unknown_email_uses_the_pool(client, monkeypatch):
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    monkeypatch.setattr(auth, 'get_hasher', lambda: hasher)
+    response = client.post('/api/login', json={'email': 'nobody@example.cm', 'password': 'guess'})
+    assert response.status_code == 404 and hasher.stats['unknown'] == 1
+
+    release = occupy(hasher)
+    try:
+        response = client.post('/api/login', json={'email': 'nobody@example.cm', 'password': 'guess'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == str(auth.RETRY_AFTER)
+    finally:
+        release.set()
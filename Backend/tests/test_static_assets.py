@@ -0,0 +1,79 @@
+import os
+import gzip
+
+import pytest
+from flask import Flask, abort
+
+from static_assets import AssetStore
+
+CSS = 'body { color: #333; }\n' + ''.join(f'.tribe-{i} {{ margin: {i}px; }}\n' for i in range(100))
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'styles.css').write_text(CSS)
+    (tmp_path / 'index.html').write_text('<link rel="stylesheet" href="css/styles.css"><p>Home</p>')
+    (tmp_path / 'bot').mkdir()
+    (tmp_path / 'bot' / 'chat.html').write_text('<script src="/css/styles.css"></script><p>Bot</p>')
+    return tmp_path
+
+
+def make_client(root, **options):
+    store = AssetStore(str(root), **options)
+    app = Flask(__name__, static_folder=None)
+
+    @app.route('/<path:filename>')
+    def static_files(filename):
+        return store.serve(filename) or abort(404)
+
+    return store, app.test_client()
+
+
+def test_each_encoding_has_its_own_etag(site):
+    store, client = make_client(site)
+    plain = client.get('/css/styles.css')
+    zipped = client.get('/css/styles.css', headers={'Accept-Encoding': 'gzip'})
+    assert plain.headers.get('Content-Encoding') is None and plain.get_data(as_text=True) == CSS
+    assert zipped.headers['Content-Encoding'] == 'gzip' and gzip.decompress(zipped.get_data()).decode() == CSS
+    assert zipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    assert plain.headers['Vary'] == zipped.headers['Vary'] == 'Accept-Encoding'
+
+    # A 304 is only given for the representation the client would receive
+    again = client.get('/css/styles.css', headers={'Accept-Encoding': 'gzip', 'If-None-Match': zipped.headers['ETag']})
+    assert again.status_code == 304 and again.get_data() == b''
+    assert again.headers['ETag'] == zipped.headers['ETag']
+    switched = client.get('/css/styles.css', headers={'If-None-Match': zipped.headers['ETag']})
+    assert switched.status_code == 200 and switched.get_data(as_text=True) == CSS
+    assert client.get('/css/styles.css', headers={'If-None-Match': plain.headers['ETag']}).status_code == 304
+
+
+def test_pages_point_at_immutable_fingerprinted_names(site):
+    store, client = make_client(site)
+    page = client.get('/index.html')
+    assert page.headers['Cache-Control'] == 'no-cache'
+    fingerprint = store.lookup('css/styles.css')[1].fingerprint
+    assert f'href="css/styles.{fingerprint}.css"' in page.get_data(as_text=True)
+
+    hashed = client.get(f'/css/styles.{fingerprint}.css')
+    assert hashed.status_code == 200 and hashed.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert hashed.headers['ETag'] == client.get('/css/styles.css').headers['ETag']
+    assert client.get('/css/styles.00000000.css').status_code == 404
+
+
+def test_pages_behind_the_login_are_privately_cached(site):
+    store, client = make_client(site)
+    assert store.requires_login('bot/chat.html') and not store.requires_login('index.html')
+    assert client.get('/bot/chat.html').headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_auto_reload_serves_edited_files_with_a_new_etag(site):
+    store, client = make_client(site, auto_reload=True)
+    before = client.get('/index.html').headers['ETag']
+    index = site / 'index.html'
+    index.write_text('<p>Edited</p>')
+    stat = index.stat()
+    os.utime(index, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    response = client.get('/index.html', headers={'If-None-Match': before})
+    assert response.status_code == 200 and response.get_data(as_text=True) == '<p>Edited</p>'
+    assert response.headers['ETag'] != before